@@ -0,0 +1,73 @@
+"""
+Async DRF views.
+
+DRF dispatches synchronously, so under ASGI every APIView request runs in
+a worker thread. AsyncAPIView dispatches on the event loop instead: its
+handlers are coroutines that read through the async ORM, and
+authentication awaits the authenticator's aauthenticate() when it has one
+(see api.authentication). Writes that need a transaction, such as
+apply_gamification(), are offloaded with sync_to_async.
+
+Permission and throttle classes run on the event loop and must not touch
+the database. Under WSGI the views still work: Django runs each request's
+coroutine to completion with async_to_sync.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, generics
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers (get, post, ...) are coroutines."""
+
+    async def perform_aauthentication(self, request):
+        """Authenticate the request, awaiting aauthenticate() where an authenticator has it."""
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None) or sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    async def dispatch(self, request, *args, **kwargs):
+        """APIView.dispatch(), awaiting authentication and the handler."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.perform_aauthentication(request)
+            # request.user is set, so this only runs the (database-free) permission and throttle checks
+            self.initial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncGenericAPIView(AsyncAPIView, generics.GenericAPIView):
+    """GenericAPIView (serializer helpers) with async handlers."""
@@ -1,7 +1,27 @@
 # api/serializers.py - Updated serializers with the new GameSession fields
 
+from django.urls import reverse
 from rest_framework import serializers
-from ear_tune.models import Game, Challenge, GameSession, FrequencyBand, EQChallenge, RhythmChallenge, UserProfile, Achievement, UserAchievement
+from ear_tune.audio import CODECS, available_codecs
+from ear_tune.render_cache import SourceNotFound, renderer
+from ear_tune.variants import note_audio_path, variant_index
+from ear_tune.models import Game, Challenge, GameSession, FrequencyBand, EQChallenge, RhythmChallenge, UserProfile, Achievement, UserAchievement, UserGameStats, UserBandStats
+
+class DynamicFieldsMixin:
+    """
+    Lets a request pick the fields it needs with ?fields=a,b,c.
+    Unknown names are ignored; without the parameter every field is returned.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or self.parent is not None and not isinstance(self.parent, serializers.ListSerializer):
+            return
+        requested = request.query_params.get('fields')
+        if requested:
+            keep = {name.strip() for name in requested.split(',')}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
 
 class GameSerializer(serializers.ModelSerializer):
     """Converts Game instances into JSON format and validates input data."""
@@ -11,20 +31,38 @@ class GameSerializer(serializers.ModelSerializer):
 
 class ChallengeSerializer(serializers.ModelSerializer):
     """Converts Challenge instances to/from JSON."""
+    audio_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Challenge 
         fields = '__all__'
 
-class GameSessionSerializer(serializers.ModelSerializer):
+    def get_audio_variants(self, obj):
+        """Encodings of a note challenge's recording, smallest first."""
+        if obj.challenge_type != 'note':
+            return []
+        return variant_index.variants(note_audio_path(obj.correct_answer))
+
+class GameSessionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Converts GameSession instances to/from JSON with the new fields."""
+    game_name = serializers.SerializerMethodField()
+
     class Meta:
         model = GameSession
         fields = [
-            'id', 'date_played', 'score', 'challenge', 'user', 
+            'id', 'date_played', 'score', 'challenge', 'game_name', 'user',
             'active', 'attempts_left', 'is_attempt', 'parent_session'
         ]
         read_only_fields = ['id', 'date_played', 'user']
 
+    def get_game_name(self, obj):
+        """Name of the session's game; sessions recorded before GameSession.game existed go through their challenge."""
+        if obj.game_id:
+            return obj.game.name
+        if obj.challenge_id and obj.challenge.game_id:
+            return obj.challenge.game.name
+        return None
+
     def create(self, validated_data):
         """Override create to set the user from the request."""
         user = self.context['request'].user
@@ -38,11 +76,33 @@ class FrequencyBandSerializer(serializers.ModelSerializer):
 
 class EQChallengeSerializer(serializers.ModelSerializer):
     frequency_band = FrequencyBandSerializer(read_only=True)
+    audio_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = EQChallenge
         fields = ['id', 'source_audio', 'frequency_band', 'change_amount',
-                 'difficulty', 'hint_text']
+                 'difficulty', 'hint_text', 'audio_variants']
+
+    def get_audio_variants(self, obj):
+        """
+        Render endpoint URLs per codec for the original and processed audio, smallest codec first.
+        Each carries the hash the render is served with as its ETag (None if the source is missing).
+        """
+        url = reverse('eq-challenge-audio', args=[obj.id])
+        codecs = [codec for codec in ('opus', 'aac', 'wav') if codec in available_codecs()]
+        variants = {}
+        for version, gain_db in (('original', 0), ('processed', obj.change_amount)):
+            variants[version] = []
+            for codec in codecs:
+                try:
+                    key = renderer.key(obj.source_audio, obj.frequency_band.center_frequency, gain_db, codec)
+                except SourceNotFound:
+                    key = None
+                variants[version].append({
+                    'codec': codec, 'url': f'{url}?version={version}&codec={codec}',
+                    'content_type': CODECS[codec]['content_type'], 'hash': key,
+                })
+        return variants
 
 class RhythmChallengeSerializer(serializers.ModelSerializer):
     """Converts RhythmChallenge instances to/from JSON."""
@@ -51,30 +111,71 @@ class RhythmChallengeSerializer(serializers.ModelSerializer):
         fields = ['id', 'pattern_data', 'tempo', 'time_signature',
                  'difficulty', 'audio_file', 'correct_pattern']
 
+class UserGameStatsSerializer(serializers.ModelSerializer):
+    """A user's totals for one game."""
+    game_name = serializers.CharField(source='game.name', read_only=True)
+    accuracy = serializers.FloatField(read_only=True)
+    average_accuracy = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = UserGameStats
+        fields = ['game', 'game_name', 'plays', 'correct', 'accuracy', 'perfect_scores', 'best_score',
+                  'average_accuracy']
+
+class UserBandStatsSerializer(serializers.ModelSerializer):
+    """A user's EQ totals for one frequency band."""
+    frequency_band_name = serializers.CharField(source='frequency_band.name', read_only=True)
+    accuracy = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = UserBandStats
+        fields = ['frequency_band', 'frequency_band_name', 'plays', 'correct', 'accuracy']
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Converts UserProfile instances to/from JSON."""
     current_xp = serializers.IntegerField(source='xp', read_only=True)
     xp_for_next_level = serializers.SerializerMethodField()
     username = serializers.CharField(source='user.username', read_only=True)
     date_joined = serializers.DateTimeField(source='user.date_joined', read_only=True)
+    game_stats = serializers.SerializerMethodField()
+    band_stats = serializers.SerializerMethodField()
 
     class Meta:
         model = UserProfile
         fields = ['id', 'current_xp', 'level', 'xp_for_next_level', 'username', 'date_joined',
-                  'total_games_played', 'total_correct_answers', 'current_streak',
-                  'longest_streak', 'last_activity_date', 'created_at']
+                  'total_games_played', 'total_correct_answers', 'total_perfect_scores', 'current_streak',
+                  'longest_streak', 'last_activity_date', 'created_at', 'game_stats', 'band_stats']
 
     def get_xp_for_next_level(self, obj):
         """Calculate XP needed for next level."""
         next_level = obj.level + 1
         return (next_level - 1) ** 2 * 100
 
+    def get_game_stats(self, obj):
+        """Per-game totals from the denormalized stats table (see ear_tune.stats)."""
+        stats = UserGameStats.objects.filter(user_id=obj.user_id).select_related('game').order_by('game_id')
+        return UserGameStatsSerializer(stats, many=True).data
+
+    def get_band_stats(self, obj):
+        """Per-band EQ totals, in band display order."""
+        stats = (UserBandStats.objects.filter(user_id=obj.user_id).select_related('frequency_band')
+                 .order_by('frequency_band__order', 'frequency_band_id'))
+        return UserBandStatsSerializer(stats, many=True).data
+
 class AchievementSerializer(serializers.ModelSerializer):
     """Converts Achievement instances to/from JSON."""
     class Meta:
         model = Achievement
         fields = '__all__'
 
+class AchievementStatusSerializer(AchievementSerializer):
+    """Achievement with the current user's unlock status, from an `unlocked_at` annotation."""
+    unlocked = serializers.SerializerMethodField()
+    unlocked_at = serializers.DateTimeField(read_only=True)
+
+    def get_unlocked(self, obj):
+        return obj.unlocked_at is not None
+
 class UserAchievementSerializer(serializers.ModelSerializer):
     """Converts UserAchievement instances to/from JSON with nested achievement data."""
     achievement = AchievementSerializer(read_only=True)
@@ -1,3 +1,754 @@
-from django.test import TestCase
+"""
+tests.py
+--------
+Tests for the EarTune REST API.
+"""
 
-# Create your tests here.
+import io
+import os
+import tempfile
+from unittest import mock, skipUnless
+
+import numpy as np
+import soundfile as sf
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ear_tune.achievements import catalogue
+from ear_tune.bundles import load_bundle
+from ear_tune.eq import apply_eq
+from ear_tune.gamification import apply_gamification
+from ear_tune.leaderboard import leaderboard
+from ear_tune.render_cache import renderer
+from ear_tune.sampling import sampler
+from ear_tune.stats import rebuild
+from ll_project import cache_url
+from ear_tune.models import (
+    Achievement,
+    Challenge,
+    EQChallenge,
+    FrequencyBand,
+    Game,
+    GameSession,
+    RhythmChallenge,
+    UserAchievement,
+    UserBandStats,
+    UserGameStats,
+    UserProfile,
+)
+
+from .serializers import EQChallengeSerializer
+from .views import (
+    GameList, RandomChallenge, RandomEQChallenge, RandomRhythmChallengeView, SubmitAnswer, SubmitEQAnswer,
+    SubmitRhythmAnswerView,
+)
+
+
+class GameFixtureMixin:
+    """
+    A signed-in user, and one challenge of each kind: a note challenge with
+    an open session, a pink-noise EQ challenge on the Mids band and a
+    four-onset rhythm challenge.
+    """
+
+    def setUp(self):
+        catalogue.invalidate()
+        leaderboard.reset()
+        self.user = User.objects.create(username='testuser')
+        self.client.force_authenticate(user=self.user)
+
+        self.notes_game = Game.objects.create(name='Notes')
+        self.challenge = Challenge.objects.create(
+            game=self.notes_game, challenge_type='note', prompt='Identify this note.', correct_answer='c'
+        )
+        self.session = GameSession.objects.create(user=self.user, challenge=self.challenge)
+
+        self.eq_game = Game.objects.create(name='Frequency Recognition')
+        self.band = FrequencyBand.objects.create(
+            name='Mids', min_frequency=500, max_frequency=2000, center_frequency=1000
+        )
+        self.eq_challenge = EQChallenge.objects.create(
+            game=self.eq_game, source_audio='pink_noise', frequency_band=self.band,
+            change_amount=6, difficulty='beginner'
+        )
+
+        self.rhythm_game = Game.objects.create(name='Rhythm Recognition')
+        self.rhythm_challenge = RhythmChallenge.objects.create(
+            game=self.rhythm_game, pattern_data={}, difficulty='beginner',
+            audio_file='static/audio/rhythm/test.mp3', correct_pattern=[0, 500, 1000, 1500]
+        )
+
+
+class SubmitQueryCountTests(GameFixtureMixin, APITestCase):
+    """
+    Each submit endpoint must run a fixed number of queries, however many
+    achievements exist or unlock on the way.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # The stats rows exist after a user's first answer to each game; later answers only UPDATE them.
+        for game in [self.notes_game, self.eq_game, self.rhythm_game]:
+            UserGameStats.objects.create(user=self.user, game=game)
+        UserBandStats.objects.create(user=self.user, frequency_band=self.band)
+
+    def create_achievements(self, start, stop):
+        for value in range(start, stop):
+            Achievement.objects.create(
+                name=f'Played {value}', description='', icon='*',
+                criteria_type='games_played', criteria_value=value, xp_reward=50
+            )
+        # Warm the process-local catalogue so it is not part of the count.
+        catalogue.achievements('games_played')
+
+    def submit_note(self, answer='c'):
+        return self.client.post(reverse('submit-answer'), {
+            'challenge_id': self.challenge.id, 'answer': answer, 'session_id': self.session.id
+        }, format='json')
+
+    def submit_eq(self):
+        return self.client.post(reverse('submit-eq-answer'), {
+            'challenge_id': self.eq_challenge.id, 'frequency_band_id': self.band.id, 'change_amount': 6
+        }, format='json')
+
+    def submit_rhythm(self):
+        return self.client.post(reverse('submit-rhythm-answer'), {
+            'challenge_id': self.rhythm_challenge.id, 'user_taps': [5, 490, 1010, 1495]
+        }, format='json')
+
+    def assert_constant_queries(self, submit, expected):
+        self.create_achievements(1, 2)
+        with self.assertNumQueries(expected):
+            response = submit()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['unlocked_achievements']), 1)
+
+        # Same count with a much larger catalogue.
+        self.create_achievements(2, 50)
+        with self.assertNumQueries(expected):
+            response = submit()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['unlocked_achievements']), 1)
+        return response
+
+    def test_submit_answer_query_count(self):
+        self.assert_constant_queries(self.submit_note, 11)
+        self.assertEqual(UserAchievement.objects.filter(user=self.user).count(), 2)
+
+    def test_submit_wrong_answer_query_count(self):
+        self.create_achievements(1, 50)
+        with self.assertNumQueries(9):
+            response = self.submit_note(answer='d')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['attempts_left'], 2)
+
+    def test_submit_eq_answer_query_count(self):
+        response = self.assert_constant_queries(self.submit_eq, 10)
+        self.assertTrue(response.data['correct'])
+
+    def test_submit_rhythm_answer_query_count(self):
+        response = self.assert_constant_queries(self.submit_rhythm, 9)
+        self.assertEqual(response.data['score'], 100)
+
+    def test_profile_is_updated_once_per_answer(self):
+        self.create_achievements(1, 3)
+        Achievement.objects.create(
+            name='Level 2', description='', icon='*', criteria_type='level', criteria_value=2, xp_reward=50
+        )
+        self.submit_eq()
+        profile = User.objects.get(pk=self.user.pk).profile
+        # 85 XP for the answer, 50 for 'Played 1' and 50 for 'Level 2',
+        # which that first reward reaches.
+        self.assertEqual(profile.xp, 85 + 50 + 50)
+        self.assertEqual(profile.level, 2)
+        self.assertEqual(profile.total_games_played, 1)
+        self.assertEqual(profile.total_correct_answers, 1)
+        self.assertEqual(profile.total_perfect_scores, 1)
+        self.assertEqual(profile.current_streak, 1)
+        self.assertEqual(profile.longest_streak, 1)
+
+
+@override_settings(LEADERBOARD_SYNC_INTERVAL=0)
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        leaderboard.reset()
+        self.users = []
+        for i, xp in enumerate([50, 400, 0, 900, 120, 120]):
+            user = User.objects.create(username=f'player{i}')
+            UserProfile.objects.filter(user=user).update(xp=xp)
+            self.users.append(user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.users[0])
+
+    def test_top_page(self):
+        response = self.client.get(reverse('leaderboard'), {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['rank'], row['username'], row['current_xp'], row['level']) for row in response.data],
+            [(1, 'player3', 900, 4), (2, 'player1', 400, 3), (3, 'player4', 120, 2)]
+        )
+
+    def test_offset_page(self):
+        response = self.client.get(reverse('leaderboard'), {'offset': 4, 'limit': 10})
+        self.assertEqual([row['username'] for row in response.data], ['player0', 'player2'])
+
+    def test_my_rank_and_neighbours(self):
+        response = self.client.get(reverse('leaderboard-me'), {'radius': 1})
+        self.assertEqual(response.data['rank'], 5)
+        self.assertEqual(response.data['total_players'], 6)
+        self.assertEqual([row['rank'] for row in response.data['entries']], [4, 5, 6])
+
+    def test_picks_up_changes_from_other_workers(self):
+        self.assertEqual(leaderboard.rank(self.users[0].id), 5)
+        # An UPDATE made by another process, bypassing this worker's signals.
+        UserProfile.objects.filter(user=self.users[0]).update(xp=1000, updated_at=timezone.now())
+        self.assertEqual(leaderboard.rank(self.users[0].id), 1)
+
+    def test_answer_updates_rank(self):
+        self.assertEqual(leaderboard.rank(self.users[2].id), 6)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_gamification(self.users[2], xp_earned=60)
+        with override_settings(LEADERBOARD_SYNC_INTERVAL=3600):
+            self.assertEqual(leaderboard.rank(self.users[2].id), 5)
+
+
+class AchievementsListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        catalogue.invalidate()
+        self.user = User.objects.create(username='testuser')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_achievements(self, count, unlock):
+        achievements = [
+            Achievement.objects.create(name=f'Played {value}', description='', icon='*',
+                                       criteria_type='games_played', criteria_value=value)
+            for value in range(1, count + 1)
+        ]
+        UserAchievement.objects.bulk_create([
+            UserAchievement(user=self.user, achievement=achievement) for achievement in achievements[:unlock]
+        ])
+        cache.clear()
+
+    def test_query_count_is_constant(self):
+        for count, unlock in [(5, 2), (40, 40)]:
+            Achievement.objects.all().delete()
+            self.create_achievements(count, unlock)
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse('achievements-list'))
+            self.assertEqual(len(response.data), count)
+            self.assertEqual(sum(row['unlocked'] for row in response.data), unlock)
+            self.assertEqual(sum(row['unlocked_at'] is not None for row in response.data), unlock)
+
+    def test_cached_until_an_achievement_unlocks(self):
+        self.create_achievements(3, 0)
+        self.client.get(reverse('achievements-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('achievements-list'))
+        self.assertFalse(any(row['unlocked'] for row in response.data))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_gamification(self.user)
+        response = self.client.get(reverse('achievements-list'))
+        self.assertEqual([row['unlocked'] for row in response.data], [True, False, False])
+
+    def test_catalogue_change_invalidates_cache(self):
+        self.create_achievements(1, 0)
+        self.client.get(reverse('achievements-list'))
+        Achievement.objects.create(name='Level 5', description='', icon='*', criteria_type='level', criteria_value=5)
+        response = self.client.get(reverse('achievements-list'))
+        self.assertEqual(len(response.data), 2)
+
+
+class AsyncViewTests(GameFixtureMixin, APITestCase):
+    """The hot endpoints run as coroutines; exercise them the way an ASGI server does."""
+
+    def setUp(self):
+        super().setUp()
+        token = RefreshToken.for_user(self.user).access_token
+        self.async_client = AsyncClient()
+        self.auth = {'Authorization': f'Bearer {token}'}
+
+    async def test_random_challenge_and_submit(self):
+        response = await self.async_client.get(reverse('random-eq-challenge'), headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.eq_challenge.id)
+
+        response = await self.async_client.post(
+            reverse('submit-eq-answer'),
+            {'challenge_id': self.eq_challenge.id, 'frequency_band_id': self.band.id,
+             'change_amount': 6},
+            content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['correct'])
+        profile = await UserProfile.objects.aget(user=self.user)
+        self.assertEqual((profile.total_games_played, profile.total_correct_answers), (1, 1))
+
+    def test_hot_views_are_async(self):
+        for view in (RandomChallenge, RandomEQChallenge, RandomRhythmChallengeView, SubmitAnswer, SubmitEQAnswer,
+                     SubmitRhythmAnswerView):
+            self.assertTrue(view.view_is_async, view.__name__)
+
+    async def test_authentication(self):
+        response = await AsyncClient().get(reverse('random-eq-challenge'))
+        self.assertEqual(response.status_code, 401)
+        response = await AsyncClient().get(reverse('random-eq-challenge'),
+                                           headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.game = Game.objects.create(name='Notes')
+        self.url = reverse('game-list')
+
+    def test_hit_skips_the_view_and_revalidates_by_etag(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['Cache-Control'], 'public, max-age=60')
+        with mock.patch.object(GameList, 'list', side_effect=AssertionError('not cached')):
+            second = self.client.get(self.url)
+            self.assertEqual(second.content, first.content)
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertEqual(second['Content-Type'], 'application/json')
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+
+    def test_model_save_invalidates(self):
+        etag = self.client.get(self.url)['ETag']
+        self.game.name = 'Pitch'
+        self.game.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Pitch')
+
+    def test_accept_header_is_part_of_the_key(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={'default': cache_url.parse(f'file://{directory}')}):
+                etag = self.client.get(self.url)['ETag']
+                self.assertTrue(os.listdir(directory))
+                self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @skipUnless(os.environ.get('TEST_REDIS_URL'), 'set TEST_REDIS_URL to test against a Redis server')
+    def test_redis_backend(self):
+        with override_settings(CACHES={'default': cache_url.parse(os.environ['TEST_REDIS_URL'])}):
+            cache.clear()
+            etag = self.client.get(self.url)['ETag']
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.game.save()
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cache_url_parsing(self):
+        self.assertEqual(cache_url.parse('locmem://'),
+                         {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': ''})
+        self.assertEqual(cache_url.parse('redis://:secret@cache:6379/1?timeout=60&key_prefix=et&max_entries=5'), {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://:secret@cache:6379/1',
+            'TIMEOUT': 60,
+            'KEY_PREFIX': 'et',
+            'OPTIONS': {'max_entries': 5},
+        })
+        with self.assertRaises(ValueError):
+            cache_url.parse('memcache://localhost')
+
+
+class GameSessionHistoryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        game = Game.objects.create(name='Notes')
+        challenge = Challenge.objects.create(game=game, challenge_type='note', prompt='?', correct_answer='c')
+        self.sessions = GameSession.objects.bulk_create([
+            GameSession(user=self.user, challenge=challenge, score=i) for i in range(25)
+        ])
+        GameSession.objects.create(user=self.user, challenge=challenge, is_attempt=True)
+        # Shared timestamps make the id the tie-breaker between pages
+        played = timezone.now()
+        for i, session in enumerate(self.sessions):
+            GameSession.objects.filter(pk=session.pk).update(date_played=played - timezone.timedelta(minutes=i // 4))
+
+    def test_pages_cover_history_once_in_order(self):
+        url, ids = reverse('game-session-list') + '?page_size=7', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        expected = GameSession.objects.filter(user=self.user, is_attempt=False).order_by('-date_played', '-id')
+        self.assertEqual(ids, [session.id for session in expected])
+
+    def test_fields_projection(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('game-session-list'), {'fields': 'id,score,game_name'})
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'score', 'game_name'})
+        self.assertEqual(response.data['results'][0]['game_name'], 'Notes')
+
+    def test_game_name_of_every_kind(self):
+        eq_game = Game.objects.create(name='Frequency Recognition')
+        GameSession.objects.bulk_create([
+            GameSession(user=self.user, game=eq_game, score=100),
+            GameSession(user=self.user, challenge=Challenge.objects.create(challenge_type='note', correct_answer='c')),
+        ])
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('game-session-list'), {'fields': 'id,game_name', 'page_size': 3})
+        self.assertEqual([row['game_name'] for row in response.data['results']],
+                         [None, 'Frequency Recognition', 'Notes'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('game-session-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EQChallengeAudioTests(APITestCase):
+    def setUp(self):
+        source_dir = tempfile.TemporaryDirectory()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(source_dir.cleanup)
+        self.addCleanup(cache_dir.cleanup)
+        sf.write(f'{source_dir.name}/drums.wav', np.random.default_rng(0).normal(0, 0.1, 4410), 44100)
+        settings = override_settings(EQ_SOURCE_DIRS=[source_dir.name], EQ_RENDER_CACHE_DIR=cache_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        renderer.reset()
+        self.addCleanup(renderer.reset)
+
+        game = Game.objects.create(name='Frequency Recognition')
+        band = FrequencyBand.objects.create(name='Brilliance', min_frequency=8000, max_frequency=16000,
+                                            center_frequency=12000)
+        self.challenge = EQChallenge.objects.create(game=game, source_audio='drums', frequency_band=band,
+                                                    change_amount=-6, difficulty='beginner')
+        self.url = reverse('eq-challenge-audio', args=[self.challenge.id])
+
+    def test_renders_once_then_serves_from_cache(self):
+        with mock.patch('ear_tune.render_cache.apply_eq', wraps=apply_eq) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            renderer.reset()  # memory cache gone, disk cache remains
+            third = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Type'], 'audio/wav')
+        self.assertEqual(first.content[:4], b'RIFF')
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(third.content, first.content)
+
+    def test_original_and_opus(self):
+        original = self.client.get(self.url, {'version': 'original'})
+        self.assertEqual(sf.info(io.BytesIO(original.content)).frames, 4410)
+        self.assertNotEqual(original.content, self.client.get(self.url).content)
+        opus = self.client.get(self.url, {'codec': 'opus'})
+        self.assertEqual(opus['Content-Type'], 'audio/ogg; codecs=opus')
+        self.assertEqual(self.client.get(self.url, {'codec': 'mp3'}).status_code, 400)
+
+    def test_missing_source(self):
+        EQChallenge.objects.filter(pk=self.challenge.pk).update(source_audio='synth_pad')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_serializer_lists_codecs_smallest_first(self):
+        variants = EQChallengeSerializer(self.challenge).data['audio_variants']
+        self.assertEqual(variants['processed'][0]['codec'], 'opus')
+        self.assertEqual(variants['processed'][-1]['codec'], 'wav')
+        response = self.client.get(variants['original'][0]['url'])
+        self.assertEqual(response['Content-Type'], variants['original'][0]['content_type'])
+
+    def test_range_and_conditional_requests(self):
+        full = self.client.get(self.url)
+        self.assertEqual(full['Accept-Ranges'], 'bytes')
+        partial = self.client.get(self.url, HTTP_RANGE='bytes=0-43')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.content, full.content[:44])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=full['ETag']).status_code, 304)
+        # The original and the processed render are different resources
+        self.assertNotEqual(self.client.get(self.url, {'version': 'original'})['ETag'], full['ETag'])
+
+
+class ChallengeBundleTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='player')
+        self.client.force_authenticate(user=self.user)
+        self.game = Game.objects.create(name='Notes')
+        self.challenges = Challenge.objects.bulk_create([
+            Challenge(game=self.game, challenge_type='note', prompt='Identify this note.', correct_answer=note)
+            for note in 'abcdefg'
+        ])
+        self.session = GameSession.objects.create(user=self.user, challenge=self.challenges[0])
+        self.url = reverse('challenge-bundle')
+
+    def fetch(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_batches_cover_the_pool_before_repeating(self):
+        first = self.fetch(kind='note', game_id=self.game.id, count=4)
+        second = self.fetch(after=first['bundle'], count=4)
+        ids = [c['id'] for c in first['challenges'] + second['challenges']]
+        self.assertEqual(sorted(ids[:7]), sorted(c.id for c in self.challenges))
+        self.assertEqual(len({c['id'] for c in second['challenges']}), 4)
+        self.assertIn('hash', first['challenges'][0]['audio_variants'][0])
+
+    def test_deterministic_per_session(self):
+        params = {'kind': 'note', 'game_id': self.game.id, 'session_id': self.session.id}
+        self.assertEqual(self.fetch(**params)['challenges'], self.fetch(**params)['challenges'])
+        other = GameSession.objects.create(user=User.objects.create(username='other'), challenge=self.challenges[0])
+        self.assertEqual(self.client.get(self.url, {**params, 'session_id': other.id}).status_code, 404)
+        padded = self.fetch(**{**params, 'session_id': f'0{self.session.id}'})
+        self.assertEqual(padded['challenges'], self.fetch(**params)['challenges'])
+        self.assertEqual(self.client.get(self.url, {**params, 'session_id': 'abc'}).status_code, 400)
+
+    def test_request_strings_share_one_index(self):
+        sampler.invalidate()
+        for game_id in [self.game.id, f'0{self.game.id}', f' {self.game.id}']:
+            self.assertEqual(self.client.get(reverse('random-challenge'), {'game_id': game_id}).status_code, 200)
+            self.fetch(kind='note', game_id=game_id)
+        self.assertEqual(self.client.get(reverse('random-challenge'), {'game_id': '1.0'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('random-challenge'), {'game_id': self.game.id + 99}).status_code, 404)
+        for kind in ['eq', 'rhythm']:
+            response = self.client.get(self.url, {'kind': kind, 'difficulty': 'legendary'})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('random-eq-challenge'), {'difficulty': 'x'}).status_code, 404)
+        self.assertEqual(list(sampler._ids),
+                         [('ear_tune.Challenge', (('challenge_type', 'note'), ('game_id', self.game.id)))])
+
+    def test_submit_validates_bundle(self):
+        bundle = self.fetch(kind='note', game_id=self.game.id, count=2)
+        served = bundle['challenges'][0]['id']
+        unserved = next(c.id for c in self.challenges if c.id not in {c['id'] for c in bundle['challenges']})
+
+        def submit(challenge_id, token):
+            return self.client.post(reverse('submit-answer'), {
+                'challenge_id': challenge_id, 'answer': 'x', 'session_id': self.session.id, 'bundle': token
+            }, format='json')
+
+        self.assertEqual(submit(served, bundle['bundle']).status_code, 200)
+        self.assertEqual(submit(unserved, bundle['bundle']).status_code, 400)
+        self.assertEqual(submit(served, bundle['bundle'] + 'x').status_code, 400)
+        # Tokens are bound to the user they were issued to
+        self.client.force_authenticate(user=User.objects.create(username='other'))
+        self.assertEqual(self.client.get(self.url, {'after': bundle['bundle']}).status_code, 400)
+
+    def test_stale_index_is_not_served(self):
+        self.fetch(kind='note', game_id=self.game.id, count=7)
+        # Reclassified and deleted by another process: no signals reach this one
+        Challenge.objects.filter(id=self.challenges[0].id).update(challenge_type='chord')
+        Challenge.objects.filter(id=self.challenges[1].id)._raw_delete('default')
+        bundle = self.fetch(kind='note', game_id=self.game.id, count=7)
+        self.assertEqual(sorted(c['id'] for c in bundle['challenges']), sorted(c.id for c in self.challenges[2:]))
+        self.assertEqual(sorted(load_bundle(bundle['bundle'], self.user.id)['i']),
+                         sorted(c.id for c in self.challenges[2:]))
+
+    def test_eq_bundle_needs_the_game(self):
+        self.assertEqual(self.client.get(self.url, {'kind': 'eq'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'kind': 'piano'}).status_code, 400)
+
+
+class BulkSubmitTests(GameFixtureMixin, APITestCase):
+    def note(self, answer):
+        return {'type': 'note', 'challenge_id': self.challenge.id, 'session_id': self.session.id, 'answer': answer}
+
+    def eq(self, change_amount=6):
+        return {'type': 'eq', 'challenge_id': self.eq_challenge.id, 'frequency_band_id': self.band.id,
+                'change_amount': change_amount}
+
+    def rhythm(self, taps=(5, 490, 1010, 1495)):
+        return {'type': 'rhythm', 'challenge_id': self.rhythm_challenge.id, 'user_taps': list(taps)}
+
+    def submit(self, answers):
+        return self.client.post(reverse('submit-answers-bulk'), {'answers': answers}, format='json')
+
+    def test_matches_single_submissions(self):
+        response = self.submit([self.note('c'), self.note('d'), self.eq(), self.eq(-6), self.rhythm()])
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], [200] * 5)
+        self.assertEqual(results[0]['result'], 'Correct!')
+        self.assertEqual(results[1]['attempts_left'], 2)
+        self.assertEqual([results[2]['correct'], results[3]['correct'], results[4]['score']], [True, False, 100])
+        self.assertEqual(response.data['xp_earned'], sum(r['xp_earned'] for r in results))
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.xp, response.data['xp_earned'])
+        self.assertEqual(profile.total_games_played, 5)
+        self.assertEqual(profile.total_correct_answers, 3)
+        self.assertEqual(profile.total_perfect_scores, 2)
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.score, self.session.attempts_left), (1, 2))
+        self.assertEqual(GameSession.objects.filter(user=self.user).count(), 1 + 2 + 3)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        self.submit([self.note('c'), self.eq(), self.rhythm()])  # create the profile and stats rows
+        with self.assertNumQueries(16) as small:
+            self.submit([self.note('c'), self.eq(), self.rhythm()])
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.submit([self.note('c'), self.eq(), self.rhythm()] * 20)
+
+    def test_invalid_items_do_not_stop_the_batch(self):
+        response = self.submit([
+            {'type': 'piano'}, {'type': 'eq', 'challenge_id': 0}, self.rhythm(taps=['x']),
+            {**self.eq(), 'bundle': 'forged'}, self.note('d'), self.note('d'), self.note('d'), self.note('c'),
+        ])
+        self.assertEqual([r['status'] for r in response.data['results']], [400, 404, 400, 400, 200, 200, 200, 400])
+        self.assertTrue(response.data['results'][6]['game_over'])
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_games_played, 3)
+        self.assertEqual(self.submit([]).status_code, 400)
+
+    def test_ids_are_coerced_like_single_submissions(self):
+        response = self.submit([
+            {**self.note('c'), 'challenge_id': [self.challenge.id]},
+            {**self.note('c'), 'session_id': [self.session.id]},
+            {**self.eq(), 'challenge_id': True},
+            {**self.note('c'), 'challenge_id': str(self.challenge.id), 'session_id': str(self.session.id)},
+            {**self.eq(), 'challenge_id': str(self.eq_challenge.id)},
+        ])
+        self.assertEqual([r['status'] for r in response.data['results']], [400, 400, 400, 200, 200])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.score, 1)
+
+    def test_body_must_be_an_object(self):
+        response = self.client.post(reverse('submit-answers-bulk'), [1, 2], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RhythmTapValidationTests(GameFixtureMixin, APITestCase):
+    def submit(self, taps):
+        return self.client.post(reverse('submit-rhythm-answer'), {
+            'challenge_id': self.rhythm_challenge.id, 'user_taps': taps
+        }, format='json')
+
+    def test_rejects_taps_that_are_not_numbers(self):
+        for taps in ([0, None, 1000, 1500], [True, 500, 1000, 1500], ['0', 500, 1000, 1500]):
+            response = self.submit(taps)
+            self.assertEqual(response.status_code, 400, taps)
+        # The JSON parser reads out-of-range numbers as inf
+        response = self.client.post(
+            reverse('submit-rhythm-answer'),
+            f'{{"challenge_id": {self.rhythm_challenge.id}, "user_taps": [0, 500, 1000, 1e400]}}',
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserProfile.objects.filter(user=self.user, total_games_played__gt=0).exists())
+
+    def test_rejects_too_many_taps(self):
+        self.assertEqual(self.submit(list(range(0, 2000, 10))).status_code, 400)
+        self.assertEqual(self.submit([5, 490, 1010, 1495] * 5).status_code, 200)
+
+    def test_bulk_submit_validates_each_item(self):
+        response = self.client.post(reverse('submit-answers-bulk'), {'answers': [
+            {'type': 'rhythm', 'challenge_id': self.rhythm_challenge.id, 'user_taps': taps}
+            for taps in ([0, None], [False], list(range(1000)), [5, 490, 1010, 1495])
+        ]}, format='json')
+        self.assertEqual([r['status'] for r in response.data['results']], [400, 400, 400, 200])
+
+
+class GameStatsTests(GameFixtureMixin, APITestCase):
+    def play(self):
+        """Two note rounds, two EQ rounds and two rhythm rounds, one of each correct."""
+        for answer in ['c', 'd']:
+            self.client.post(reverse('submit-answer'), {
+                'challenge_id': self.challenge.id, 'answer': answer, 'session_id': self.session.id
+            }, format='json')
+        for change_amount in [6, -6]:
+            self.client.post(reverse('submit-eq-answer'), {
+                'challenge_id': self.eq_challenge.id, 'frequency_band_id': self.band.id,
+                'change_amount': change_amount
+            }, format='json')
+        for taps in [[5, 490, 1010, 1495], [0, 500]]:
+            self.client.post(reverse('submit-rhythm-answer'), {
+                'challenge_id': self.rhythm_challenge.id, 'user_taps': taps
+            }, format='json')
+
+    def stats(self):
+        return (
+            sorted(UserGameStats.objects.filter(user=self.user).values_list(
+                'game_id', 'plays', 'correct', 'perfect_scores', 'best_score', 'accuracy_total'
+            )),
+            sorted(UserBandStats.objects.filter(user=self.user).values_list('frequency_band_id', 'plays', 'correct')),
+        )
+
+    def test_updated_on_each_submit(self):
+        self.play()
+        games, bands = self.stats()
+        self.assertEqual(games, [
+            (self.notes_game.id, 2, 1, 0, 1, 0),
+            (self.eq_challenge.game_id, 2, 1, 1, 100, 0),
+            (self.rhythm_challenge.game_id, 2, 1, 1, 100, 150),
+        ])
+        self.assertEqual(bands, [(self.band.id, 2, 1)])
+
+    def test_bulk_submit_matches_single_submits(self):
+        self.play()
+        single = self.stats()
+        UserGameStats.objects.all().delete()
+        UserBandStats.objects.all().delete()
+        self.session = GameSession.objects.create(user=self.user, challenge=self.challenge)
+        GameSession.objects.filter(user=self.user).exclude(id=self.session.id).delete()
+        self.client.post(reverse('submit-answers-bulk'), {'answers': [
+            {'type': 'note', 'challenge_id': self.challenge.id, 'session_id': self.session.id, 'answer': 'c'},
+            {'type': 'note', 'challenge_id': self.challenge.id, 'session_id': self.session.id, 'answer': 'd'},
+            {'type': 'eq', 'challenge_id': self.eq_challenge.id, 'frequency_band_id': self.band.id,
+             'change_amount': 6},
+            {'type': 'eq', 'challenge_id': self.eq_challenge.id, 'frequency_band_id': self.band.id,
+             'change_amount': -6},
+            {'type': 'rhythm', 'challenge_id': self.rhythm_challenge.id, 'user_taps': [5, 490, 1010, 1495]},
+            {'type': 'rhythm', 'challenge_id': self.rhythm_challenge.id, 'user_taps': [0, 500]},
+        ]}, format='json')
+        self.assertEqual(self.stats(), single)
+
+    def test_rebuild_matches_incremental_stats(self):
+        self.play()
+        incremental = self.stats()
+        UserGameStats.objects.filter(user=self.user).update(plays=0, correct=0)
+        UserBandStats.objects.all().delete()
+        self.assertEqual(rebuild([self.user.id]), (3, 1))
+        self.assertEqual(self.stats(), incremental)
+
+    def test_rebuild_counts_legacy_note_rounds(self):
+        # Attempts recorded before sessions carried their game
+        GameSession.objects.create(user=self.user, challenge=self.challenge, score=1, is_attempt=True,
+                                   parent_session=self.session)
+        GameSession.objects.filter(id=self.session.id).update(score=1)
+        rebuild()
+        self.assertEqual(self.stats(), ([(self.notes_game.id, 1, 1, 0, 1, 0)], []))
+
+    def test_note_session_reaching_100_is_perfect(self):
+        other = GameSession.objects.create(user=self.user, challenge=self.challenge)
+        GameSession.objects.filter(id__in=[self.session.id, other.id]).update(score=99)
+        self.client.post(reverse('submit-answer'), {
+            'challenge_id': self.challenge.id, 'answer': 'c', 'session_id': self.session.id
+        }, format='json')
+        self.client.post(reverse('submit-answers-bulk'), {'answers': [
+            {'type': 'note', 'challenge_id': self.challenge.id, 'session_id': other.id, 'answer': 'c'},
+            {'type': 'note', 'challenge_id': self.challenge.id, 'session_id': other.id, 'answer': 'c'},
+        ]}, format='json')
+        # Same count as the 0010 backfill: every session that reached 100
+        perfect = GameSession.objects.filter(user=self.user, score__gte=100, is_attempt=False).count()
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_perfect_scores, perfect)
+        self.assertEqual(UserGameStats.objects.get(user=self.user, game=self.notes_game).perfect_scores, 2)
+        incremental = self.stats()
+        rebuild([self.user.id])
+        self.assertEqual(self.stats(), incremental)
+
+    def test_profile_includes_game_stats(self):
+        self.play()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('user-profile'))
+        rhythm = next(s for s in response.data['game_stats'] if s['game_name'] == 'Rhythm Recognition')
+        self.assertEqual((rhythm['plays'], rhythm['accuracy'], rhythm['average_accuracy']), (2, 50, 75))
+        self.assertEqual(response.data['band_stats'][0]['frequency_band_name'], 'Mids')
+        self.assertEqual(response.data['band_stats'][0]['accuracy'], 50)
@@ -6,18 +6,22 @@ from .views import (
     GameDetail,
     ChallengeList,
     RandomChallenge,
+    ChallengeBundle,
     GameSessionList,
     CreateGameSession,
     SubmitAnswer,
     RegisterUser,
     FrequencyBandList,
     RandomEQChallenge,
+    EQChallengeAudioView,
     SubmitEQAnswer,
     RandomRhythmChallengeView,
     SubmitRhythmAnswerView,
+    SubmitAnswersBulk,
     UserProfileView,
     AchievementsListView,
     LeaderboardView,
+    LeaderboardMeView,
     UpdateStreakView
 )
 
@@ -26,19 +30,23 @@ urlpatterns = [
     path('games/<int:pk>/', GameDetail.as_view(), name='game-detail'),
     path('challenges/', ChallengeList.as_view(), name='challenge-list'),
     path('challenges/random/', RandomChallenge.as_view(), name='random-challenge'),
+    path('challenges/bundle/', ChallengeBundle.as_view(), name='challenge-bundle'),
     path('game-sessions/', GameSessionList.as_view(), name='game-session-list'),
     path('game-sessions/create/', CreateGameSession.as_view(), name='create-game-session'),
     path('submit-answer/', SubmitAnswer.as_view(), name='submit-answer'),
     path('register/', RegisterUser.as_view(), name='api-register'),
     path('frequency-bands/', FrequencyBandList.as_view(), name='frequency-band-list'),
     path('eq-challenge/random/', RandomEQChallenge.as_view(), name='random-eq-challenge'),
+    path('eq-challenge/<int:pk>/audio/', EQChallengeAudioView.as_view(), name='eq-challenge-audio'),
     path('eq-challenge/submit/', SubmitEQAnswer.as_view(), name='submit-eq-answer'),
     path('rhythm-challenge/random/', RandomRhythmChallengeView.as_view(), name='random-rhythm-challenge'),
     path('rhythm-challenge/submit/', SubmitRhythmAnswerView.as_view(), name='submit-rhythm-answer'),
+    path('submit-answers/', SubmitAnswersBulk.as_view(), name='submit-answers-bulk'),
     # Gamification endpoints
     path('profile/', UserProfileView.as_view(), name='user-profile'),
     path('achievements/', AchievementsListView.as_view(), name='achievements-list'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', LeaderboardMeView.as_view(), name='leaderboard-me'),
     path('update-streak/', UpdateStreakView.as_view(), name='update-streak'),
 
 ]
\ No newline at end of file
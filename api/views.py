@@ -1,63 +1,195 @@
 # api/views.py - Updated API views for the 3-attempts functionality
 
-import random
 from datetime import date, timedelta
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from rest_framework import generics, status, permissions
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from ear_tune.models import Game, Challenge, GameSession, FrequencyBand, EQChallenge, RhythmChallenge, UserProfile, Achievement, UserAchievement, check_and_unlock_achievements
-from .serializers import GameSerializer, ChallengeSerializer, GameSessionSerializer, FrequencyBandSerializer, EQChallengeSerializer, RhythmChallengeSerializer, UserProfileSerializer, AchievementSerializer, UserAchievementSerializer
+from ear_tune.models import Game, Challenge, GameSession, FrequencyBand, EQChallenge, RhythmChallenge, UserProfile, Achievement, UserAchievement, level_for_xp
+from ear_tune.achievements import ACHIEVEMENTS_CACHE_TIMEOUT, user_achievements_cache_key
+from ear_tune.gamification import apply_gamification, calculate_xp
+from ear_tune.leaderboard import leaderboard
+from ear_tune.audio import available_codecs
+from ear_tune.catalogue import catalogue
+from ear_tune.bundles import (
+    DEFAULT_BUNDLE_SIZE, KINDS, MAX_BUNDLE_SIZE, InvalidBundle, bundle_filters, load_bundle, next_bundle,
+    session_seed, verify_bundle,
+)
+from ear_tune.render_cache import SourceNotFound, renderer
+from ear_tune.response_cache import cache_response
+from ear_tune.serving import serve_bytes
+from ear_tune.rhythm import DEFAULT_TOLERANCE_MS, challenge_onsets_ms, check_taps, score_taps
+from ear_tune.sampling import sampler
+from ear_tune.stats import StatsDelta
+from ear_tune.scoring import (
+    NOTE_XP, RHYTHM_CORRECT_ACCURACY, GamificationTotals, eq_answer_is_correct, grade_rhythm,
+    note_answer_is_correct,
+)
+from .async_views import AsyncGenericAPIView
+from .pagination import KeysetPagination
+from .serializers import GameSerializer, ChallengeSerializer, GameSessionSerializer, FrequencyBandSerializer, EQChallengeSerializer, RhythmChallengeSerializer, UserProfileSerializer, AchievementStatusSerializer
+
+def parse_id(value):
+    """
+    An id from request data as an int, or None if it is absent. Ints and numeric
+    strings are accepted, as the ORM lookups of the single endpoints accept them;
+    anything else, bools included, raises ValueError.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    return int(value)
+
+class BundleCheckMixin:
+    """Validates the optional `bundle` a submit request carries against the challenge answered."""
+
+    def check_bundle(self, request, kind, challenge_id):
+        """Return a 400 response if the request has a bundle that does not cover the challenge."""
+        token = request.data.get('bundle')
+        if not token:
+            return None
+        try:
+            verify_bundle(token, request.user.id, kind, challenge_id)
+        except InvalidBundle as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return None
 
 # Keep existing GET views
+@method_decorator(cache_response(Game), name='dispatch')
 class GameList(generics.ListAPIView):  
-    """ GET endpoint that returns a list of all games. """
+    """ GET endpoint that returns a list of all games, served from the catalogue cache. """
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     permission_classes = [permissions.AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        return Response(self.get_serializer(catalogue.games(), many=True).data)
+
+@method_decorator(cache_response(Game), name='dispatch')
 class GameDetail(generics.RetrieveAPIView):
     """ GET endpoint that returns details of a specific game. """
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_object(self):
+        try:
+            return catalogue.game(id=self.kwargs['pk'])
+        except Game.DoesNotExist:
+            raise Http404
+
 class ChallengeList(generics.ListAPIView):
     """ GET endpoint that returns list of challenges of the type 'note'. """
     queryset = Challenge.objects.filter(challenge_type='note')
     serializer_class = ChallengeSerializer
 
-class RandomChallenge(generics.GenericAPIView):
+class RandomChallenge(AsyncGenericAPIView):
     """ GET endpoint that returns a random challenge of type 'note'."""
     serializer_class = ChallengeSerializer
     permission_classes = [permissions.AllowAny]
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         game_id = request.query_params.get('game_id')
         if game_id:
-            challenges = list(Challenge.objects.filter(challenge_type='note', game__id=game_id))
+            # Key the sampler on a known game's int id, not on whatever string was sent
+            try:
+                game = (await catalogue.asnapshot()).game(id=parse_id(game_id))
+            except ValueError:
+                return Response({'detail': 'game_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+            except Game.DoesNotExist:
+                return Response({'detail': 'No Challenges Available.'}, status=status.HTTP_404_NOT_FOUND)
+            challenge = await sampler.achoice(Challenge, challenge_type='note', game_id=game.id)
         else:
-            challenges = list(Challenge.objects.filter(challenge_type='note'))
-        if not challenges:
+            challenge = await sampler.achoice(Challenge, challenge_type='note')
+        if challenge is None:
             return Response({'detail': 'No Challenges Available.'}, status=status.HTTP_404_NOT_FOUND)
-        challenge = random.choice(challenges)
         serializer = self.get_serializer(challenge)
         return Response(serializer.data)
 
+class ChallengeBundle(APIView):
+    """
+    GET endpoint that returns the next few challenges of a game, with their audio URLs and hashes,
+    so clients can prefetch upcoming rounds.
+    Start with ?kind=note|eq|rhythm plus game_id (note) or difficulty (eq, rhythm), and optionally
+    session_id to make the sequence deterministic for that game session; continue with ?after=<bundle>.
+    ?count= sets the batch size. Pass the returned bundle with each answer to have it validated.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_classes = {
+        'note': ChallengeSerializer,
+        'eq': EQChallengeSerializer,
+        'rhythm': RhythmChallengeSerializer,
+    }
+
+    def get(self, request, *args, **kwargs):
+        try:
+            count = min(int(request.query_params.get('count', DEFAULT_BUNDLE_SIZE)), MAX_BUNDLE_SIZE)
+        except ValueError:
+            return Response({'detail': 'count must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        after = request.query_params.get('after')
+        if after:
+            try:
+                payload = load_bundle(after, request.user.id)
+            except InvalidBundle as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            kind, filters, seed, offset = payload['k'], payload['f'], payload['s'], payload['o']
+        else:
+            kind = request.query_params.get('kind', 'note')
+            if kind not in KINDS:
+                return Response({'detail': 'kind must be one of: ' + ', '.join(KINDS)},
+                                status=status.HTTP_400_BAD_REQUEST)
+            try:
+                session_id = parse_id(request.query_params.get('session_id') or None)
+            except ValueError:
+                return Response({'detail': 'session_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                filters = bundle_filters(kind, request.query_params.get('game_id'),
+                                         request.query_params.get('difficulty', 'beginner'))
+            except ValueError as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except Game.DoesNotExist:
+                return Response({'detail': 'Game not found.'}, status=status.HTTP_404_NOT_FOUND)
+            if session_id is not None and not GameSession.objects.filter(id=session_id, user=request.user).exists():
+                return Response({'detail': 'Session not found or does not belong to the user.'},
+                                status=status.HTTP_404_NOT_FOUND)
+            seed, offset = session_seed(request.user.id, session_id), 0
+
+        ids, token = next_bundle(request.user.id, kind, filters, seed, offset, max(count, 1))
+        model = KINDS[kind][0]
+        queryset = model.objects.select_related('frequency_band') if kind == 'eq' else model.objects.all()
+        challenges = queryset.in_bulk(ids)
+        serializer = self.serializer_classes[kind](
+            [challenges[challenge_id] for challenge_id in ids if challenge_id in challenges], many=True
+        )
+        return Response({'kind': kind, 'bundle': token, 'challenges': serializer.data})
+
 class GameSessionList(generics.ListAPIView):
-    """ GET endpoint that returns game sessions for the authenticated user, ordered by the most recent."""
+    """
+    GET endpoint that returns game sessions for the authenticated user, ordered by the most recent.
+    Cursor-paginated ({"next", "results"}); pass ?fields=id,score,... to receive only those fields.
+    """
     serializer_class = GameSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return GameSession.objects.filter(
-            user=self.request.user, 
-            is_attempt=False
-        ).order_by('-date_played')
+        sessions = GameSession.objects.filter(user=self.request.user, is_attempt=False)
+        fields = self.request.query_params.get('fields')
+        if fields and 'game_name' not in {name.strip() for name in fields.split(',')}:
+            return sessions
+        return sessions.select_related('game', 'challenge__game')
     
 class RegisterUser(generics.CreateAPIView):
     """
@@ -122,17 +254,15 @@ class CreateGameSession(generics.CreateAPIView):
             return Response({'detail': 'game_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            game = Game.objects.get(id=game_id)
+            game = catalogue.game(id=game_id)
         except Game.DoesNotExist:
             return Response({'detail': 'Game not found.'}, status=status.HTTP_404_NOT_FOUND)
         
         # Get a random challenge for this game
-        challenges = list(Challenge.objects.filter(game=game))
-        if not challenges:
+        challenge = sampler.choice(Challenge, game_id=game.id)
+        if challenge is None:
             return Response({'detail': 'No challenges available for this game.'}, status=status.HTTP_404_NOT_FOUND)
         
-        challenge = random.choice(challenges)
-        
         # Create a new game session
         session = GameSession.objects.create(
             user=request.user,
@@ -147,14 +277,14 @@ class CreateGameSession(generics.CreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 # Updated SubmitAnswer view
-class SubmitAnswer(generics.GenericAPIView):
+class SubmitAnswer(BundleCheckMixin, AsyncGenericAPIView):
     """ 
     POST endpoint to submit an answer to a challenge.
     Validates the answer, updates the game session, and returns result.
     """
     permission_classes = [permissions.IsAuthenticated]
     
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         challenge_id = request.data.get('challenge_id')
         answer = request.data.get('answer')
         session_id = request.data.get('session_id')
@@ -165,9 +295,13 @@ class SubmitAnswer(generics.GenericAPIView):
         if not session_id:
             return Response({'detail': 'session_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
         
+        bundle_error = self.check_bundle(request, 'note', challenge_id)
+        if bundle_error:
+            return bundle_error
+
         try:
-            challenge = Challenge.objects.get(id=challenge_id)
-            session = GameSession.objects.get(id=session_id, user=request.user)
+            challenge = await Challenge.objects.aget(id=challenge_id)
+            session = await GameSession.objects.aget(id=session_id, user=request.user)
         except Challenge.DoesNotExist:
             return Response({'detail': 'Challenge not found.'}, status=status.HTTP_404_NOT_FOUND)
         except GameSession.DoesNotExist:
@@ -180,7 +314,7 @@ class SubmitAnswer(generics.GenericAPIView):
         # Check if user has attempts left
         if session.attempts_left <= 0:
             session.active = False
-            session.save()
+            await session.asave()
             return Response({
                 'result': 'Game over. No attempts left.',
                 'attempts_left': 0,
@@ -188,20 +322,18 @@ class SubmitAnswer(generics.GenericAPIView):
             }, status=status.HTTP_200_OK)
         
         # Validate the answer
-        user_input = answer.strip().lower()
-        correct_value = challenge.correct_answer.strip().lower()
-        
-        is_correct = False
-        if "_" in correct_value:
-            acceptable = [val.strip().lower() for val in correct_value.split("_")]
-            is_correct = user_input in acceptable
-        else:
-            is_correct = user_input == correct_value
-        
+        is_correct = note_answer_is_correct(challenge, answer)
+
+        response_data = await sync_to_async(self.record_answer)(request.user, challenge, session, is_correct)
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    def record_answer(self, user, challenge, session, is_correct):
+        """Write the attempt, the session and the gamification update; returns the response data."""
         # Create an attempt record
         attempt = GameSession.objects.create(
-            user=request.user,
+            user=user,
             challenge=challenge,
+            game_id=challenge.game_id,
             score=1 if is_correct else 0,
             active=True,
             attempts_left=0,
@@ -209,48 +341,37 @@ class SubmitAnswer(generics.GenericAPIView):
             parent_session=session
         )
 
-        # Get user profile (create if doesn't exist)
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
-
         # Update the parent session
         if is_correct:
             session.score += 1
 
-            # Calculate XP (simplified for note challenge - 100% accuracy)
-            # Base XP: 10, Perfect bonus: +25, Difficulty: assume beginner (1x)
-            base_xp = 10
-            perfect_bonus = 25
-            xp_earned = base_xp + perfect_bonus
-
-            # Award XP and check for level up
-            old_level = profile.level
-            level_up = profile.add_xp(xp_earned)
-            new_level = profile.level
-
-            # Update profile stats
-            profile.total_games_played += 1
-            profile.total_correct_answers += 1
-            profile.update_streak()
-            profile.save()
+            # Note rounds are scored as a perfect beginner round
+            xp_earned = NOTE_XP
 
-            # Check for achievement unlocks
-            unlocked_achievements = check_and_unlock_achievements(request.user)
+            # Award XP, update stats and streak, and check for achievement unlocks
+            # A session reaching 100 counts as a perfect score, as for every other game
+            perfect = session.score == 100
+            game_stats = StatsDelta()
+            game_stats.add(challenge.game_id, correct=True, perfect=perfect, score=session.score)
+            progress = apply_gamification(user, xp_earned=xp_earned, correct_answers=1, perfect_scores=int(perfect),
+                                          game_stats=game_stats)
 
             response_data = {
                 'result': 'Correct!',
                 'score': session.score,
                 'attempts_left': session.attempts_left,
                 'xp_earned': xp_earned,
-                'level_up': level_up,
-                'new_level': new_level,
-                'unlocked_achievements': unlocked_achievements
+                'level_up': progress['level_up'],
+                'new_level': progress['new_level'],
+                'unlocked_achievements': progress['unlocked_achievements']
             }
         else:
             session.attempts_left -= 1
 
             # Update profile stats (game played, but not correct)
-            profile.total_games_played += 1
-            profile.save()
+            game_stats = StatsDelta()
+            game_stats.add(challenge.game_id)
+            apply_gamification(user, update_streak=False, check_achievements=False, game_stats=game_stats)
 
             if session.attempts_left <= 0:
                 session.active = False
@@ -268,39 +389,47 @@ class SubmitAnswer(generics.GenericAPIView):
                 }
 
         session.save()
+        return response_data
 
-        return Response(response_data, status=status.HTTP_200_OK)
-
+@method_decorator(cache_response(FrequencyBand), name='dispatch')
 class FrequencyBandList(generics.ListAPIView):
     """List all frequency bands for reference"""
     queryset = FrequencyBand.objects.all()
     serializer_class = FrequencyBandSerializer
     permission_classes = [permissions.AllowAny]
 
-class RandomEQChallenge(generics.GenericAPIView):
+    def list(self, request, *args, **kwargs):
+        return Response(self.get_serializer(catalogue.frequency_bands(), many=True).data)
+
+class RandomEQChallenge(AsyncGenericAPIView):
     """Get a random EQ challenge."""
     serializer_class = EQChallengeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         difficulty = request.query_params.get('difficulty', 'beginner')
+        if difficulty not in dict(EQChallenge.DIFFICULTY_CHOICES):
+            return Response(
+                {'detail': f'No challenges available for {difficulty} level.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
         # Get challenges for the frequency game
         try:
-            frequency_game = Game.objects.get(name='Frequency Recognition')
-            challenges = EQChallenge.objects.filter(
-                game=frequency_game,
+            frequency_game = (await catalogue.asnapshot()).game(name='Frequency Recognition')
+            challenge = await sampler.achoice(
+                EQChallenge,
+                queryset=EQChallenge.objects.select_related('frequency_band'),
+                game_id=frequency_game.id,
                 difficulty=difficulty
             )
 
-            if not challenges.exists():
+            if challenge is None:
                 return Response(
                     {'detail': f'No challenges available for {difficulty} level.'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Select a random challenge (convert QuerySet to list)
-            challenge = random.choice(list(challenges))
             serializer = self.get_serializer(challenge)
             return Response(serializer.data)
 
@@ -310,17 +439,53 @@ class RandomEQChallenge(generics.GenericAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
     
-class SubmitEQAnswer(generics.GenericAPIView):
+class EQChallengeAudioView(APIView):
+    """
+    GET endpoint that renders an EQ challenge's audio on demand.
+    ?version=processed (default) applies the challenge's EQ, ?version=original returns the source;
+    ?codec=wav (default), opus or aac (when ffmpeg is installed). Renders are cached in memory and on disk.
+    Answers Range and If-None-Match requests, with the render's cache key as a strong ETag.
+    Public, like the static samples it replaces: <audio> elements cannot send a token.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request, pk, *args, **kwargs):
+        version = request.query_params.get('version', 'processed')
+        codec = request.query_params.get('codec', 'wav')
+        codecs = available_codecs()
+        if version not in ('processed', 'original') or codec not in codecs:
+            return Response(
+                {'detail': "version must be 'processed' or 'original' and codec one of: " + ', '.join(codecs)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        challenge = get_object_or_404(EQChallenge.objects.select_related('frequency_band'), pk=pk)
+        gain_db = challenge.change_amount if version == 'processed' else 0
+        try:
+            data, content_type, key = renderer.render(
+                challenge.source_audio, challenge.frequency_band.center_frequency, gain_db, codec
+            )
+        except SourceNotFound:
+            return Response({'detail': 'Source audio not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        return serve_bytes(request, data, content_type, key)
+
+class SubmitEQAnswer(BundleCheckMixin, AsyncGenericAPIView):
     """Submit an answer for an EQ challenge."""
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         challenge_id = request.data.get('challenge_id')
         frequency_band_id = request.data.get('frequency_band_id')
         change_amount = request.data.get('change_amount')
 
+        bundle_error = self.check_bundle(request, 'eq', challenge_id)
+        if bundle_error:
+            return bundle_error
+
         try:
-            challenge = EQChallenge.objects.get(id=challenge_id)
+            challenge = await EQChallenge.objects.select_related('frequency_band').aget(id=challenge_id)
         
         except EQChallenge.DoesNotExist:
             return Response(
@@ -329,60 +494,15 @@ class SubmitEQAnswer(generics.GenericAPIView):
             )
         
         # Check if answer is correct
-        is_correct = (
-            challenge.frequency_band.id == frequency_band_id and
-            challenge.change_amount == change_amount
-        )
+        is_correct = eq_answer_is_correct(challenge, frequency_band_id, change_amount)
 
         # Calculate accuracy (100% if correct, 0% if incorrect)
         accuracy = 100 if is_correct else 0
 
-        # Get user profile (create if doesn't exist)
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
-
         # Calculate XP
-        # Base XP: 10
-        base_xp = 10
+        xp_earned = calculate_xp(accuracy, challenge.difficulty)
 
-        # Accuracy bonus: accuracy * 0.5 (max 50 points for 100%)
-        accuracy_bonus = accuracy * 0.5
-
-        # Difficulty multiplier
-        difficulty_multipliers = {
-            'beginner': 1.0,
-            'intermediate': 1.5,
-            'advanced': 2.0
-        }
-        difficulty_multiplier = difficulty_multipliers.get(challenge.difficulty, 1.0)
-
-        # Perfect score bonus: +25 XP for 100% accuracy
-        perfect_bonus = 25 if accuracy == 100 else 0
-
-        # Calculate total XP
-        xp_earned = int((base_xp + accuracy_bonus) * difficulty_multiplier + perfect_bonus)
-
-        # Award XP and check for level up
-        old_level = profile.level
-        level_up = profile.add_xp(xp_earned)
-        new_level = profile.level
-
-        # Update profile stats
-        profile.total_games_played += 1
-        if is_correct:
-            profile.total_correct_answers += 1
-        profile.update_streak()
-        profile.save()
-
-        # Check for achievement unlocks
-        unlocked_achievements = check_and_unlock_achievements(request.user)
-
-        # Create a game session record
-        session = GameSession.objects.create(
-            user=request.user,
-            challenge=None,
-            score=100 if is_correct else 0,
-            active=False
-        )
+        progress = await sync_to_async(self.record_answer)(request.user, challenge, is_correct, xp_earned)
 
         response_data = {
             'correct': is_correct,
@@ -391,9 +511,9 @@ class SubmitEQAnswer(generics.GenericAPIView):
                 'change_amount': challenge.change_amount
             },
             'xp_earned': xp_earned,
-            'level_up': level_up,
-            'new_level': new_level,
-            'unlocked_achievements': unlocked_achievements
+            'level_up': progress['level_up'],
+            'new_level': progress['new_level'],
+            'unlocked_achievements': progress['unlocked_achievements']
         }
         if not is_correct:
             response_data['user_answer'] = {
@@ -403,30 +523,59 @@ class SubmitEQAnswer(generics.GenericAPIView):
 
         return Response(response_data, status=status.HTTP_200_OK)
 
-class RandomRhythmChallengeView(generics.GenericAPIView):
+    def record_answer(self, user, challenge, is_correct, xp_earned):
+        """Write the session and the gamification update; returns apply_gamification()'s result."""
+        # Create a game session record
+        session = GameSession.objects.create(
+            user=user,
+            challenge=None,
+            game_id=challenge.game_id,
+            frequency_band_id=challenge.frequency_band_id,
+            score=100 if is_correct else 0,
+            active=False
+        )
+
+        game_stats = StatsDelta()
+        game_stats.add(challenge.game_id, correct=is_correct, perfect=is_correct, score=session.score,
+                       frequency_band_id=challenge.frequency_band_id)
+
+        # Award XP, update stats and streak, and check for achievement unlocks
+        return apply_gamification(
+            user,
+            xp_earned=xp_earned,
+            correct_answers=1 if is_correct else 0,
+            perfect_scores=1 if session.score == 100 else 0,
+            game_stats=game_stats
+        )
+
+class RandomRhythmChallengeView(AsyncGenericAPIView):
     """GET endpoint that returns a random rhythm challenge."""
     serializer_class = RhythmChallengeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         difficulty = request.query_params.get('difficulty', 'beginner')
+        if difficulty not in dict(RhythmChallenge.DIFFICULTY_CHOICES):
+            return Response(
+                {'detail': f'No challenges available for {difficulty} level.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
         # Get challenges for the rhythm game
         try:
-            rhythm_game = Game.objects.get(name='Rhythm Recognition')
-            challenges = RhythmChallenge.objects.filter(
-                game=rhythm_game,
+            rhythm_game = (await catalogue.asnapshot()).game(name='Rhythm Recognition')
+            challenge = await sampler.achoice(
+                RhythmChallenge,
+                game_id=rhythm_game.id,
                 difficulty=difficulty
             )
 
-            if not challenges.exists():
+            if challenge is None:
                 return Response(
                     {'detail': f'No challenges available for {difficulty} level.'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Select a random challenge (convert QuerySet to list)
-            challenge = random.choice(list(challenges))
             serializer = self.get_serializer(challenge)
             return Response(serializer.data)
 
@@ -436,15 +585,15 @@ class RandomRhythmChallengeView(generics.GenericAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class SubmitRhythmAnswerView(generics.GenericAPIView):
+class SubmitRhythmAnswerView(BundleCheckMixin, AsyncGenericAPIView):
     """
     POST endpoint to submit and validate a rhythm answer.
-    Compares user's tapped timestamps with correct pattern using a tolerance of ±100ms.
-    Returns accuracy percentage, feedback, and score.
+    Matches user's tapped timestamps one-to-one with the correct pattern using a tolerance of ±100ms.
+    Returns accuracy percentage, feedback, score and timing statistics.
     """
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         challenge_id = request.data.get('challenge_id')
         user_taps = request.data.get('user_taps')  # Expected to be a list of timestamps in ms
 
@@ -454,131 +603,264 @@ class SubmitRhythmAnswerView(generics.GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        bundle_error = self.check_bundle(request, 'rhythm', challenge_id)
+        if bundle_error:
+            return bundle_error
+
         try:
-            challenge = RhythmChallenge.objects.get(id=challenge_id)
+            challenge = await RhythmChallenge.objects.aget(id=challenge_id)
         except RhythmChallenge.DoesNotExist:
             return Response(
                 {'detail': 'Challenge not found.'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get the correct pattern (timestamps in ms)
-        correct_pattern = challenge.correct_pattern
-
-        # Validate that user_taps is a list
-        if not isinstance(user_taps, list):
-            return Response(
-                {'detail': 'user_taps must be a list of timestamps.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # Only finite numbers, at most a few taps per onset, before anything is sorted or matched
+        expected = challenge_onsets_ms(challenge)
+        try:
+            check_taps(user_taps, len(expected))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calculate accuracy with ±100ms tolerance
-        tolerance = 100  # milliseconds
-        correct_count = 0
-        total_expected = len(correct_pattern)
-
-        # Match each expected tap with the closest user tap
-        matched_user_taps = set()
-
-        for correct_tap in correct_pattern:
-            for i, user_tap in enumerate(user_taps):
-                if i not in matched_user_taps:
-                    if abs(user_tap - correct_tap) <= tolerance:
-                        correct_count += 1
-                        matched_user_taps.add(i)
-                        break
-
-        # Calculate accuracy percentage
-        if total_expected > 0:
-            accuracy = (correct_count / total_expected) * 100
-        else:
-            accuracy = 0
+        # Match taps one-to-one with the expected onsets, ±100ms tolerance
+        result = score_taps(expected, user_taps, tolerance=DEFAULT_TOLERANCE_MS)
+        accuracy = result['accuracy']
 
         # Calculate score based on accuracy
-        if accuracy >= 90:
-            score = 100
-            feedback = "Excellent! Perfect rhythm!"
-            correct = True
-        elif accuracy >= 75:
-            score = 75
-            feedback = "Great job! Very close to the beat!"
-            correct = False
-        elif accuracy >= 60:
-            score = 50
-            feedback = "Good effort! Keep practicing your timing."
-            correct = False
-        elif accuracy >= 40:
-            score = 25
-            feedback = "Not quite there. Try listening more carefully to the rhythm."
-            correct = False
-        else:
-            score = 0
-            feedback = "Keep practicing! Listen to the pattern carefully."
-            correct = False
-
-        # Get user profile (create if doesn't exist)
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
+        score, feedback = grade_rhythm(accuracy)
+        correct = accuracy >= RHYTHM_CORRECT_ACCURACY
 
         # Calculate XP
-        # Base XP: 10
-        base_xp = 10
+        xp_earned = calculate_xp(accuracy, challenge.difficulty)
 
-        # Accuracy bonus: accuracy * 0.5 (max 50 points for 100%)
-        accuracy_bonus = accuracy * 0.5
+        progress = await sync_to_async(self.record_answer)(
+            request.user, challenge, score, accuracy, correct, xp_earned
+        )
 
-        # Difficulty multiplier
-        difficulty_multipliers = {
-            'beginner': 1.0,
-            'intermediate': 1.5,
-            'advanced': 2.0
+        response_data = {
+            'accuracy': round(accuracy, 2),
+            'score': score,
+            'feedback': feedback,
+            'correct': correct,
+            'correct_taps': result['correct_taps'],
+            'total_expected': result['total_expected'],
+            'user_tap_count': len(user_taps),
+            'timing_offsets': result['offsets'],
+            'mean_offset_ms': result['mean_offset_ms'],
+            'std_offset_ms': result['std_offset_ms'],
+            'tempo_drift': result['tempo_drift'],
+            'xp_earned': xp_earned,
+            'level_up': progress['level_up'],
+            'new_level': progress['new_level'],
+            'unlocked_achievements': progress['unlocked_achievements']
         }
-        difficulty_multiplier = difficulty_multipliers.get(challenge.difficulty, 1.0)
-
-        # Perfect score bonus: +25 XP for 100% accuracy
-        perfect_bonus = 25 if accuracy == 100 else 0
-
-        # Calculate total XP
-        xp_earned = int((base_xp + accuracy_bonus) * difficulty_multiplier + perfect_bonus)
-
-        # Award XP and check for level up
-        old_level = profile.level
-        level_up = profile.add_xp(xp_earned)
-        new_level = profile.level
 
-        # Update profile stats
-        profile.total_games_played += 1
-        if accuracy >= 90:  # Consider >= 90% as correct
-            profile.total_correct_answers += 1
-        profile.update_streak()
-        profile.save()
-
-        # Check for achievement unlocks
-        unlocked_achievements = check_and_unlock_achievements(request.user)
+        return Response(response_data, status=status.HTTP_200_OK)
 
+    def record_answer(self, user, challenge, score, accuracy, correct, xp_earned):
+        """Write the session and the gamification update; returns apply_gamification()'s result."""
         # Create a game session record
         session = GameSession.objects.create(
-            user=request.user,
+            user=user,
             challenge=None,  # RhythmChallenge is separate from Challenge model
+            game_id=challenge.game_id,
             score=score,
+            accuracy=accuracy,
             active=False
         )
 
-        response_data = {
+        game_stats = StatsDelta()
+        game_stats.add(challenge.game_id, correct=correct, perfect=session.score == 100, score=score,
+                       accuracy=accuracy)
+
+        # Award XP, update stats and streak, and check for achievement unlocks
+        # (>= 90% accuracy counts as a correct answer)
+        return apply_gamification(
+            user,
+            xp_earned=xp_earned,
+            correct_answers=1 if correct else 0,
+            perfect_scores=1 if session.score == 100 else 0,
+            game_stats=game_stats
+        )
+
+class SubmitAnswersBulk(generics.GenericAPIView):
+    """
+    POST endpoint that scores an ordered batch of answers across game types in one transaction,
+    for offline play and clients that queue answers.
+
+    Body: {"answers": [
+        {"type": "note", "challenge_id", "answer", "session_id"},
+        {"type": "eq", "challenge_id", "frequency_band_id", "change_amount"},
+        {"type": "rhythm", "challenge_id", "user_taps"}, ...]}
+    Each item may carry the `bundle` it was served with. Items are scored in order, as if submitted
+    one by one; an invalid item gets an error result and does not stop the others.
+    Returns per-item results (with the status code the single endpoint would have used) and the
+    combined XP, level and achievement changes.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_answers = 100
+
+    def post(self, request, *args, **kwargs):
+        answers = request.data.get('answers') if isinstance(request.data, dict) else None
+        if not isinstance(answers, list) or not answers or not all(isinstance(a, dict) for a in answers):
+            return Response({'detail': 'answers must be a non-empty list of objects.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(answers) > self.max_answers:
+            return Response({'detail': f'At most {self.max_answers} answers per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        keys = [self.parse_keys(answer) for answer in answers]
+
+        def ids(answer_type, index=0):
+            return {key[index] for answer, key in zip(answers, keys)
+                    if key and answer.get('type') == answer_type and key[index] is not None}
+
+        with transaction.atomic():
+            challenges = {
+                'note': Challenge.objects.in_bulk(ids('note')),
+                'eq': EQChallenge.objects.select_related('frequency_band').in_bulk(ids('eq')),
+                'rhythm': RhythmChallenge.objects.in_bulk(ids('rhythm')),
+            }
+            sessions = GameSession.objects.select_for_update().filter(user=request.user).in_bulk(ids('note', 1))
+
+            totals = GamificationTotals()
+            new_sessions, changed_sessions, results = [], {}, []
+            for answer, key in zip(answers, keys):
+                if key is None:
+                    result = {'status': 400, 'detail': 'challenge_id and session_id must be integers.'}
+                else:
+                    challenge_id, session_id = key
+                    result = self.score(request.user, answer, challenge_id, sessions.get(session_id), challenges,
+                                        totals, new_sessions)
+                    if session_id in sessions:
+                        changed_sessions[session_id] = sessions[session_id]
+                results.append({'type': answer.get('type'), 'challenge_id': answer.get('challenge_id'), **result})
+
+            GameSession.objects.bulk_create(new_sessions)
+            if changed_sessions:
+                GameSession.objects.bulk_update(changed_sessions.values(), ['score', 'attempts_left', 'active'])
+            progress = {'level_up': False, 'new_level': None, 'unlocked_achievements': []}
+            if totals.games_played:
+                progress = apply_gamification(request.user, **totals.as_kwargs())
+
+        return Response({
+            'results': results,
+            'xp_earned': totals.xp_earned,
+            'level_up': progress['level_up'],
+            'new_level': progress['new_level'],
+            'unlocked_achievements': progress['unlocked_achievements'],
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def parse_keys(answer):
+        """
+        (challenge_id, session_id) of an answer as ints or None, session_id for note answers only;
+        None if either is malformed.
+        """
+        try:
+            return (parse_id(answer.get('challenge_id')),
+                    parse_id(answer.get('session_id')) if answer.get('type') == 'note' else None)
+        except ValueError:
+            return None
+
+    def score(self, user, answer, challenge_id, session, challenges, totals, new_sessions):
+        """Score one answer against the preloaded rows; returns its result dict."""
+        answer_type = answer.get('type')
+        if answer_type not in challenges:
+            return {'status': 400, 'detail': 'type must be one of: ' + ', '.join(challenges)}
+        challenge = challenges[answer_type].get(challenge_id)
+        if challenge is None:
+            return {'status': 404, 'detail': 'Challenge not found.'}
+        if answer.get('bundle'):
+            try:
+                verify_bundle(answer['bundle'], user.id, answer_type, challenge.id)
+            except InvalidBundle as e:
+                return {'status': 400, 'detail': str(e)}
+        return getattr(self, f'score_{answer_type}')(user, answer, challenge, session, totals, new_sessions)
+
+    def score_note(self, user, answer, challenge, session, totals, new_sessions):
+        if not isinstance(answer.get('answer'), str) or not answer['answer'].strip():
+            return {'status': 400, 'detail': 'answer is required.'}
+        if session is None:
+            return {'status': 404, 'detail': 'Session not found or does not belong to the user.'}
+        if not session.active:
+            return {'status': 400, 'detail': 'This game session has ended.'}
+        if session.attempts_left <= 0:
+            session.active = False
+            return {'status': 200, 'result': 'Game over. No attempts left.', 'attempts_left': 0,
+                    'score': session.score}
+
+        is_correct = note_answer_is_correct(challenge, answer['answer'])
+        new_sessions.append(GameSession(
+            user=user, challenge=challenge, game_id=challenge.game_id, score=1 if is_correct else 0, active=True,
+            attempts_left=0, is_attempt=True, parent_session=session
+        ))
+        if is_correct:
+            session.score += 1
+            perfect = session.score == 100
+            totals.add(xp_earned=NOTE_XP, correct_answers=1, perfect_scores=int(perfect))
+            totals.game_stats.add(challenge.game_id, correct=True, perfect=perfect, score=session.score)
+            return {'status': 200, 'result': 'Correct!', 'score': session.score,
+                    'attempts_left': session.attempts_left, 'xp_earned': NOTE_XP}
+
+        session.attempts_left -= 1
+        totals.add(update_streak=False, check_achievements=False)
+        totals.game_stats.add(challenge.game_id)
+        if session.attempts_left <= 0:
+            session.active = False
+            return {'status': 200, 'result': 'Incorrect. Game Over!', 'score': session.score,
+                    'attempts_left': 0, 'game_over': True, 'xp_earned': 0}
+        return {'status': 200, 'result': f'Incorrect. You have {session.attempts_left} attempts left.',
+                'score': session.score, 'attempts_left': session.attempts_left, 'xp_earned': 0}
+
+    def score_eq(self, user, answer, challenge, session, totals, new_sessions):
+        is_correct = eq_answer_is_correct(challenge, answer.get('frequency_band_id'), answer.get('change_amount'))
+        xp_earned = calculate_xp(100 if is_correct else 0, challenge.difficulty)
+        new_sessions.append(GameSession(
+            user=user, challenge=None, game_id=challenge.game_id, frequency_band_id=challenge.frequency_band_id,
+            score=100 if is_correct else 0, active=False
+        ))
+        totals.add(xp_earned=xp_earned, correct_answers=int(is_correct), perfect_scores=int(is_correct))
+        totals.game_stats.add(challenge.game_id, correct=is_correct, perfect=is_correct, score=100 if is_correct else 0,
+                              frequency_band_id=challenge.frequency_band_id)
+        return {
+            'status': 200,
+            'correct': is_correct,
+            'correct_answer': {
+                'frequency_band': challenge.frequency_band.name,
+                'change_amount': challenge.change_amount
+            },
+            'xp_earned': xp_earned,
+        }
+
+    def score_rhythm(self, user, answer, challenge, session, totals, new_sessions):
+        user_taps = answer.get('user_taps')
+        expected = challenge_onsets_ms(challenge)
+        try:
+            check_taps(user_taps, len(expected))
+        except ValueError as e:
+            return {'status': 400, 'detail': str(e)}
+        result = score_taps(expected, user_taps, tolerance=DEFAULT_TOLERANCE_MS)
+        accuracy = result['accuracy']
+        score, feedback = grade_rhythm(accuracy)
+        correct = accuracy >= RHYTHM_CORRECT_ACCURACY
+        xp_earned = calculate_xp(accuracy, challenge.difficulty)
+        new_sessions.append(GameSession(
+            user=user, challenge=None, game_id=challenge.game_id, score=score, accuracy=accuracy, active=False
+        ))
+        totals.add(xp_earned=xp_earned, correct_answers=int(correct), perfect_scores=int(score == 100))
+        totals.game_stats.add(challenge.game_id, correct=correct, perfect=score == 100, score=score, accuracy=accuracy)
+        return {
+            'status': 200,
             'accuracy': round(accuracy, 2),
             'score': score,
             'feedback': feedback,
             'correct': correct,
-            'correct_taps': correct_count,
-            'total_expected': total_expected,
-            'user_tap_count': len(user_taps),
+            'correct_taps': result['correct_taps'],
+            'total_expected': result['total_expected'],
             'xp_earned': xp_earned,
-            'level_up': level_up,
-            'new_level': new_level,
-            'unlocked_achievements': unlocked_achievements
         }
 
-        return Response(response_data, status=status.HTTP_200_OK)
-
 # Gamification API Views
 
 class UserProfileView(generics.RetrieveAPIView):
@@ -591,63 +873,83 @@ class UserProfileView(generics.RetrieveAPIView):
     def get_object(self):
         """Return the current user's profile, creating it if it doesn't exist."""
         profile, created = UserProfile.objects.get_or_create(user=self.request.user)
+        profile.user = self.request.user
         return profile
 
 class AchievementsListView(generics.ListAPIView):
     """
     GET endpoint that returns all achievements with locked/unlocked status for the current user.
+    The response is cached per user until they unlock an achievement or the catalogue changes.
     """
-    serializer_class = AchievementSerializer
+    serializer_class = AchievementStatusSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """Return all achievements."""
-        return Achievement.objects.all()
+        """Return all achievements, annotated with the user's unlock time (NULL if locked)."""
+        unlocked_at = UserAchievement.objects.filter(
+            user=self.request.user,
+            achievement=OuterRef('pk')
+        ).values('unlocked_at')[:1]
+        return Achievement.objects.annotate(unlocked_at=Subquery(unlocked_at))
 
     def list(self, request, *args, **kwargs):
-        """Override list to include locked/unlocked status."""
-        achievements = self.get_queryset()
-        user_achievements = UserAchievement.objects.filter(user=request.user).values_list('achievement_id', flat=True)
-
-        achievements_data = []
-        for achievement in achievements:
-            achievement_data = AchievementSerializer(achievement).data
-            achievement_data['unlocked'] = achievement.id in user_achievements
-
-            # If unlocked, get the unlock date
-            if achievement_data['unlocked']:
-                user_achievement = UserAchievement.objects.get(user=request.user, achievement=achievement)
-                achievement_data['unlocked_at'] = user_achievement.unlocked_at
-            else:
-                achievement_data['unlocked_at'] = None
-
-            achievements_data.append(achievement_data)
+        """Override list to serve the cached response when there is one."""
+        cache_key = user_achievements_cache_key(request.user.id)
+        achievements_data = cache.get(cache_key)
+        if achievements_data is None:
+            achievements_data = self.get_serializer(self.get_queryset(), many=True).data
+            cache.set(cache_key, achievements_data, ACHIEVEMENTS_CACHE_TIMEOUT)
 
         return Response(achievements_data)
 
-class LeaderboardView(generics.ListAPIView):
+def leaderboard_rows(entries):
+    """Turn (rank, user_id, xp) leaderboard entries into response rows."""
+    usernames = dict(User.objects.filter(id__in=[user_id for _, user_id, _ in entries]).values_list('id', 'username'))
+    return [
+        {
+            'rank': rank,
+            'username': usernames.get(user_id),
+            'current_xp': xp,
+            'level': level_for_xp(xp)
+        }
+        for rank, user_id, xp in entries
+    ]
+
+class LeaderboardView(APIView):
     """
-    GET endpoint that returns the top 10 users by XP.
+    GET endpoint that returns a page of users ranked by XP (top 10 by default).
+    Accepts `offset` and `limit` (max 100) query parameters.
     """
-    serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        """Return top 10 users by XP."""
-        return UserProfile.objects.select_related('user').order_by('-xp')[:10]
+    def get(self, request, *args, **kwargs):
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'detail': 'offset and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    def list(self, request, *args, **kwargs):
-        """Override list to include username and rank."""
-        queryset = self.get_queryset()
+        return Response(leaderboard_rows(leaderboard.page(offset, limit)))
+
+class LeaderboardMeView(APIView):
+    """
+    GET endpoint that returns the current user's rank with the users
+    ranked just above and below them (`radius`, default 5, max 50).
+    """
+    permission_classes = [IsAuthenticated]
 
-        leaderboard_data = []
-        for rank, profile in enumerate(queryset, start=1):
-            profile_data = UserProfileSerializer(profile).data
-            profile_data['rank'] = rank
-            profile_data['username'] = profile.user.username
-            leaderboard_data.append(profile_data)
+    def get(self, request, *args, **kwargs):
+        try:
+            radius = min(max(int(request.query_params.get('radius', 5)), 0), 50)
+        except ValueError:
+            return Response({'detail': 'radius must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(leaderboard_data)
+        UserProfile.objects.get_or_create(user=request.user)
+        return Response({
+            'rank': leaderboard.rank(request.user.id),
+            'total_players': len(leaderboard),
+            'entries': leaderboard_rows(leaderboard.around(request.user.id, radius))
+        })
 
 class UpdateStreakView(APIView):
     """
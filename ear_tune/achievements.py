@@ -0,0 +1,77 @@
+"""
+Incremental achievement engine.
+
+The achievement catalogue comes from the process-local catalogue cache
+(ear_tune.catalogue), which keeps a sorted list of thresholds per criteria
+type. An answer only evaluates the criteria whose counter changed: the
+thresholds the user has not reached yet are bisected against the new
+counter value, so the work is proportional to the changed criteria rather
+than to the size of the catalogue.
+"""
+
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalogue import catalogue, catalogue_version
+from .models import Achievement, UserAchievement
+
+CRITERIA_TYPES = [criteria_type for criteria_type, _ in Achievement.CRITERIA_TYPE_CHOICES]
+
+# Per-user achievement list responses; see user_achievements_cache_key()
+ACHIEVEMENTS_CACHE_TIMEOUT = 300
+
+
+def criteria_counters(stats):
+    """
+    Map each criteria type to the user's current value for it.
+    `stats` is a UserProfile or a dict with the same field names.
+    """
+    get = stats.get if isinstance(stats, dict) else lambda name: getattr(stats, name)
+    games_played = get('total_games_played')
+    accuracy = (get('total_correct_answers') / games_played) * 100 if games_played > 0 else 0
+    return {
+        'games_played': games_played,
+        'streak': get('current_streak'),
+        'accuracy': accuracy,
+        'level': get('level'),
+        'perfect_scores': get('total_perfect_scores'),
+    }
+
+
+def changed_criteria(before, after):
+    """Return the criteria types whose counter differs between two snapshots."""
+    return {criteria_type for criteria_type, value in after.items() if before.get(criteria_type) != value}
+
+
+def reached_achievements(criteria_type, value, unlocked_ids):
+    """
+    Return the achievements of a criteria type the user has reached with
+    `value` but not unlocked yet, lowest threshold first.
+    """
+    pending = [a for a in catalogue.achievements(criteria_type) if a.id not in unlocked_ids]
+    thresholds = [a.criteria_value for a in pending]
+    return pending[:bisect_right(thresholds, value)]
+
+
+def user_achievements_cache_key(user_id):
+    """
+    Cache key for a user's achievement list. The catalogue version is part of
+    the key, so editing an achievement invalidates every user's entry at once.
+    """
+    return f'achievements:list:{catalogue_version()}:{user_id}'
+
+
+def invalidate_user_achievements(user_id):
+    """Drop a user's cached achievement list after they unlock something."""
+    cache.delete(user_achievements_cache_key(user_id))
+
+
+@receiver(post_save, sender=UserAchievement)
+@receiver(post_delete, sender=UserAchievement)
+def invalidate_user_achievement_list(sender, instance, created=True, **kwargs):
+    """Drop the owner's cached achievement list when an unlock is added or removed."""
+    if created:
+        invalidate_user_achievements(instance.user_id)
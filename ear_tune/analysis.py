@@ -0,0 +1,271 @@
+"""
+Measured audibility of EQ challenges.
+
+A challenge boosts or cuts one frequency band of a source stem, but how
+much of that change reaches the listener depends on the source: a cut at
+40 Hz does nothing to a pad with no energy below 400 Hz. For every source
+this module measures what each (band, gain) of ear_tune.eq does to the
+band's level relative to the rest of the spectrum (Welch power spectra). Comparing the band with the
+rest, rather than with the full-scale level, measures the change in
+spectral balance the player has to name and ignores plain level changes,
+such as the normalization mix_eq() applies to boosts that would clip.
+Both are floored NOISE_FLOOR_DB below the signal's total power, so a
+change to a band the source has nothing in measures as zero.
+
+Features are cached by the source file's SHA-256 in a FeatureStore, a
+columnar .npz file, so a rerun only analyzes new or changed stems.
+analyze_library() spreads the rest over a process pool, one file per job.
+Nothing here needs Django; scripts/create_eq_challenges.py turns the
+measurements into challenges.
+"""
+
+import hashlib
+import inspect
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+from .eq import Q_FACTOR, RENDER_CODE_VERSION, mix_coefficients, peak_filter
+
+# Welch segment length: ~10.8 Hz resolution at 44.1 kHz, enough to resolve the 20-60 Hz band
+SEGMENT_SAMPLES = 4096
+
+# Band and rest-of-spectrum power are floored this far below the source's total power
+NOISE_FLOOR_DB = -40.0
+
+# Measured changes below this many dB are treated as inaudible
+AUDIBLE_DELTA_DB = 1.0
+
+# Minimum measured change (dB) for each difficulty; below the last, a challenge is inaudible
+DIFFICULTY_THRESHOLDS = [(6.0, 'beginner'), (3.0, 'intermediate'), (AUDIBLE_DELTA_DB, 'advanced')]
+
+
+def spectra(x, y, sample_rate, segment_samples=SEGMENT_SAMPLES, block_frames=256):
+    """
+    Welch auto and cross spectra of two equal-length signals (Hann window,
+    50% overlap, mean removed per segment), unscaled since only their
+    ratios are used. Segments are transformed `block_frames` at a time in
+    one FFT call each, which bounds memory on long files.
+    Returns (frequencies, Pxx, Pyy, real part of Pxy).
+    """
+    segment_samples = min(segment_samples, len(x))
+    hop = max(segment_samples // 2, 1)
+    window = signal.get_window('hann', segment_samples)
+    x_frames = np.lib.stride_tricks.sliding_window_view(x, segment_samples)[::hop]
+    y_frames = np.lib.stride_tricks.sliding_window_view(y, segment_samples)[::hop]
+    pxx, pyy, pxy = (np.zeros(segment_samples // 2 + 1) for _ in range(3))
+    for start in range(0, len(x_frames), block_frames):
+        transforms = []
+        for frames in (x_frames, y_frames):
+            block = frames[start:start + block_frames]
+            transforms.append(np.fft.rfft((block - block.mean(axis=1, keepdims=True)) * window, axis=1))
+        x_block, y_block = transforms
+        pxx += (x_block.real ** 2 + x_block.imag ** 2).sum(axis=0)
+        pyy += (y_block.real ** 2 + y_block.imag ** 2).sum(axis=0)
+        pxy += (x_block * y_block.conj()).real.sum(axis=0)
+    frames = len(x_frames)
+    return np.fft.rfftfreq(segment_samples, 1 / sample_rate), pxx / frames, pyy / frames, pxy / frames
+
+
+def band_contrast_db(frequencies, power, bands):
+    """
+    Power of each (min_frequency, max_frequency) band relative to the rest
+    of the spectrum, in dB, both floored NOISE_FLOOR_DB below the total.
+    """
+    total = power.sum()
+    floor_power = max(total * 10 ** (NOISE_FLOOR_DB / 10), np.finfo(np.float64).tiny)
+    band_power = np.array([power[(frequencies >= low) & (frequencies < high)].sum() for low, high, *_ in bands])
+    rest_power = total - band_power
+    return 10 * np.log10(np.maximum(band_power, floor_power) / np.maximum(rest_power, floor_power))
+
+
+def analyze_audio(audio_data, sample_rate, bands, gains):
+    """
+    Measure every (band, gain) render of one source.
+    `bands` is a list of (min_frequency, max_frequency, center_frequency).
+    Returns (band_level_db, delta_db): each band's share of the source's
+    power, shape (bands,), and the change in the band's level relative to
+    the rest of the spectrum for each gain, shape (bands, gains).
+
+    A render is a * x + b * filtered, rescaled if it would clip (see
+    mix_coefficients()), and the contrast ignores the rescale. So each
+    render's spectrum is a^2 Pxx + b^2 Pff + 2ab Re(Pxf): one set of
+    spectra per band covers all of its gains without rendering them.
+    """
+    audio_data = np.asarray(audio_data, dtype=np.float64)
+    coefficients = [mix_coefficients(gain_db) for gain_db in gains]
+    original = None
+    delta_db = np.zeros((len(bands), len(gains)), dtype=np.float32)
+    for band_index, (_, _, center_freq) in enumerate(bands):
+        # One filter pass per band, shared by all of its gains, as in the renderer
+        filtered = peak_filter(audio_data, sample_rate, center_freq, Q_FACTOR)
+        frequencies, pxx, pff, pxf = spectra(audio_data, filtered, sample_rate)
+        if original is None:
+            # Pxx is the same for every band
+            original = band_contrast_db(frequencies, pxx, bands)
+        for gain_index, (a, b) in enumerate(coefficients):
+            processed = band_contrast_db(frequencies, a * a * pxx + b * b * pff + 2 * a * b * pxf, bands)
+            delta_db[band_index, gain_index] = processed[band_index] - original[band_index]
+
+    # A band's share of the whole, from its contrast with the rest: b / (b + r)
+    band_level_db = -10 * np.log10(1 + 10 ** (-original / 10))
+    return band_level_db.astype(np.float32), delta_db
+
+
+def analyze_file(path, bands, gains):
+    """analyze_audio() for a stem on disk, downmixed to mono (runs in a worker)."""
+    audio_data, sample_rate = sf.read(path)
+    if audio_data.ndim > 1:
+        audio_data = audio_data.mean(axis=1)
+    return analyze_audio(audio_data, sample_rate, bands, gains)
+
+
+def difficulty_for(delta_db, thresholds=DIFFICULTY_THRESHOLDS):
+    """Difficulty of a challenge by the size of its measured change, or None if it is inaudible."""
+    for minimum, difficulty in thresholds:
+        if abs(delta_db) >= minimum:
+            return difficulty
+    return None
+
+
+# Changes whenever the measurement or the rendering does, which drops every cached feature
+ANALYSIS_VERSION = hashlib.sha256(
+    (RENDER_CODE_VERSION + inspect.getsource(spectra) + inspect.getsource(band_contrast_db)
+     + inspect.getsource(mix_coefficients) + inspect.getsource(analyze_audio)
+     + repr((SEGMENT_SAMPLES, NOISE_FLOOR_DB, Q_FACTOR))).encode()
+).hexdigest()[:16]
+
+
+class FeatureStore:
+    """
+    Cached features, saved as one .npz of flat columns: a files table
+    (path, size, mtime_ns, sha256) that lets unchanged files skip hashing,
+    and a features table with one row per (sha256, band, gain). Rows are
+    keyed by file contents, so renamed or copied stems are not analyzed
+    again. A store written by another ANALYSIS_VERSION loads empty.
+    """
+
+    FILE_COLUMNS = ('path', 'size', 'mtime_ns', 'sha256')
+    FEATURE_COLUMNS = ('sha256', 'min_frequency', 'max_frequency', 'center_frequency', 'gain_db',
+                       'band_level_db', 'delta_db')
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}  # path -> (size, mtime_ns, sha256)
+        self.features = {}  # (sha256, min, max, center, gain) -> (band_level_db, delta_db)
+        try:
+            with np.load(path) as data:
+                if str(data['version']) == ANALYSIS_VERSION:
+                    self._load(data)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            pass
+
+    def _load(self, data):
+        def column(name):
+            values = data[name]
+            # Digests are stored as ASCII bytes; file_hash() returns hex strings
+            return (values.astype(str) if values.dtype.kind == 'S' else values).tolist()
+
+        for path, size, mtime_ns, sha256 in zip(*(column(f'file_{name}') for name in self.FILE_COLUMNS)):
+            self.files[path] = (size, mtime_ns, sha256)
+        for sha256, low, high, center, gain_db, band_level_db, delta_db in zip(
+                *(column(f'feature_{name}') for name in self.FEATURE_COLUMNS)):
+            self.features[(sha256, low, high, center, gain_db)] = (band_level_db, delta_db)
+
+    def file_hash(self, path):
+        """SHA-256 of a file, reusing the cached digest if its size and mtime are unchanged."""
+        stat = os.stat(path)
+        cached = self.files.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self.files[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+        return digest.hexdigest()
+
+    def get(self, sha256, bands, gains):
+        """(band_level_db, delta_db) arrays as analyze_audio() returns them, or None unless all are cached."""
+        try:
+            rows = [[self.features[(sha256, *band, gain_db)] for gain_db in gains] for band in bands]
+        except KeyError:
+            return None
+        rows = np.array(rows, dtype=np.float32).reshape(len(bands), len(gains), 2)
+        return rows[:, 0, 0], rows[:, :, 1]
+
+    def put(self, sha256, bands, gains, band_level_db, delta_db):
+        for band_index, band in enumerate(bands):
+            for gain_index, gain_db in enumerate(gains):
+                self.features[(sha256, *band, gain_db)] = (
+                    float(band_level_db[band_index]), float(delta_db[band_index, gain_index])
+                )
+
+    def prune(self, keep_paths):
+        """Forget files not in keep_paths and the features no remaining file has."""
+        keep_paths = set(keep_paths)
+        self.files = {path: entry for path, entry in self.files.items() if path in keep_paths}
+        hashes = {sha256 for _, _, sha256 in self.files.values()}
+        self.features = {key: value for key, value in self.features.items() if key[0] in hashes}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        files = list(self.files.items())
+        features = list(self.features.items())
+        columns = {
+            'file_path': np.array([path for path, _ in files], dtype=str),
+            'file_size': np.array([entry[0] for _, entry in files], dtype=np.int64),
+            'file_mtime_ns': np.array([entry[1] for _, entry in files], dtype=np.int64),
+            'file_sha256': np.array([entry[2] for _, entry in files], dtype='S64'),
+            'feature_sha256': np.array([key[0] for key, _ in features], dtype='S64'),
+            'feature_band_level_db': np.array([value[0] for _, value in features], dtype=np.float32),
+            'feature_delta_db': np.array([value[1] for _, value in features], dtype=np.float32),
+        }
+        for index, column in enumerate(['min_frequency', 'max_frequency', 'center_frequency']):
+            columns[f'feature_{column}'] = np.array([key[index + 1] for key, _ in features], dtype=np.int32)
+        columns['feature_gain_db'] = np.array([key[4] for key, _ in features], dtype=np.int16)
+        # np.savez appends .npz to names without it, so write through a file object
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, version=np.array(ANALYSIS_VERSION), **columns)
+        os.replace(temp_path, self.path)
+
+
+def analyze_library(paths, bands, gains, store, workers=None, chunksize=8):
+    """
+    Features of every file in `paths`, as {path: (band_level_db, delta_db)}.
+    Files already in the store are not decoded; the rest are analyzed on a
+    process pool, `chunksize` files per task, and added to the store (call
+    store.save() to keep them). Returns (features, number analyzed).
+    """
+    bands = [tuple(int(value) for value in band) for band in bands]
+    gains = [int(gain_db) for gain_db in gains]
+    hashes = {path: store.file_hash(path) for path in paths}
+    features, missing = {}, {}
+    for path, sha256 in hashes.items():
+        cached = store.get(sha256, bands, gains)
+        if cached is not None:
+            features[path] = cached
+        else:
+            # Identical files are analyzed once
+            missing.setdefault(sha256, path)
+
+    def collect(results):
+        for sha256, (band_level_db, delta_db) in zip(missing, results):
+            store.put(sha256, bands, gains, band_level_db, delta_db)
+
+    analyze = partial(analyze_file, bands=bands, gains=gains)
+    if workers == 1 or len(missing) <= 1:
+        collect(map(analyze, missing.values()))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            collect(pool.map(analyze, missing.values(), chunksize=chunksize))
+    for path, sha256 in hashes.items():
+        if path not in features:
+            features[path] = store.get(sha256, bands, gains)
+    return features, len(missing)
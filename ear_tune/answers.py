@@ -0,0 +1,90 @@
+"""
+Compiled answer matchers.
+
+A challenge's correct_answer lists the accepted answers separated by
+underscores ("asharp_bflat"). compile_answer() expands it once into a
+frozenset of every accepted spelling. Note names bring along all their
+enharmonic equivalents in each notation we accept: asharp, a#, a♯,
+bflat, bb and b♭ all name the same pitch class. Matching a submission is
+then one normalization (case folding, dropping spaces and hyphens) and a
+set lookup. Matchers are cached in process per distinct correct_answer
+string, so editing a challenge needs no invalidation, and normalized
+submissions are memoized as well.
+"""
+
+NATURALS = {'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7, 'a': 9, 'b': 11}
+SHARPS = ('sharp', '#', '♯')
+FLATS = ('flat', 'b', '♭')
+
+
+def _note_spellings():
+    """Every single-accidental spelling of each pitch class, e.g. 10 -> {asharp, a#, ..., bflat, bb, ...}."""
+    spellings = {pitch_class: set() for pitch_class in range(12)}
+    for letter, semitone in NATURALS.items():
+        spellings[semitone].add(letter)
+        for sharp in SHARPS:
+            spellings[(semitone + 1) % 12].add(letter + sharp)
+        for flat in FLATS:
+            spellings[(semitone - 1) % 12].add(letter + flat)
+    return {pitch_class: frozenset(names) for pitch_class, names in spellings.items()}
+
+
+NOTE_SPELLINGS = _note_spellings()
+# spelling -> pitch class
+PITCH_CLASSES = {name: pitch_class for pitch_class, names in NOTE_SPELLINGS.items() for name in names}
+
+
+# Bound on the memo dicts below; they are simply emptied when full
+MAX_CACHED = 65536
+
+# Submissions come from a small vocabulary, so normalized forms are memoized
+_normalized = {}
+
+
+def normalize(answer):
+    """Case-fold an answer and drop whitespace and hyphens ("C Sharp" -> "csharp")."""
+    normalized = _normalized.get(answer)
+    if normalized is None:
+        normalized = ''.join(answer.split()).replace('-', '').casefold()
+        if len(_normalized) >= MAX_CACHED:
+            _normalized.clear()
+        _normalized[answer] = normalized
+    return normalized
+
+
+class AnswerMatcher:
+    """The accepted spellings of one correct_answer."""
+
+    __slots__ = ('accepted',)
+
+    def __init__(self, correct_answer):
+        accepted = set()
+        for alternative in correct_answer.split('_'):
+            spelling = normalize(alternative)
+            if not spelling:
+                continue
+            pitch_class = PITCH_CLASSES.get(spelling)
+            accepted |= NOTE_SPELLINGS[pitch_class] if pitch_class is not None else {spelling}
+        self.accepted = frozenset(accepted)
+
+    def matches(self, answer):
+        return normalize(answer) in self.accepted
+
+
+_matchers = {}
+
+
+def compile_answer(correct_answer):
+    """Return the (cached) matcher for a correct_answer string."""
+    matcher = _matchers.get(correct_answer)
+    if matcher is None:
+        matcher = AnswerMatcher(correct_answer)
+        if len(_matchers) >= MAX_CACHED:
+            _matchers.clear()
+        _matchers[correct_answer] = matcher
+    return matcher
+
+
+def answer_matches(correct_answer, answer):
+    """True if answer is an accepted spelling of correct_answer."""
+    return compile_answer(correct_answer).matches(answer)
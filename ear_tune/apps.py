@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EarTuneConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ear_tune'
+
+    def ready(self):
+        # Connect the signal handlers that keep in-process indexes fresh.
+        from . import achievements, leaderboard, sampling  # noqa: F401
@@ -0,0 +1,133 @@
+"""
+Audio encoding and loudness normalization.
+
+Opus is encoded with libsndfile (through soundfile); AAC needs an ffmpeg
+binary on the PATH and is skipped when there is none. Loudness is measured
+as ITU-R BS.1770 integrated loudness (K-weighted, gated), in LUFS.
+"""
+
+import io
+import shutil
+import subprocess
+
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+# codec -> file extension and the MIME type browsers test with canPlayType()
+CODECS = {
+    'opus': {'extension': '.ogg', 'content_type': 'audio/ogg; codecs=opus'},
+    'aac': {'extension': '.m4a', 'content_type': 'audio/mp4; codecs=mp4a.40.2'},
+    'wav': {'extension': '.wav', 'content_type': 'audio/wav'},
+}
+
+# libsndfile only encodes Opus at 8/12/16/24/48 kHz
+OPUS_SAMPLE_RATE = 48000
+
+DEFAULT_BITRATES = {'opus': 64000, 'aac': 96000}
+
+
+def available_codecs():
+    """Codecs this machine can encode."""
+    return [codec for codec in CODECS if codec != 'aac' or shutil.which('ffmpeg')]
+
+
+def _resample(audio_data, sample_rate, target_rate):
+    divisor = np.gcd(target_rate, sample_rate)
+    return signal.resample_poly(audio_data, target_rate // divisor, sample_rate // divisor, axis=0)
+
+
+def encode(audio_data, sample_rate, codec, bitrate=None):
+    """Encode float samples in [-1, 1] and return the file contents as bytes."""
+    bitrate = bitrate or DEFAULT_BITRATES.get(codec)
+    if codec == 'wav':
+        buffer = io.BytesIO()
+        sf.write(buffer, audio_data, sample_rate, format='WAV', subtype='PCM_16')
+        return buffer.getvalue()
+    if codec == 'opus':
+        if sample_rate != OPUS_SAMPLE_RATE:
+            audio_data = _resample(audio_data, sample_rate, OPUS_SAMPLE_RATE)
+        buffer = io.BytesIO()
+        with sf.SoundFile(buffer, 'w', OPUS_SAMPLE_RATE, audio_data.shape[1] if audio_data.ndim > 1 else 1,
+                          format='OGG', subtype='OPUS', compression_level=_opus_compression_level(bitrate)) as f:
+            f.write(audio_data)
+        return buffer.getvalue()
+    if codec == 'aac':
+        return _ffmpeg_encode(audio_data, sample_rate, ['-c:a', 'aac', '-b:a', str(bitrate), '-f', 'ipod'])
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def _opus_compression_level(bitrate):
+    # libsndfile maps compression_level 0..1 linearly onto 256..6 kbit/s for Opus
+    return float(np.clip((256000 - bitrate) / (256000 - 6000), 0.0, 1.0))
+
+
+def _ffmpeg_encode(audio_data, sample_rate, output_args):
+    channels = audio_data.shape[1] if audio_data.ndim > 1 else 1
+    command = [
+        shutil.which('ffmpeg') or 'ffmpeg', '-nostdin', '-loglevel', 'error',
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+        *output_args, 'pipe:1',
+    ]
+    result = subprocess.run(command, input=audio_data.astype('<f4').tobytes(), capture_output=True, check=True)
+    return result.stdout
+
+
+def _k_weighting(sample_rate):
+    """BS.1770 pre-filter (high shelf, then high pass) as two biquads for any sample rate."""
+    # High shelf
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sample_rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = ([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0],
+             [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    # High pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    high_pass = ([1.0, -2.0, 1.0], [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    return shelf, high_pass
+
+
+def integrated_loudness(audio_data, sample_rate):
+    """Gated integrated loudness in LUFS; -inf for silence."""
+    audio_data = np.asarray(audio_data, dtype=np.float64)
+    if audio_data.ndim == 1:
+        audio_data = audio_data[:, np.newaxis]
+    for b, a in _k_weighting(sample_rate):
+        audio_data = signal.lfilter(b, a, audio_data, axis=0)
+
+    # Mean square per 400 ms block with 75% overlap, summed over channels
+    block, step = int(0.4 * sample_rate), int(0.1 * sample_rate)
+    squares = np.cumsum(np.concatenate((np.zeros((1, audio_data.shape[1])), audio_data ** 2)), axis=0)
+    if len(audio_data) < block:
+        power = np.atleast_1d((squares[-1] / max(len(audio_data), 1)).sum())
+    else:
+        starts = np.arange(0, len(audio_data) - block + 1, step)
+        power = ((squares[starts + block] - squares[starts]) / block).sum(axis=1)
+
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(power)
+    # Absolute gate at -70 LUFS, then relative gate 10 LU below the gated mean
+    gated = power[loudness > -70]
+    if not len(gated):
+        return float('-inf')
+    gated = power[loudness > -0.691 + 10 * np.log10(gated.mean()) - 10]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def loudness_gain(audio_data, sample_rate, target_lufs=-16.0, peak_dbfs=-1.0):
+    """
+    Linear gain that brings audio to the target loudness without the
+    sample peak exceeding peak_dbfs. Silence gets a gain of 1.
+    """
+    loudness = integrated_loudness(audio_data, sample_rate)
+    if not np.isfinite(loudness):
+        return 1.0
+    gain = 10 ** ((target_lufs - loudness) / 20)
+    peak = np.max(np.abs(audio_data))
+    if peak > 0:
+        gain = min(gain, 10 ** (peak_dbfs / 20) / peak)
+    return float(gain)
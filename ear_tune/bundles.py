@@ -0,0 +1,140 @@
+"""
+Challenge bundles: batches of upcoming challenges for client-side prefetch.
+
+A bundle is a deterministic walk through a seeded shuffle of the challenge
+ids matching a game/difficulty, so consecutive batches do not repeat a
+challenge until the whole pool has been played. The walk state (seed and
+offset) and the ids handed out travel in a signed token instead of being
+stored: the client passes it back to get the next batch, and with each
+answer so the submit endpoints can check the challenge was actually served.
+
+The seed is derived from the user and the game session when there is one,
+so the same session always sees the same sequence.
+"""
+
+import random
+import secrets
+
+from django.core import signing
+from django.utils.crypto import salted_hmac
+
+from .catalogue import catalogue
+from .models import Challenge, EQChallenge, RhythmChallenge
+from .sampling import sampler
+
+DEFAULT_BUNDLE_SIZE = 5
+MAX_BUNDLE_SIZE = 20
+# Tokens older than this are rejected, both for the next batch and at submit
+BUNDLE_MAX_AGE = 24 * 60 * 60
+
+_SALT = 'ear_tune.bundles'
+
+# kind -> (model, name of the game it belongs to, or None to take game_id from the request)
+KINDS = {
+    'note': (Challenge, None),
+    'eq': (EQChallenge, 'Frequency Recognition'),
+    'rhythm': (RhythmChallenge, 'Rhythm Recognition'),
+}
+
+
+class InvalidBundle(Exception):
+    """A bundle token is malformed, expired, or does not cover the request."""
+
+
+def bundle_filters(kind, game_id=None, difficulty='beginner'):
+    """
+    Filters selecting the challenge pool of a kind, normalized so each pool
+    has one sampler key. Raises ValueError for a game_id that is not an
+    integer or an unknown difficulty, and Game.DoesNotExist when the game
+    the bundle draws from is missing.
+    """
+    if kind == 'note':
+        filters = {'challenge_type': 'note'}
+        if game_id is not None:
+            try:
+                game_id = int(game_id)
+            except (TypeError, ValueError):
+                raise ValueError('game_id must be an integer.')
+            filters['game_id'] = catalogue.game(id=game_id).id
+        return filters
+    model, game_name = KINDS[kind]
+    if difficulty not in dict(model.DIFFICULTY_CHOICES):
+        raise ValueError('difficulty must be one of: ' + ', '.join(dict(model.DIFFICULTY_CHOICES)))
+    game = catalogue.game(name=game_name)
+    return {'game_id': game.id, 'difficulty': difficulty}
+
+
+def session_seed(user_id, session_id=None):
+    """Shuffle seed for a bundle: fixed per (user, game session), random without a session."""
+    if session_id is None:
+        return secrets.token_hex(8)
+    return salted_hmac(_SALT, f'{user_id}:{session_id}').hexdigest()[:16]
+
+
+def _cycle(ids, seed, cycle):
+    order = sorted(ids)
+    random.Random(f'{seed}:{cycle}').shuffle(order)
+    return order
+
+
+def select(ids, seed, offset, count):
+    """
+    Take up to `count` distinct ids from position `offset` of the seeded
+    walk, reshuffling each time the pool is exhausted. Returns the ids and
+    the offset to continue from.
+    """
+    count = min(count, len(ids))
+    batch, orders = [], {}
+    while len(batch) < count:
+        cycle, position = divmod(offset, len(ids))
+        if cycle not in orders:
+            orders[cycle] = _cycle(ids, seed, cycle)
+        challenge_id = orders[cycle][position]
+        offset += 1
+        # A batch spanning two cycles could otherwise repeat a challenge
+        if challenge_id not in batch:
+            batch.append(challenge_id)
+    return batch, offset
+
+
+def next_bundle(user_id, kind, filters, seed, offset=0, count=DEFAULT_BUNDLE_SIZE):
+    """
+    Select the next batch of challenge ids. Returns (ids, token); the token
+    continues the walk after this batch and vouches for these ids at submit.
+    """
+    model = KINDS[kind][0]
+    for _ in range(2):
+        ids, next_offset = select(sampler.ids(model, **filters), seed, offset, count)
+        current = set(model.objects.filter(pk__in=ids, **filters).values_list('id', flat=True))
+        if len(current) == len(ids):
+            break
+        # Rows deleted or reclassified since the index was built; rebuild it and walk again
+        sampler.invalidate(model)
+    ids, offset = [challenge_id for challenge_id in ids if challenge_id in current], next_offset
+    token = signing.dumps(
+        {'u': user_id, 'k': kind, 'f': filters, 's': seed, 'o': offset, 'i': ids},
+        salt=_SALT, compress=True
+    )
+    return ids, token
+
+
+def load_bundle(token, user_id, kind=None):
+    """Return the payload of a bundle token issued to the user; raises InvalidBundle."""
+    try:
+        payload = signing.loads(token, salt=_SALT, max_age=BUNDLE_MAX_AGE)
+    except signing.BadSignature:
+        raise InvalidBundle('Invalid or expired bundle.')
+    if payload['u'] != user_id or (kind is not None and payload['k'] != kind):
+        raise InvalidBundle('Bundle was issued for another user or game.')
+    return payload
+
+
+def verify_bundle(token, user_id, kind, challenge_id):
+    """Raise InvalidBundle unless the token was issued to the user and includes the challenge."""
+    payload = load_bundle(token, user_id, kind)
+    try:
+        challenge_id = int(challenge_id)
+    except (TypeError, ValueError):
+        raise InvalidBundle('Challenge is not part of this bundle.')
+    if challenge_id not in payload['i']:
+        raise InvalidBundle('Challenge is not part of this bundle.')
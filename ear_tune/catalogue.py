@@ -0,0 +1,172 @@
+"""
+Process-local read-through cache of the catalogue tables.
+
+Games, frequency bands and achievements only change through the admin or
+fixtures, yet one of them is read on nearly every request. The catalogue
+loads all three tables at once and serves lookups by id and name from
+memory. Cached instances are shared between requests and must be treated
+as read-only.
+
+Saving or deleting a catalogue row bumps a version number in the Django
+cache. Each worker compares its snapshot against that version at most once
+per CATALOGUE_CHECK_INTERVAL seconds and reloads when it has moved, so the
+cache backend must be shared between workers (memcached, Redis, database or
+file based) for edits to propagate promptly. With a per-process backend
+such as the default local-memory cache, other workers still reload once
+their snapshot is CATALOGUE_MAX_AGE seconds old.
+"""
+
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Achievement, FrequencyBand, Game
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+
+def catalogue_version():
+    """The shared catalogue version, bumped whenever a catalogue row changes."""
+    return cache.get_or_set(CATALOGUE_VERSION_KEY, 1, None)
+
+
+def bump_catalogue_version():
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOGUE_VERSION_KEY, 1, None)
+
+
+class CatalogueSnapshot:
+    """The catalogue tables as loaded at one version."""
+
+    def __init__(self, version, games, frequency_bands, achievements):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.games = games
+        self.games_by_id = {game.id: game for game in games}
+        # Names are not unique in the schema; the lowest id wins, as .first() would
+        self.games_by_name = {}
+        for game in games:
+            self.games_by_name.setdefault(game.name, game)
+        self.frequency_bands = frequency_bands
+        self.frequency_bands_by_id = {band.id: band for band in frequency_bands}
+        self.achievements = achievements
+        self.achievements_by_type = {}
+        for achievement in sorted(achievements, key=lambda a: (a.criteria_value, a.id)):
+            self.achievements_by_type.setdefault(achievement.criteria_type, []).append(achievement)
+
+    def game(self, id=None, name=None):
+        """Look a game up by id or name; raises Game.DoesNotExist."""
+        if id is not None:
+            try:
+                game = self.games_by_id.get(int(id))
+            except (TypeError, ValueError):
+                game = None
+        else:
+            game = self.games_by_name.get(name)
+        if game is None:
+            raise Game.DoesNotExist(f'No game with id={id!r} name={name!r}.')
+        return game
+
+
+class Catalogue:
+    """Versioned, process-local view of the Game, FrequencyBand and Achievement tables."""
+
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, version):
+        return CatalogueSnapshot(
+            version,
+            list(Game.objects.order_by('id')),
+            list(FrequencyBand.objects.all()),
+            list(Achievement.objects.all()),
+        )
+
+    def _fresh(self, now):
+        """The snapshot, if it was checked against the shared version recently enough."""
+        if now - self._checked_at < getattr(settings, 'CATALOGUE_CHECK_INTERVAL', 1.0):
+            return self._snapshot
+        return None
+
+    def snapshot(self):
+        """Return the current snapshot, reloading it if the shared version moved."""
+        now = time.monotonic()
+        snapshot = self._fresh(now)
+        if snapshot is not None:
+            return snapshot
+        snapshot = self._snapshot
+        version = catalogue_version()
+        if (snapshot is None or snapshot.version != version
+                or now - snapshot.loaded_at >= getattr(settings, 'CATALOGUE_MAX_AGE', 300)):
+            snapshot = self._load(version)
+        with self._lock:
+            self._snapshot = snapshot
+            self._checked_at = now
+        return snapshot
+
+    async def asnapshot(self):
+        """snapshot() for async code; only leaves the event loop when the version must be checked."""
+        snapshot = self._fresh(time.monotonic())
+        if snapshot is not None:
+            return snapshot
+        return await sync_to_async(self.snapshot)()
+
+    def games(self):
+        """All games, by id."""
+        return self.snapshot().games
+
+    def game(self, id=None, name=None):
+        """Look a game up by id or name; raises Game.DoesNotExist."""
+        return self.snapshot().game(id, name)
+
+    def frequency_bands(self):
+        """All frequency bands, in display order."""
+        return self.snapshot().frequency_bands
+
+    def frequency_band(self, id):
+        """Look a frequency band up by id; raises FrequencyBand.DoesNotExist."""
+        band = self.snapshot().frequency_bands_by_id.get(id)
+        if band is None:
+            raise FrequencyBand.DoesNotExist(f'No frequency band with id={id!r}.')
+        return band
+
+    def achievements(self, criteria_type=None):
+        """All achievements, or those of a criteria type sorted by threshold."""
+        snapshot = self.snapshot()
+        if criteria_type is None:
+            return snapshot.achievements
+        return snapshot.achievements_by_type.get(criteria_type, [])
+
+    def has_reachable(self, criteria_type, value):
+        """True if any achievement of the type has a threshold at or below value."""
+        achievements = self.achievements(criteria_type)
+        return bool(achievements) and achievements[0].criteria_value <= value
+
+    def invalidate(self):
+        """Drop this process's snapshot; the next lookup reloads it."""
+        with self._lock:
+            self._snapshot = None
+
+
+catalogue = Catalogue()
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_save, sender=FrequencyBand)
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Game)
+@receiver(post_delete, sender=FrequencyBand)
+@receiver(post_delete, sender=Achievement)
+def invalidate_catalogue(sender, **kwargs):
+    """Reload the catalogue here, and in other workers, after a catalogue row changes."""
+    catalogue.invalidate()
+    bump_catalogue_version()
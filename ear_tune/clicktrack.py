@@ -0,0 +1,81 @@
+"""
+Click-track synthesis for the rhythm game.
+
+Used by scripts/generate_rhythm_challenges.py. Each click sound is rendered
+once as a short kernel; a track is then built in one pass that adds every
+click's kernel into a float32 buffer at its onset, rounded to the nearest
+sample. The work grows with the number of clicks times the kernel length,
+not with the track length, and onsets keep sub-millisecond precision
+(triplets at most tempos do not fall on whole milliseconds).
+"""
+
+import numpy as np
+
+from .rhythm import onset_timeline_ms
+
+SAMPLE_RATE = 44100
+
+# (frequency Hz, volume dB) of the click played on downbeats, other whole beats and off-beats
+DOWNBEAT_CLICK = (1200, -8)
+BEAT_CLICK = (800, -12)
+OFFBEAT_CLICK = (600, -14)
+
+
+def click_kernel(frequency, volume_db, duration_ms=50, fade_ms=5, sample_rate=SAMPLE_RATE):
+    """A sine burst with linear fade in and out, scaled by volume_db relative to full scale."""
+    length = int(round(duration_ms * sample_rate / 1000))
+    t = np.arange(length) / sample_rate
+    kernel = np.sin(2 * np.pi * frequency * t)
+    fade = min(int(round(fade_ms * sample_rate / 1000)), length // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, endpoint=False)
+        kernel[:fade] *= ramp
+        kernel[length - fade:] *= ramp[::-1]
+    return (kernel * 10 ** (volume_db / 20)).astype(np.float32)
+
+
+def render_clicks(onsets_ms, kernel_ids, kernels, duration_ms, sample_rate=SAMPLE_RATE):
+    """
+    Mix kernels[kernel_ids[i]] in at onsets_ms[i] for every i, into a
+    silent float32 track of duration_ms. Overlapping clicks add up and the
+    sum is clipped to [-1, 1]; clicks running past the end are cut off.
+    """
+    length = int(round(duration_ms * sample_rate / 1000))
+    track = np.zeros(length, dtype=np.float32)
+    starts = np.rint(np.asarray(onsets_ms, dtype=np.float64) * sample_rate / 1000).astype(np.int64)
+    # One contiguous in-place add per click: several times faster than scattering
+    # every click sample through np.add.at, and overlaps accumulate the same way.
+    for start, kernel_id in zip(starts.tolist(), np.asarray(kernel_ids).tolist()):
+        kernel = kernels[kernel_id]
+        if start >= length or start + len(kernel) <= 0:
+            continue
+        lo = max(start, 0)
+        hi = min(start + len(kernel), length)
+        track[lo:hi] += kernel[lo - start:hi - start]
+    np.clip(track, -1.0, 1.0, out=track)
+    return track
+
+
+def pattern_onsets(pattern, tempo, beats_per_bar, bars):
+    """
+    Onsets in ms and beat positions of a per-bar beat pattern repeated over
+    `bars` bars. Positions at or past the end of the bar are dropped.
+    """
+    beats = np.asarray([beat for beat in pattern if beat < beats_per_bar], dtype=np.float64)
+    return onset_timeline_ms(beats, tempo, beats_per_bar, bars), np.tile(beats, bars)
+
+
+def click_track(pattern, tempo, time_signature="4/4", bars=4, offbeat_click=True, sample_rate=SAMPLE_RATE):
+    """
+    Render a beat pattern as a click track: a high click on each downbeat,
+    a lower one on the other whole beats and, with offbeat_click, a third
+    on subdivisions (otherwise they use the beat click).
+    Returns float32 samples at sample_rate.
+    """
+    beats_per_bar = int(time_signature.split('/')[0])
+    onsets, beats = pattern_onsets(pattern, tempo, beats_per_bar, bars)
+    clicks = [DOWNBEAT_CLICK, BEAT_CLICK, OFFBEAT_CLICK if offbeat_click else BEAT_CLICK]
+    kernels = [click_kernel(frequency, volume_db, sample_rate=sample_rate) for frequency, volume_db in clicks]
+    kernel_ids = np.where(beats == 0, 0, np.where(beats == np.floor(beats), 1, 2))
+    duration_ms = bars * beats_per_bar * 60000 / tempo
+    return render_clicks(onsets, kernel_ids, kernels, duration_ms, sample_rate)
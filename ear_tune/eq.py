@@ -0,0 +1,129 @@
+"""
+Parametric EQ used for the frequency recognition game.
+
+Shared by scripts/generate_eq_samples.py (offline renders) and the
+on-demand render endpoint (ear_tune.render_cache).
+
+peak_filter_blocks() and mix_eq_blocks() are the streaming forms of
+peak_filter() and mix_eq() for long sources: they work through
+(memory-mapped) arrays a block at a time, so memory stays bounded by the
+block size, and match the in-memory functions to rounding error.
+"""
+
+import hashlib
+import inspect
+
+import numpy as np
+from scipy import signal
+
+# Peaking filter Q used for every render
+Q_FACTOR = 1.0
+
+# Samples per block in the streaming functions (512 KiB of float64)
+STREAM_BLOCK_FRAMES = 1 << 16
+
+
+def peak_filter(audio_data, sample_rate, center_freq, q_factor=Q_FACTOR):
+    """Zero-phase peaking filter pass; shared by every gain at one center frequency."""
+    # Keep the center frequency below Nyquist
+    nyquist = sample_rate / 2
+    center_freq = min(center_freq, nyquist * 0.99)
+
+    # Create peaking filter coefficients
+    b, a = signal.iirpeak(center_freq, q_factor, fs=sample_rate)
+    return signal.filtfilt(b, a, audio_data)
+
+
+def mix_eq(audio_data, filtered, gain_db):
+    """Blend a peak_filter() pass into the dry signal for the requested gain."""
+    # Convert gain from dB to linear
+    gain_linear = 10 ** (gain_db / 20)
+
+    # Apply the filter with gain
+    if gain_db > 0:
+        filtered = filtered * gain_linear
+        # Mix with original (parallel processing)
+        output = audio_data + (filtered - audio_data) * 0.7
+    else:
+        # For cuts, apply inverse filter
+        output = audio_data - (audio_data - filtered) * abs(gain_linear - 1)
+
+    # Normalize to prevent clipping
+    max_val = np.max(np.abs(output))
+    if max_val > 1.0:
+        output = output / max_val
+
+    return output
+
+
+def apply_eq(audio_data, sample_rate, center_freq, gain_db, q_factor=Q_FACTOR):
+    """Apply parametric EQ to audio data."""
+    return mix_eq(audio_data, peak_filter(audio_data, sample_rate, center_freq, q_factor), gain_db)
+
+
+def mix_coefficients(gain_db):
+    """(a, b) such that mix_eq(x, filtered, gain_db) is a * x + b * filtered, up to its clipping normalization."""
+    probe = 1e-3
+    a, b = mix_eq(np.array([probe, 0.0]), np.array([0.0, probe]), gain_db) / probe
+    return a, b
+
+
+def peak_filter_blocks(audio_data, out, sample_rate, center_freq, q_factor=Q_FACTOR,
+                       block_frames=STREAM_BLOCK_FRAMES):
+    """
+    peak_filter() of audio_data into `out`, a block at a time; both may be
+    memory-mapped. Runs filtfilt's forward and backward passes itself,
+    carrying the filter state across blocks and padding the ends the same
+    way (odd extension, steady-state initial conditions), with the forward
+    pass stored in `out` for the backward pass to overwrite.
+    """
+    nyquist = sample_rate / 2
+    center_freq = min(center_freq, nyquist * 0.99)
+    b, a = signal.iirpeak(center_freq, q_factor, fs=sample_rate)
+    padlen = 3 * max(len(a), len(b))
+    length = len(audio_data)
+    if length <= padlen:
+        # Too short to pad: let filtfilt raise its usual error
+        out[:] = peak_filter(np.asarray(audio_data), sample_rate, center_freq, q_factor)
+        return out
+
+    zi = signal.lfilter_zi(b, a)
+    head = 2 * audio_data[0] - np.asarray(audio_data[padlen:0:-1])
+    tail = 2 * audio_data[-1] - np.asarray(audio_data[-2:-padlen - 2:-1])
+
+    # Forward pass over head + audio_data + tail
+    _, state = signal.lfilter(b, a, head, zi=zi * head[0])
+    for start in range(0, length, block_frames):
+        out[start:start + block_frames], state = signal.lfilter(
+            b, a, audio_data[start:start + block_frames], zi=state
+        )
+    tail, _ = signal.lfilter(b, a, tail, zi=state)
+
+    # Backward pass from the end of the tail; the padding's output is dropped
+    _, state = signal.lfilter(b, a, tail[::-1], zi=zi * tail[-1])
+    for stop in range(length, 0, -block_frames):
+        start = max(stop - block_frames, 0)
+        block, state = signal.lfilter(b, a, out[start:stop][::-1], zi=state)
+        out[start:stop] = block[::-1]
+    return out
+
+
+def mix_eq_blocks(audio_data, filtered, gain_db, block_frames=STREAM_BLOCK_FRAMES):
+    """
+    Yield mix_eq(audio_data, filtered, gain_db) a block at a time. The
+    output is normalized by its peak like mix_eq(), so both arrays are
+    read twice: once to find the peak, once to yield the blocks.
+    """
+    a, b = mix_coefficients(gain_db)
+    blocks = range(0, len(audio_data), block_frames)
+    peak = max((np.max(np.abs(a * audio_data[start:start + block_frames] + b * filtered[start:start + block_frames]))
+                for start in blocks), default=0.0)
+    for start in blocks:
+        output = a * audio_data[start:start + block_frames] + b * filtered[start:start + block_frames]
+        yield output / peak if peak > 1.0 else output
+
+
+# Changes whenever the rendering code does, which marks every cached render stale
+RENDER_CODE_VERSION = hashlib.sha256(
+    (inspect.getsource(peak_filter) + inspect.getsource(mix_eq)).encode()
+).hexdigest()[:16]
@@ -0,0 +1,171 @@
+"""
+Gamification update pipeline for answer submissions.
+
+Each submit used to call UserProfile.add_xp() and update_streak() (both of
+which save), save the profile again and then run the achievement check,
+which saved once more per unlock. apply_gamification() computes XP, level,
+streak, counters and achievement unlocks in memory and writes them in one
+transaction: a locked read of the profile, one UPDATE, at most one bulk
+INSERT of unlocks and the per-game stats rows of ear_tune.stats.
+Achievements are evaluated incrementally by ear_tune.achievements.
+"""
+
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .achievements import (
+    catalogue,
+    changed_criteria,
+    criteria_counters,
+    invalidate_user_achievements,
+    reached_achievements,
+)
+from .leaderboard import leaderboard
+from .models import (
+    UserAchievement,
+    UserProfile,
+    advance_streak,
+    level_for_xp,
+)
+
+DIFFICULTY_MULTIPLIERS = {
+    'beginner': 1.0,
+    'intermediate': 1.5,
+    'advanced': 2.0,
+}
+
+
+def calculate_xp(accuracy, difficulty='beginner'):
+    """
+    XP earned for a scored round.
+    Base 10 XP, plus half the accuracy percentage, scaled by difficulty,
+    plus a 25 XP bonus for a perfect round.
+    """
+    base_xp = 10
+    accuracy_bonus = accuracy * 0.5
+    difficulty_multiplier = DIFFICULTY_MULTIPLIERS.get(difficulty, 1.0)
+    perfect_bonus = 25 if accuracy == 100 else 0
+    return int((base_xp + accuracy_bonus) * difficulty_multiplier + perfect_bonus)
+
+
+def _unlock_achievements(user, before, stats, criteria):
+    """
+    Evaluate the achievements of the changed criteria against the in-memory
+    stats. XP rewards are folded into the stats, so a level achievement
+    reached through another achievement's reward unlocks in the same pass.
+    """
+    counters = criteria_counters(stats)
+    changed = set(criteria) | changed_criteria(before, counters)
+    # Nothing to look up unless a changed counter has reached some threshold.
+    if not any(catalogue.has_reachable(c, counters[c]) for c in changed):
+        return []
+
+    unlocked_ids = set(UserAchievement.objects.filter(user=user).order_by().values_list('achievement_id', flat=True))
+    newly_unlocked = []
+    while changed:
+        reached = []
+        for criteria_type in sorted(changed):
+            reached.extend(reached_achievements(criteria_type, counters[criteria_type], unlocked_ids))
+        if not reached:
+            break
+        for achievement in reached:
+            unlocked_ids.add(achievement.id)
+            newly_unlocked.append(achievement)
+            stats['xp'] += achievement.xp_reward
+        stats['level'] = level_for_xp(stats['xp'])
+        before, counters = counters, criteria_counters(stats)
+        changed = changed_criteria(before, counters)
+    return newly_unlocked
+
+
+def apply_gamification(user, xp_earned=0, games_played=1, correct_answers=0, perfect_scores=0,
+                       update_streak=True, check_achievements=True, criteria=(), today=None, game_stats=None):
+    """
+    Apply the outcome of one or more answers to the user's profile, and the
+    StatsDelta `game_stats`, if given, to their per-game stats.
+
+    Only achievements whose criteria counter changed are evaluated; pass
+    `criteria` to force a check of other criteria types as well.
+
+    Returns a dict with 'level_up', 'new_level' and 'unlocked_achievements'
+    (the serialized unlocks, in the shape the submit endpoints return).
+    """
+    today = today or date.today()
+
+    with transaction.atomic():
+        profile, _ = UserProfile.objects.select_for_update().get_or_create(user=user)
+        old_level = profile.level
+
+        stats = {
+            'xp': profile.xp + xp_earned,
+            'total_games_played': profile.total_games_played + games_played,
+            'total_correct_answers': profile.total_correct_answers + correct_answers,
+            'total_perfect_scores': profile.total_perfect_scores + perfect_scores,
+            'current_streak': profile.current_streak,
+            'last_activity_date': profile.last_activity_date,
+        }
+        stats['level'] = level_for_xp(stats['xp'])
+        if update_streak:
+            stats['current_streak'], stats['last_activity_date'] = advance_streak(
+                profile.last_activity_date, profile.current_streak, today
+            )
+
+        unlocked = []
+        if check_achievements:
+            unlocked = _unlock_achievements(user, criteria_counters(profile), stats, criteria)
+        xp_delta = stats['xp'] - profile.xp
+
+        # The row is locked, so counters are exact; F() keeps the UPDATE
+        # correct even on backends where select_for_update is a no-op.
+        UserProfile.objects.filter(pk=profile.pk).update(
+            xp=F('xp') + xp_delta,
+            level=Greatest(F('level'), stats['level']),
+            total_games_played=F('total_games_played') + games_played,
+            total_correct_answers=F('total_correct_answers') + correct_answers,
+            total_perfect_scores=F('total_perfect_scores') + perfect_scores,
+            current_streak=stats['current_streak'],
+            longest_streak=Greatest(F('longest_streak'), stats['current_streak']),
+            last_activity_date=stats['last_activity_date'],
+            updated_at=timezone.now(),
+        )
+        if game_stats:
+            game_stats.apply(user.id)
+        if unlocked:
+            UserAchievement.objects.bulk_create([
+                UserAchievement(user=user, achievement=achievement) for achievement in unlocked
+            ])
+            # bulk_create sends no post_save signals
+            transaction.on_commit(lambda: invalidate_user_achievements(user.id))
+        if xp_delta:
+            xp_total = stats['xp']
+            transaction.on_commit(lambda: leaderboard.update(user.id, xp_total))
+
+    # Keep any cached profile instance on the user in step with the database.
+    profile.xp = stats['xp']
+    profile.level = max(profile.level, stats['level'])
+    profile.total_games_played = stats['total_games_played']
+    profile.total_correct_answers = stats['total_correct_answers']
+    profile.total_perfect_scores = stats['total_perfect_scores']
+    profile.current_streak = stats['current_streak']
+    profile.longest_streak = max(profile.longest_streak, stats['current_streak'])
+    profile.last_activity_date = stats['last_activity_date']
+    user.profile = profile
+
+    return {
+        'level_up': profile.level > old_level,
+        'new_level': profile.level,
+        'unlocked_achievements': [
+            {
+                'id': achievement.id,
+                'name': achievement.name,
+                'description': achievement.description,
+                'icon': achievement.icon,
+                'xp_reward': achievement.xp_reward
+            }
+            for achievement in unlocked
+        ],
+    }
@@ -0,0 +1,248 @@
+"""
+Materialized XP leaderboard.
+
+Each worker keeps every profile's XP in an in-process sorted structure, so
+"what is my rank", paged top-N and neighbourhood queries are O(log n) instead
+of an ORDER BY over the whole profile table. Local XP changes are applied as
+they commit; changes made by other workers are picked up through
+UserProfile.updated_at, which is polled at most once per
+LEADERBOARD_SYNC_INTERVAL seconds. The structure is rebuilt from the
+database every LEADERBOARD_REBUILD_INTERVAL seconds to drop deleted users.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import UserProfile
+
+# Keys pack (-xp, user_id) into one int: higher XP sorts first, ties by user id.
+_ID_BITS = 40
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def _key(user_id, xp):
+    return (-xp << _ID_BITS) | user_id
+
+
+def _unpack(key):
+    """Return (user_id, xp) for a packed key."""
+    return key & _ID_MASK, -(key >> _ID_BITS)
+
+
+class RankedList:
+    """
+    A sorted list of ints split into buckets, with a Fenwick tree over the
+    bucket sizes. Insert and remove are O(log n + bucket size); rank lookup
+    and locating a position are O(log n).
+    """
+
+    LOAD = 512
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
+        self._rebuild_index()
+
+    def __len__(self):
+        return self._len
+
+    def _rebuild_index(self):
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, start=1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bucket_index, delta):
+        i = bucket_index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, bucket_index):
+        """Number of keys in the buckets before bucket_index."""
+        total, i = 0, bucket_index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, position):
+        """Return (bucket index, offset) of the key at a position."""
+        i, step = 0, 1 << (len(self._tree).bit_length())
+        while step:
+            nxt = i + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                i = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return i, position
+
+    def add(self, key):
+        if not self._buckets:
+            self._buckets, self._maxes, self._len = [[key]], [key], 1
+            self._rebuild_index()
+            return
+        i = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._buckets[i]
+        insort(bucket, key)
+        self._maxes[i] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.LOAD:
+            self._buckets[i:i + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._maxes[i:i + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._rebuild_index()
+        else:
+            self._tree_add(i, 1)
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        self._len -= 1
+        if bucket:
+            self._maxes[i] = bucket[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+            self._rebuild_index()
+
+    def index(self, key):
+        """Position of a key that is in the list."""
+        i = bisect_left(self._maxes, key)
+        return self._prefix(i) + bisect_left(self._buckets[i], key)
+
+    def slice(self, start, stop):
+        """Return the keys at positions [start, stop)."""
+        start, stop = max(start, 0), min(stop, self._len)
+        if start >= stop:
+            return []
+        i, offset = self._locate(start)
+        result = []
+        while len(result) < stop - start:
+            bucket = self._buckets[i]
+            result.extend(bucket[offset:offset + (stop - start - len(result))])
+            i, offset = i + 1, 0
+        return result
+
+
+class Leaderboard:
+    """Process-local leaderboard of every user's XP."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything; the next read rebuilds from the database."""
+        with self._lock:
+            self._xp = None
+            self._ranked = None
+            self._built_at = 0.0
+            self._synced_at = 0.0
+            self._high_water = None
+
+    def _rebuild(self):
+        rows = UserProfile.objects.order_by().values_list('user_id', 'xp', 'updated_at')
+        xp_by_user, high_water = {}, None
+        for user_id, xp, updated_at in rows.iterator(chunk_size=10000):
+            xp_by_user[user_id] = xp
+            if high_water is None or updated_at > high_water:
+                high_water = updated_at
+        self._xp = xp_by_user
+        self._ranked = RankedList(_key(user_id, xp) for user_id, xp in xp_by_user.items())
+        self._high_water = high_water
+        self._built_at = self._synced_at = time.monotonic()
+
+    def _sync(self):
+        """Apply profile changes made since the last sync (possibly by other workers)."""
+        rows = UserProfile.objects.order_by().values_list('user_id', 'xp', 'updated_at')
+        if self._high_water is not None:
+            # Re-read a short overlap so rows committed late are not missed.
+            rows = rows.filter(updated_at__gte=self._high_water - timedelta(seconds=2))
+        for user_id, xp, updated_at in rows:
+            self._set(user_id, xp)
+            if self._high_water is None or updated_at > self._high_water:
+                self._high_water = updated_at
+        self._synced_at = time.monotonic()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._ranked is None or now - self._built_at >= getattr(settings, 'LEADERBOARD_REBUILD_INTERVAL', 3600):
+            self._rebuild()
+        elif now - self._synced_at >= getattr(settings, 'LEADERBOARD_SYNC_INTERVAL', 1.0):
+            self._sync()
+
+    def _set(self, user_id, xp):
+        old_xp = self._xp.get(user_id)
+        if old_xp == xp:
+            return
+        if old_xp is not None:
+            self._ranked.remove(_key(user_id, old_xp))
+        self._ranked.add(_key(user_id, xp))
+        self._xp[user_id] = xp
+
+    def update(self, user_id, xp):
+        """Record a user's new XP total."""
+        with self._lock:
+            if self._ranked is not None:
+                self._set(user_id, xp)
+
+    def remove(self, user_id):
+        with self._lock:
+            if self._ranked is not None and user_id in self._xp:
+                self._ranked.remove(_key(user_id, self._xp.pop(user_id)))
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._ranked)
+
+    def rank(self, user_id):
+        """1-based rank of a user, or None if they have no profile."""
+        with self._lock:
+            self._refresh()
+            xp = self._xp.get(user_id)
+            if xp is None:
+                return None
+            return self._ranked.index(_key(user_id, xp)) + 1
+
+    def page(self, offset=0, limit=10):
+        """Return [(rank, user_id, xp), ...] for the given slice of the leaderboard."""
+        with self._lock:
+            self._refresh()
+            keys = self._ranked.slice(offset, offset + limit)
+        return [(offset + i + 1, *_unpack(key)) for i, key in enumerate(keys)]
+
+    def around(self, user_id, radius=5):
+        """Return the user's entry with up to `radius` entries above and below."""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        start = max(rank - 1 - radius, 0)
+        return self.page(start, rank - 1 + radius + 1 - start)
+
+
+leaderboard = Leaderboard()
+
+
+@receiver(post_save, sender=UserProfile)
+def update_leaderboard(sender, instance, **kwargs):
+    """Apply XP changes saved through the model (add_xp, admin edits, new profiles)."""
+    leaderboard.update(instance.user_id, instance.xp)
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    leaderboard.remove(instance.user_id)
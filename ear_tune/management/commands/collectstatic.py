@@ -0,0 +1,16 @@
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+from django.core.management import call_command
+
+
+class Command(CollectStaticCommand):
+    """collectstatic that first brings the compressed audio variants up to date."""
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--skip-transcode', action='store_true',
+                            help='Do not run transcode_audio before collecting.')
+
+    def handle(self, **options):
+        if not options['skip_transcode'] and not options['dry_run']:
+            call_command('transcode_audio', verbosity=options['verbosity'], stdout=self.stdout)
+        return super().handle(**options)
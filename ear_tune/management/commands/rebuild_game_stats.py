@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from ear_tune.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-user game and frequency band stats from GameSession history, "
+        "replacing the incrementally maintained rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user id; repeat for several (default: every user)')
+
+    def handle(self, *args, **options):
+        games, bands = rebuild(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {games} game stats rows and {bands} band stats rows."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ear_tune.audio import available_codecs
+from ear_tune.variants import DEFAULT_TARGET_LUFS, static_root, transcode_library
+
+DEFAULT_DIRECTORIES = ['audio/notes', 'audio/eq_samples']
+
+
+class Command(BaseCommand):
+    help = (
+        "Encode the static audio library to Opus (and AAC when ffmpeg is installed), "
+        "loudness-normalized, and record the variants in static/audio/variants.json."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directories', nargs='*', default=DEFAULT_DIRECTORIES,
+                            help='Directories under the static root to encode (default: %(default)s)')
+        parser.add_argument('--codec', action='append', dest='codecs',
+                            help='Codec to produce; repeat for several (default: every available codec)')
+        parser.add_argument('--target-lufs', type=float, default=DEFAULT_TARGET_LUFS,
+                            help='Integrated loudness target (default: %(default)s)')
+        parser.add_argument('--force', action='store_true', help='Re-encode files that are up to date')
+
+    def handle(self, *args, **options):
+        available = available_codecs()
+        codecs = options['codecs'] or available
+        unavailable = set(codecs) - set(available)
+        if unavailable:
+            raise CommandError(
+                f"Cannot encode {', '.join(sorted(unavailable))} here (AAC needs ffmpeg on the PATH)."
+            )
+        if 'aac' not in codecs and not options['codecs']:
+            self.stdout.write(self.style.WARNING("ffmpeg not found; skipping AAC."))
+
+        encoded, skipped = transcode_library(
+            static_root(), options['directories'], codecs,
+            target_lufs=options['target_lufs'], force=options['force'],
+            log=lambda message: self.stdout.write(message) if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Encoded {encoded} files, {skipped} up to date."))
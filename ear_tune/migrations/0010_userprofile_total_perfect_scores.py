@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_perfect_scores(apps, schema_editor):
+    """Count each user's existing sessions that reached a perfect score of 100."""
+    UserProfile = apps.get_model('ear_tune', 'UserProfile')
+    GameSession = apps.get_model('ear_tune', 'GameSession')
+    perfect_counts = (
+        GameSession.objects
+        .filter(user_id=OuterRef('user_id'), score__gte=100, is_attempt=False)
+        .order_by()
+        .values('user_id')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    UserProfile.objects.update(total_perfect_scores=Coalesce(Subquery(perfect_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ear_tune', '0009_gamesession_challenge_nullable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_perfect_scores',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_perfect_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ear_tune', '0011_userprofile_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('is_attempt', False)), fields=['user', '-date_played', '-id'], name='gamesession_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('active', True)), fields=['user', 'challenge'], name='gamesession_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('is_attempt', False), ('score', 100)), fields=['user'], name='gamesession_perfect_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-xp'], name='userprofile_xp_idx'),
+        ),
+    ]
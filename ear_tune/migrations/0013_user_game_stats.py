@@ -0,0 +1,92 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Coalesce
+
+
+def backfill_game_stats(apps, schema_editor):
+    """
+    Build UserGameStats from existing history. Sessions recorded so far have
+    no game, frequency band or accuracy, so only note rounds count, through
+    their challenge: every attempt is a play, an attempt scoring 1 is
+    correct, a parent session reaching 100 is a perfect score (as in 0010)
+    and the best score is the highest parent session score.
+    """
+    GameSession = apps.get_model('ear_tune', 'GameSession')
+    UserGameStats = apps.get_model('ear_tune', 'UserGameStats')
+    per_game = (
+        GameSession.objects
+        .filter(user__isnull=False, challenge__game__isnull=False)
+        .order_by()
+        .values('user_id', 'challenge__game_id')
+        .annotate(
+            plays=Count('id', filter=Q(is_attempt=True)),
+            correct=Count('id', filter=Q(is_attempt=True, score=1)),
+            perfect_scores=Count('id', filter=Q(is_attempt=False, score__gte=100)),
+            best_score=Coalesce(Max('score', filter=Q(is_attempt=False)), 0),
+        )
+    )
+    UserGameStats.objects.bulk_create([
+        UserGameStats(user_id=row['user_id'], game_id=row['challenge__game_id'], plays=row['plays'],
+                      correct=row['correct'], perfect_scores=row['perfect_scores'], best_score=row['best_score'])
+        for row in per_game if row['plays']
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ear_tune', '0012_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='accuracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='frequency_band',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ear_tune.frequencyband'),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='game',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ear_tune.game'),
+        ),
+        migrations.CreateModel(
+            name='UserBandStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plays', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('frequency_band', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ear_tune.frequencyband')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='band_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'frequency_band'), name='userbandstats_user_band_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserGameStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plays', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('perfect_scores', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('accuracy_total', models.FloatField(default=0)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ear_tune.game')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'game'), name='usergamestats_user_game_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_game_stats, migrations.RunPython.noop),
+    ]
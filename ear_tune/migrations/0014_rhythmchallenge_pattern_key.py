@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ear_tune', '0013_user_game_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rhythmchallenge',
+            name='pattern_key',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='rhythmchallenge',
+            constraint=models.UniqueConstraint(fields=('game', 'pattern_key'), name='rhythmchallenge_game_pattern_key_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ear_tune', '0014_rhythmchallenge_pattern_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rhythmchallenge',
+            name='onsets_ms',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 # ear_tune/models.py - Add attempts field to GameSession model
 
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -47,7 +48,8 @@ class GameSession(models.Model):
     """A record of a user's game session, tracking performance"""
     date_played = models.DateTimeField(auto_now_add=True)
     score = models.IntegerField(default=0)
-    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name='game_sessions')
+    # EQ and rhythm rounds are recorded without a note Challenge
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name='game_sessions', null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='game_sessions')
     active = models.BooleanField(default=True)
     # New field to track remaining attempts
@@ -56,6 +58,25 @@ class GameSession(models.Model):
     is_attempt = models.BooleanField(default=False)
     # Reference to parent session (for tracking attempts)
     parent_session = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='attempts')
+    # What the round was, for rebuilding UserGameStats from history: the game of every
+    # answered round, the band of an EQ round and the tap accuracy (%) of a rhythm round
+    game = models.ForeignKey(Game, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    frequency_band = models.ForeignKey('FrequencyBand', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='+')
+    accuracy = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # History: a user's finished sessions, newest first (GameSessionList, game_history)
+            models.Index(fields=['user', '-date_played', '-id'], condition=Q(is_attempt=False),
+                         name='gamesession_history_idx'),
+            # A user's active session for a game (game_detail)
+            models.Index(fields=['user', 'challenge'], condition=Q(active=True),
+                         name='gamesession_active_idx'),
+            # Perfect-score counts (total_perfect_scores backfill and reconciliation)
+            models.Index(fields=['user'], condition=Q(score=100, is_attempt=False),
+                         name='gamesession_perfect_idx'),
+        ]
 
     def __str__(self):
         """Return a string representation of the game session."""
@@ -125,10 +146,17 @@ class RhythmChallenge(models.Model):
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES)
     audio_file = models.CharField(max_length=200)  # path to audio file
     correct_pattern = models.JSONField()  # expected answer
+    # Identifies a generated pattern (see scripts/generate_rhythm_challenges.py), so reruns update it in place
+    pattern_key = models.CharField(max_length=32, null=True, blank=True)
+    # Expected tap times over every bar of the audio, packed by ear_tune.rhythm.pack_onsets()
+    onsets_ms = models.BinaryField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'pattern_key'], name='rhythmchallenge_game_pattern_key_unique'),
+        ]
 
     def __str__(self):
         return f"Rhythm Challenge - {self.difficulty} - {self.tempo} BPM ({self.time_signature})"
@@ -136,6 +164,32 @@ class RhythmChallenge(models.Model):
 
 # Gamification Models
 
+def level_for_xp(xp):
+    """Return the level reached with the given amount of XP."""
+    if xp <= 0:
+        return 1
+    # Formula: level = floor(sqrt(xp / 100)) + 1
+    # This creates a scaling progression: Level 1: 0 XP, Level 2: 100 XP, Level 3: 400 XP, Level 4: 900 XP, etc.
+    return math.floor(math.sqrt(xp / 100)) + 1
+
+
+def advance_streak(last_activity_date, current_streak, today):
+    """
+    Return the (current_streak, last_activity_date) pair after activity on `today`.
+    """
+    if last_activity_date is None:
+        # First activity
+        return 1, today
+    if last_activity_date == today:
+        # Already played today, no change
+        return current_streak, last_activity_date
+    if (today - last_activity_date).days == 1:
+        # Consecutive day
+        return current_streak + 1, today
+    # Streak broken
+    return 1, today
+
+
 class UserProfile(models.Model):
     """User profile for tracking gamification progress."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -143,19 +197,23 @@ class UserProfile(models.Model):
     level = models.IntegerField(default=1)
     total_games_played = models.IntegerField(default=0)
     total_correct_answers = models.IntegerField(default=0)
+    # Non-attempt sessions scored 100, kept in step by the gamification pipeline
+    total_perfect_scores = models.IntegerField(default=0)
     current_streak = models.IntegerField(default=0)
     longest_streak = models.IntegerField(default=0)
     last_activity_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Lets each worker's materialized leaderboard pick up changes from other workers
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-xp'], name='userprofile_xp_idx'),
+        ]
 
     def calculate_level(self):
         """Calculate level from XP (100 XP per level with scaling)."""
-        if self.xp == 0:
-            return 1
-        # Formula: level = floor(sqrt(xp / 100)) + 1
-        # This creates a scaling progression: Level 1: 0 XP, Level 2: 100 XP, Level 3: 400 XP, Level 4: 900 XP, etc.
-        level = math.floor(math.sqrt(self.xp / 100)) + 1
-        return level
+        return level_for_xp(self.xp)
 
     def add_xp(self, amount):
         """Add XP and check for level up."""
@@ -175,26 +233,12 @@ class UserProfile(models.Model):
 
     def update_streak(self):
         """Check and update daily streak."""
-        today = date.today()
-
-        if self.last_activity_date is None:
-            # First activity
-            self.current_streak = 1
-            self.last_activity_date = today
-        elif self.last_activity_date == today:
-            # Already played today, no change
-            pass
-        elif (today - self.last_activity_date).days == 1:
-            # Consecutive day
-            self.current_streak += 1
-            self.last_activity_date = today
-            # Update longest streak if needed
-            if self.current_streak > self.longest_streak:
-                self.longest_streak = self.current_streak
-        else:
-            # Streak broken
-            self.current_streak = 1
-            self.last_activity_date = today
+        self.current_streak, self.last_activity_date = advance_streak(
+            self.last_activity_date, self.current_streak, date.today()
+        )
+        # Update longest streak if needed
+        if self.current_streak > self.longest_streak:
+            self.longest_streak = self.current_streak
 
         self.save()
 
@@ -241,6 +285,61 @@ class UserAchievement(models.Model):
         return f"{self.user.username} unlocked {self.achievement.name}"
 
 
+class UserGameStats(models.Model):
+    """
+    A user's running totals for one game, updated with each answer by the
+    gamification pipeline (see ear_tune.stats) and rebuilt from GameSession
+    history by the rebuild_game_stats command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='game_stats')
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='+')
+    plays = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    perfect_scores = models.IntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    # Sum of rhythm tap accuracies, in percent; see average_accuracy
+    accuracy_total = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'game'], name='usergamestats_user_game_unique'),
+        ]
+
+    @property
+    def accuracy(self):
+        """Share of correct answers, in percent."""
+        return self.correct / self.plays * 100 if self.plays else 0
+
+    @property
+    def average_accuracy(self):
+        """Mean rhythm tap accuracy, in percent."""
+        return self.accuracy_total / self.plays if self.plays else 0
+
+    def __str__(self):
+        return f"{self.user.username} - {self.game.name}: {self.correct}/{self.plays}"
+
+
+class UserBandStats(models.Model):
+    """A user's running EQ totals for one frequency band, kept like UserGameStats."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='band_stats')
+    frequency_band = models.ForeignKey(FrequencyBand, on_delete=models.CASCADE, related_name='+')
+    plays = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'frequency_band'], name='userbandstats_user_band_unique'),
+        ]
+
+    @property
+    def accuracy(self):
+        """Share of correct answers, in percent."""
+        return self.correct / self.plays * 100 if self.plays else 0
+
+    def __str__(self):
+        return f"{self.user.username} - {self.frequency_band.name}: {self.correct}/{self.plays}"
+
+
 # Signal to auto-create UserProfile when User is created
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -259,62 +358,11 @@ def save_user_profile(sender, instance, **kwargs):
 # Helper function to check and unlock achievements
 def check_and_unlock_achievements(user):
     """
-    Check each achievement criteria against user stats and unlock if criteria met.
+    Check every achievement criteria against user stats and unlock if criteria met.
     Returns list of newly unlocked achievements.
     """
-    newly_unlocked = []
-
-    # Get user profile
-    profile = user.profile
-
-    # Get all achievements
-    all_achievements = Achievement.objects.all()
-
-    # Get already unlocked achievement IDs
-    unlocked_ids = UserAchievement.objects.filter(user=user).values_list('achievement_id', flat=True)
-
-    for achievement in all_achievements:
-        # Skip if already unlocked
-        if achievement.id in unlocked_ids:
-            continue
-
-        # Check criteria
-        criteria_met = False
-
-        if achievement.criteria_type == 'games_played':
-            criteria_met = profile.total_games_played >= achievement.criteria_value
-        elif achievement.criteria_type == 'streak':
-            criteria_met = profile.current_streak >= achievement.criteria_value
-        elif achievement.criteria_type == 'level':
-            criteria_met = profile.level >= achievement.criteria_value
-        elif achievement.criteria_type == 'accuracy':
-            # Calculate overall accuracy
-            if profile.total_games_played > 0:
-                accuracy = (profile.total_correct_answers / profile.total_games_played) * 100
-                criteria_met = accuracy >= achievement.criteria_value
-        elif achievement.criteria_type == 'perfect_scores':
-            # Count perfect score sessions (score = 100)
-            perfect_count = GameSession.objects.filter(
-                user=user,
-                score=100,
-                is_attempt=False
-            ).count()
-            criteria_met = perfect_count >= achievement.criteria_value
-
-        # Unlock if criteria met
-        if criteria_met:
-            UserAchievement.objects.create(
-                user=user,
-                achievement=achievement
-            )
-            # Award XP reward
-            profile.add_xp(achievement.xp_reward)
-            newly_unlocked.append({
-                'id': achievement.id,
-                'name': achievement.name,
-                'description': achievement.description,
-                'icon': achievement.icon,
-                'xp_reward': achievement.xp_reward
-            })
-
-    return newly_unlocked
\ No newline at end of file
+    from .achievements import CRITERIA_TYPES
+    from .gamification import apply_gamification
+
+    progress = apply_gamification(user, games_played=0, update_streak=False, criteria=CRITERIA_TYPES)
+    return progress['unlocked_achievements']
@@ -0,0 +1,222 @@
+"""
+On-demand EQ renders.
+
+Only the source stems are stored; every (band, gain) variant is rendered
+with ear_tune.eq when first requested and kept in two byte-bounded LRU
+caches: one in process memory and one on disk shared by all workers.
+Renders are keyed by the source file's size and mtime, the EQ parameters,
+the codec and RENDER_CODE_VERSION, so stale entries are never served.
+
+Settings (all optional):
+    EQ_SOURCE_DIRS          directories searched for <source_audio>.wav
+    EQ_RENDER_CACHE_DIR     disk cache directory
+    EQ_RENDER_MEMORY_BYTES  in-memory cache budget (default 64 MiB)
+    EQ_RENDER_DISK_BYTES    disk cache budget (default 2 GiB)
+    EQ_SOURCE_MEMORY_BYTES  budget for decoded sources (default 128 MiB)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import soundfile as sf
+from django.conf import settings
+
+from .audio import CODECS, encode
+from .eq import Q_FACTOR, RENDER_CODE_VERSION, apply_eq
+
+
+class SourceNotFound(Exception):
+    """No source stem exists for the requested source_audio name."""
+
+
+class ByteLRU:
+    """In-memory LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class DiskLRU:
+    """
+    Directory of cached files bounded by total size, evicting the least
+    recently used (by mtime, which hits refresh). The index is built from
+    the directory on first use; files other workers add or remove are
+    tolerated.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self._index = None  # key -> size, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((name, size) for _, name, size in entries)
+        self._bytes = sum(self._index.values())
+
+    def get(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._index.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        path = os.path.join(self.directory, key)
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self._bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                evicted, size = self._index.popitem(last=False)
+                self._bytes -= size
+                try:
+                    os.remove(os.path.join(self.directory, evicted))
+                except FileNotFoundError:
+                    pass
+
+
+class EQRenderer:
+    """Renders EQ challenge audio on demand through the memory and disk caches."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop the in-memory caches and re-read settings on next use."""
+        with self._lock:
+            self._memory = self._disk = self._sources = None
+
+    def _caches(self):
+        if self._memory is None:
+            with self._lock:
+                self._sources = ByteLRU(getattr(settings, 'EQ_SOURCE_MEMORY_BYTES', 128 << 20))
+                self._disk = DiskLRU(
+                    getattr(settings, 'EQ_RENDER_CACHE_DIR', settings.BASE_DIR / 'cache' / 'eq_renders'),
+                    getattr(settings, 'EQ_RENDER_DISK_BYTES', 2 << 30)
+                )
+                self._memory = ByteLRU(getattr(settings, 'EQ_RENDER_MEMORY_BYTES', 64 << 20))
+        return self._memory, self._disk, self._sources
+
+    def source_dirs(self):
+        """Directories searched for stems, in order."""
+        default_root = settings.BASE_DIR / 'static' / 'audio' / 'eq_samples' / 'sources'
+        return getattr(settings, 'EQ_SOURCE_DIRS', [
+            default_root, default_root / 'generated', default_root / 'custom'
+        ])
+
+    def source_path(self, source_audio):
+        """Path of the stem for an EQChallenge.source_audio value."""
+        name = os.path.basename(source_audio)
+        if not name.endswith('.wav'):
+            name = f'{name}.wav'
+        for directory in self.source_dirs():
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                return path
+        raise SourceNotFound(source_audio)
+
+    def _decode(self, path, stat, sources):
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        decoded = sources.get(key)
+        if decoded is None:
+            audio_data, sample_rate = sf.read(path)
+            # Handle stereo files by converting to mono
+            if audio_data.ndim > 1:
+                audio_data = audio_data.mean(axis=1)
+            decoded = (audio_data, sample_rate)
+            sources.put(key, decoded, audio_data.nbytes)
+        return decoded
+
+    def _key(self, path, stat, center_freq, gain_db, codec):
+        params = [path, stat.st_size, stat.st_mtime_ns, center_freq if gain_db else None, gain_db,
+                  Q_FACTOR, codec, RENDER_CODE_VERSION]
+        return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+    def key(self, source_audio, center_freq, gain_db, codec='wav'):
+        """The key render() returns for these parameters, without rendering."""
+        path = self.source_path(source_audio)
+        return self._key(path, os.stat(path), center_freq, gain_db, codec)
+
+    def render(self, source_audio, center_freq, gain_db, codec='wav'):
+        """
+        Return (data, content_type, key) for the source with the EQ applied.
+        A gain of 0 returns the unprocessed source. The key identifies the
+        rendered bytes and serves as their ETag.
+        """
+        content_type = CODECS[codec]['content_type']
+        path = self.source_path(source_audio)
+        stat = os.stat(path)
+        key = self._key(path, stat, center_freq, gain_db, codec)
+
+        memory, disk, sources = self._caches()
+        data = memory.get(key)
+        if data is not None:
+            return data, content_type, key
+        data = disk.get(key)
+        if data is None:
+            audio_data, sample_rate = self._decode(path, stat, sources)
+            if gain_db:
+                audio_data = apply_eq(audio_data, sample_rate, center_freq, gain_db)
+            data = encode(audio_data, sample_rate, codec)
+            disk.put(key, data)
+        memory.put(key, data, len(data))
+        return data, content_type, key
+
+
+renderer = EQRenderer()
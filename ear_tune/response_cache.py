@@ -0,0 +1,129 @@
+"""
+Server-side response cache for public GET endpoints.
+
+cache_response(*models) stores a view's rendered 200 responses in the
+Django cache, keyed by path, query string and Accept header, and serves
+them with a strong ETag and a public Cache-Control header. Clients holding
+the current ETag get a 304.
+
+Invalidation is by version: each model the view depends on has a version
+number in the cache, which is part of every response key and is bumped
+when a row of that model is saved or deleted. A bump therefore retires
+every cached response built from the old rows at once, in every worker
+sharing the cache backend.
+
+Hits skip authentication and permission checks, so only decorate views
+whose response is the same for every caller.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+# Headers the view sets that are replayed on a hit
+_REPLAYED_HEADERS = ('Content-Type', 'Vary', 'Allow')
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(model):
+    return f'response-cache:version:{model._meta.label_lower}'
+
+
+def _fresh_version():
+    # Not 1: a version key evicted and recreated must not revive old entries
+    return time.time_ns()
+
+
+def bump_response_version(sender, **kwargs):
+    """Retire every cached response that depends on the sender model."""
+    cache = response_cache()
+    key = _version_key(sender)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), None)
+
+
+def _versions(cache, models):
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _cache_key(request, versions):
+    digest = hashlib.sha256('\n'.join([
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        ','.join(map(str, versions)),
+    ]).encode()).hexdigest()
+    return f'response-cache:{digest}'
+
+
+def cache_response(*models, timeout=None, max_age=None):
+    """
+    Cache a view's GET responses until a row of one of `models` changes.
+    `timeout` (server side) and `max_age` (client side) default to the
+    RESPONSE_CACHE_TIMEOUT and RESPONSE_CACHE_MAX_AGE settings; a timeout
+    of 0 turns the server-side cache off but keeps the ETag handling.
+
+    For class-based views: @method_decorator(cache_response(Game), name='dispatch').
+    """
+    for model in models:
+        for signal in (post_save, post_delete):
+            signal.connect(bump_response_version, sender=model, dispatch_uid=f'response-cache:{model._meta.label}')
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            seconds = timeout if timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+            cache = response_cache()
+            key = _cache_key(request, _versions(cache, models)) if seconds else None
+            entry = cache.get(key) if key else None
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+                if response.status_code != 200 or response.streaming:
+                    return response
+                headers = {name: response[name] for name in _REPLAYED_HEADERS if response.has_header(name)}
+                etag = '"%s"' % hashlib.sha256(response.content).hexdigest()[:32]
+                entry = (response.content, headers, etag)
+                if key:
+                    cache.set(key, entry, seconds)
+
+            content, headers, etag = entry
+            response = HttpResponse(content)
+            for name, value in headers.items():
+                response[name] = value
+            response['ETag'] = etag
+            patch_cache_control(
+                response, public=True,
+                max_age=max_age if max_age is not None else getattr(settings, 'RESPONSE_CACHE_MAX_AGE', 60),
+            )
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                for name in ('ETag', 'Cache-Control', 'Vary'):
+                    if response.has_header(name):
+                        not_modified[name] = response[name]
+                return not_modified
+            return response
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,183 @@
+"""
+Rhythm tap scoring.
+
+Taps and expected onsets are matched one-to-one within a timing tolerance.
+Both are sorted and matched greedily: each expected onset, in order, takes
+the earliest unused tap inside its window. Because every window has the
+same width, this matches as many taps as any pairing can, unlike the old
+first-match scan. The greedy pass is expressed as a NumPy recurrence, so
+matching 10k taps takes well under a millisecond; for large submissions
+most of the time goes into converting the JSON lists to arrays.
+
+Submitted taps come straight from request JSON, so check_taps() vets them
+before anything is converted: only finite numbers are accepted, and a
+submission may hold at most a few taps per expected onset.
+
+The expected onsets of generated challenges are computed once, at build
+time, over every bar of the track and stored packed next to the JSON
+pattern, so a submit reads them straight into an array.
+"""
+
+import math
+
+import numpy as np
+
+DEFAULT_TOLERANCE_MS = 100
+
+# A submission may hold this many taps per expected onset, plus a few spare
+MAX_TAPS_PER_ONSET = 4
+SPARE_TAPS = 16
+
+# Fixpoint passes before falling back to the sequential loop
+_MAX_PASSES = 16
+
+# RhythmChallenge.onsets_ms holds the expected onsets as packed float32 ms: exact to
+# well under a microsecond over any track length, at 4 bytes per onset
+ONSET_DTYPE = np.dtype('<f4')
+
+
+def expected_onsets_ms(correct_pattern, tempo=120):
+    """
+    Expected tap times in ms for a RhythmChallenge.correct_pattern.
+    Patterns are either a list of ms offsets or a dict with a 'beats' list
+    in beats, which is converted with the challenge tempo.
+    """
+    if isinstance(correct_pattern, dict):
+        beats = np.asarray(correct_pattern.get('beats', []), dtype=np.float64)
+        return beats * (60000.0 / tempo)
+    return np.asarray(correct_pattern, dtype=np.float64)
+
+
+def onset_timeline_ms(beats, tempo, beats_per_bar, bars=1):
+    """
+    Onsets in ms of a one-bar beat pattern repeated for `bars` bars, bar by
+    bar in pattern order. Beats at or past the end of the bar are dropped.
+    """
+    beats = np.asarray(beats, dtype=np.float64)
+    beats = beats[beats < beats_per_bar]
+    ms_per_beat = 60000.0 / tempo
+    bar_starts = np.arange(bars) * (beats_per_bar * ms_per_beat)
+    return (bar_starts[:, None] + beats * ms_per_beat).ravel()
+
+
+def pack_onsets(onsets_ms):
+    """Pack an onset timeline for RhythmChallenge.onsets_ms: sorted little-endian float32 ms."""
+    return np.sort(np.asarray(onsets_ms, dtype=np.float64)).astype(ONSET_DTYPE).tobytes()
+
+
+def unpack_onsets(data):
+    """The sorted onsets of a packed timeline, as a read-only array over the bytes."""
+    return np.frombuffer(data, dtype=ONSET_DTYPE)
+
+
+def challenge_onsets_ms(challenge):
+    """
+    Expected onsets of a RhythmChallenge: its packed timeline over every bar,
+    or for challenges generated before timelines were stored, the first bar
+    converted from correct_pattern.
+    """
+    if challenge.onsets_ms is not None:
+        return unpack_onsets(challenge.onsets_ms)
+    return expected_onsets_ms(challenge.correct_pattern, challenge.tempo)
+
+
+def check_taps(taps_ms, expected_count):
+    """
+    Validate submitted taps for a challenge with `expected_count` onsets.
+    Raises ValueError unless taps_ms is a list of finite ints or floats
+    (bools are not numbers here) no longer than the tap limit.
+    """
+    if not isinstance(taps_ms, list):
+        raise ValueError('user_taps must be a list of timestamps.')
+    if len(taps_ms) > MAX_TAPS_PER_ONSET * expected_count + SPARE_TAPS:
+        raise ValueError('Too many taps for this challenge.')
+    for tap in taps_ms:
+        if isinstance(tap, bool) or not isinstance(tap, (int, float)):
+            raise ValueError('user_taps must be a list of timestamps.')
+        try:
+            finite = math.isfinite(tap)
+        except OverflowError:
+            finite = False
+        if not finite:
+            raise ValueError('user_taps must be a list of timestamps.')
+
+
+def _match_sequential(expected, taps, lo, hi):
+    """Reference greedy matching; returns the matched tap index per onset, or -1."""
+    match = np.full(len(expected), -1, dtype=np.int64)
+    last = -1
+    for i in range(len(expected)):
+        candidate = max(lo[i], last + 1)
+        if candidate < hi[i]:
+            match[i] = last = candidate
+    return match
+
+
+def _match(expected, taps, tolerance):
+    """
+    Greedy earliest-feasible matching of sorted onsets to sorted taps.
+
+    With c[i] the number of onsets matched before i, the tap onset i tries is
+        q[i] = c[i] + max(lo[i] - c[i], max over matched k < i of (lo[k] - c[k]))
+    where lo[i] is the first tap inside the window. That is a cumulative max
+    once the matched set is known, so iterate matched -> q -> matched to the
+    fixpoint (which is unique and equals the sequential greedy result).
+    """
+    lo = np.searchsorted(taps, expected - tolerance, side='left')
+    hi = np.searchsorted(taps, expected + tolerance, side='right')
+    matched = lo < hi
+    for _ in range(_MAX_PASSES):
+        before = np.cumsum(matched) - matched
+        slack = lo - before
+        prior = np.maximum.accumulate(np.where(matched, slack, np.iinfo(np.int64).min))
+        prior = np.concatenate(([np.iinfo(np.int64).min], prior[:-1]))
+        candidate = before + np.maximum(slack, prior)
+        now_matched = candidate < hi
+        if np.array_equal(now_matched, matched):
+            return np.where(matched, candidate, -1)
+        matched = now_matched
+    return _match_sequential(expected, taps, lo, hi)
+
+
+def score_taps(expected_ms, taps_ms, tolerance=DEFAULT_TOLERANCE_MS):
+    """
+    Match user taps to expected onsets and summarize the timing.
+
+    Returns a dict with:
+        correct_taps    number of onsets hit within the tolerance
+        total_expected  number of expected onsets
+        accuracy        correct_taps / total_expected as a percentage
+        offsets         per expected onset (sorted), tap minus onset in ms, or None if missed
+        mean_offset_ms  mean signed offset of the hits (positive means late)
+        std_offset_ms   standard deviation of the hit offsets
+        tempo_drift     change in offset per second of pattern, in ms; positive
+                        means the user was slowing down relative to the pattern
+    """
+    expected = np.sort(np.asarray(expected_ms, dtype=np.float64))
+    taps = np.sort(np.asarray(taps_ms, dtype=np.float64))
+
+    match = _match(expected, taps, tolerance) if len(expected) and len(taps) else np.full(len(expected), -1)
+    hit = match >= 0
+    offsets = np.full(len(expected), np.nan)
+    offsets[hit] = taps[match[hit]] - expected[hit]
+    hits = offsets[hit]
+
+    # Least-squares slope of offset against onset time
+    tempo_drift = 0.0
+    if len(hits) >= 2:
+        seconds = expected[hit] / 1000.0
+        seconds = seconds - seconds.mean()
+        spread = np.dot(seconds, seconds)
+        if spread > 0:
+            tempo_drift = float(np.dot(seconds, hits - hits.mean()) / spread)
+
+    correct_taps = int(hit.sum())
+    return {
+        'correct_taps': correct_taps,
+        'total_expected': len(expected),
+        'accuracy': (correct_taps / len(expected)) * 100 if len(expected) else 0,
+        'offsets': np.where(hit, np.round(offsets, 1), None).tolist(),
+        'mean_offset_ms': round(float(hits.mean()), 2) if len(hits) else None,
+        'std_offset_ms': round(float(hits.std()), 2) if len(hits) else None,
+        'tempo_drift': round(tempo_drift, 3),
+    }
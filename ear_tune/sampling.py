@@ -0,0 +1,177 @@
+"""
+Random challenge selection index.
+
+Picking a random challenge used to load every matching row and call
+random.choice on the list. The index keeps a compact array of primary keys
+per (model, game, type/difficulty) key so a pick is a random offset into that
+array followed by a single primary-key fetch. Arrays are built lazily on the
+first request for a key. aids() and achoice() do the same through the async
+ORM.
+
+Each model has a version number in the Django cache, bumped when one of its
+rows is saved or deleted and by bulk writers that send no signals (call
+bump_sampler_version() after bulk_create/bulk_update). As with the
+catalogue, each worker compares its arrays against that version at most
+once per SAMPLER_CHECK_INTERVAL seconds and rebuilds them when it has
+moved; with a per-process cache backend, arrays are still rebuilt once they
+are SAMPLER_MAX_AGE seconds old, and arrays of an older version are
+dropped when the next one is stored. Callers pass normalized filters (int
+ids, known difficulties) so request strings cannot grow the index. A pick
+re-applies the filters, so a row deleted or moved to another difficulty
+since the array was built is never returned: it triggers a rebuild
+instead.
+"""
+
+import random
+import threading
+import time
+from array import array
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Challenge, EQChallenge, RhythmChallenge
+
+SAMPLER_VERSION_KEY = 'sampler:version:{}'
+
+
+def sampler_version(model):
+    """The shared version of a challenge model's rows, bumped whenever they change."""
+    return cache.get_or_set(SAMPLER_VERSION_KEY.format(model._meta.label), 1, None)
+
+
+def bump_sampler_version(model):
+    key = SAMPLER_VERSION_KEY.format(model._meta.label)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+class ChallengeSampler:
+    """Process-local index of challenge ids keyed by model and filter values."""
+
+    def __init__(self):
+        self._ids = {}  # key -> (version, built at, ids)
+        self._versions = {}  # model label -> (version, checked at)
+        self._lock = threading.Lock()
+
+    def _key(self, model, filters):
+        return (model._meta.label, tuple(sorted(filters.items())))
+
+    def _checked_version(self, model, now):
+        """The model's version, if it was checked against the shared one recently enough."""
+        checked = self._versions.get(model._meta.label)
+        if checked is not None and now - checked[1] < getattr(settings, 'SAMPLER_CHECK_INTERVAL', 1.0):
+            return checked[0]
+        return None
+
+    def _version(self, model):
+        now = time.monotonic()
+        version = self._checked_version(model, now)
+        if version is None:
+            version = sampler_version(model)
+            with self._lock:
+                self._versions[model._meta.label] = (version, now)
+        return version
+
+    async def _aversion(self, model):
+        version = self._checked_version(model, time.monotonic())
+        if version is None:
+            version = await sync_to_async(self._version)(model)
+        return version
+
+    def _cached(self, key, version):
+        entry = self._ids.get(key)
+        if (entry is None or entry[0] != version
+                or time.monotonic() - entry[1] >= getattr(settings, 'SAMPLER_MAX_AGE', 300)):
+            return None
+        return entry[2]
+
+    def _store(self, key, version, ids):
+        with self._lock:
+            # Arrays built against an older version of the model are never served again
+            for stale in [k for k, entry in self._ids.items() if k[0] == key[0] and entry[0] != version]:
+                del self._ids[stale]
+            self._ids[key] = (version, time.monotonic(), ids)
+
+    def ids(self, model, **filters):
+        """Return the array of ids matching the filters, building it if needed."""
+        key = self._key(model, filters)
+        version = self._version(model)
+        ids = self._cached(key, version)
+        if ids is None:
+            ids = array('q', model.objects.filter(**filters).order_by().values_list('id', flat=True))
+            self._store(key, version, ids)
+        return ids
+
+    def choice(self, model, queryset=None, **filters):
+        """
+        Return a random instance matching the filters, or None if there is none.
+        An optional queryset (e.g. with select_related) is used for the fetch.
+        """
+        queryset = (model.objects.all() if queryset is None else queryset).filter(**filters)
+        # A row deleted or changed by another process leaves a stale id behind; rebuild once.
+        for _ in range(2):
+            ids = self.ids(model, **filters)
+            if not ids:
+                return None
+            try:
+                return queryset.get(pk=random.choice(ids))
+            except model.DoesNotExist:
+                self.invalidate(model)
+        return None
+
+    async def aids(self, model, **filters):
+        """ids() for async code."""
+        key = self._key(model, filters)
+        version = await self._aversion(model)
+        ids = self._cached(key, version)
+        if ids is None:
+            queryset = model.objects.filter(**filters).order_by().values_list('id', flat=True)
+            ids = array('q', [pk async for pk in queryset])
+            self._store(key, version, ids)
+        return ids
+
+    async def achoice(self, model, queryset=None, **filters):
+        """choice() for async code."""
+        queryset = (model.objects.all() if queryset is None else queryset).filter(**filters)
+        for _ in range(2):
+            ids = await self.aids(model, **filters)
+            if not ids:
+                return None
+            try:
+                return await queryset.aget(pk=random.choice(ids))
+            except model.DoesNotExist:
+                self.invalidate(model)
+        return None
+
+    def invalidate(self, model=None):
+        """Drop the cached ids for a model, or for every model, and recheck the shared version."""
+        with self._lock:
+            if model is None:
+                self._ids.clear()
+                self._versions.clear()
+                return
+            label = model._meta.label
+            self._versions.pop(label, None)
+            for key in [key for key in self._ids if key[0] == label]:
+                del self._ids[key]
+
+
+sampler = ChallengeSampler()
+
+
+@receiver(post_save, sender=Challenge)
+@receiver(post_save, sender=EQChallenge)
+@receiver(post_save, sender=RhythmChallenge)
+@receiver(post_delete, sender=Challenge)
+@receiver(post_delete, sender=EQChallenge)
+@receiver(post_delete, sender=RhythmChallenge)
+def invalidate_challenge_index(sender, **kwargs):
+    """Rebuild the sampling index for a challenge model here, and in other workers, when its rows change."""
+    sampler.invalidate(sender)
+    bump_sampler_version(sender)
@@ -0,0 +1,72 @@
+"""
+Scoring of single answers, shared by the per-game submit endpoints and bulk
+submission. These functions only compute outcomes; callers write the
+GameSession rows and apply the gamification totals.
+"""
+
+from .answers import answer_matches
+from .stats import StatsDelta
+
+# Note rounds: base 10 XP plus the 25 XP perfect bonus, at beginner difficulty
+NOTE_XP = 10 + 25
+
+# (minimum accuracy, score, feedback), best first; >= 90% counts as correct
+RHYTHM_GRADES = [
+    (90, 100, "Excellent! Perfect rhythm!"),
+    (75, 75, "Great job! Very close to the beat!"),
+    (60, 50, "Good effort! Keep practicing your timing."),
+    (40, 25, "Not quite there. Try listening more carefully to the rhythm."),
+    (0, 0, "Keep practicing! Listen to the pattern carefully."),
+]
+RHYTHM_CORRECT_ACCURACY = 90
+
+
+def note_answer_is_correct(challenge, answer):
+    """True if the answer is an accepted spelling of the challenge's answer (see ear_tune.answers)."""
+    return answer_matches(challenge.correct_answer, answer)
+
+
+def eq_answer_is_correct(challenge, frequency_band_id, change_amount):
+    """True if both the band and the gain change match the EQ challenge."""
+    return challenge.frequency_band_id == frequency_band_id and challenge.change_amount == change_amount
+
+
+def grade_rhythm(accuracy):
+    """Return (score, feedback) for a rhythm accuracy percentage."""
+    for minimum, score, feedback in RHYTHM_GRADES:
+        if accuracy >= minimum:
+            return score, feedback
+    return RHYTHM_GRADES[-1][1:]
+
+
+class GamificationTotals:
+    """Sums the outcome of several answers into one apply_gamification() call."""
+
+    def __init__(self):
+        self.xp_earned = 0
+        self.games_played = 0
+        self.correct_answers = 0
+        self.perfect_scores = 0
+        self.update_streak = False
+        self.check_achievements = False
+        self.game_stats = StatsDelta()
+
+    def add(self, xp_earned=0, correct_answers=0, perfect_scores=0, update_streak=True, check_achievements=True):
+        """Record one played round; the arguments mirror apply_gamification()."""
+        self.xp_earned += xp_earned
+        self.games_played += 1
+        self.correct_answers += correct_answers
+        self.perfect_scores += perfect_scores
+        self.update_streak = self.update_streak or update_streak
+        self.check_achievements = self.check_achievements or check_achievements
+
+    def as_kwargs(self):
+        return {
+            'xp_earned': self.xp_earned,
+            'games_played': self.games_played,
+            'correct_answers': self.correct_answers,
+            'perfect_scores': self.perfect_scores,
+            'update_streak': self.update_streak,
+            'check_achievements': self.check_achievements,
+            'game_stats': self.game_stats,
+        }
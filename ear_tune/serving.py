@@ -0,0 +1,202 @@
+"""
+Byte-range and conditional responses for audio.
+
+Browsers fetch <audio> sources with Range requests and revalidate them with
+If-None-Match / If-Modified-Since, so every response here carries a strong
+ETag and Accept-Ranges and answers 206, 304, 412 and 416 as appropriate.
+
+serve_file() serves files from process-local memory maps. Under a server
+that implements wsgi.file_wrapper with sendfile() (gunicorn), the response
+also exposes the file descriptor positioned at the range start, so the
+bytes go from the page cache to the socket without passing through Python.
+Files must be replaced (written elsewhere and renamed), not rewritten in
+place, while they are mapped.
+
+serve_bytes() does the same for audio rendered in memory.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import threading
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+CACHE_CONTROL = 'public, max-age=86400'
+BLOCK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range starts past the end of the content."""
+
+
+def parse_range(header, size):
+    """
+    Inclusive (start, end) byte offsets for a single-range Range header, or
+    None to send the whole content: no header, a malformed one, or several
+    ranges (which we answer with the full body rather than multipart).
+    Raises RangeNotSatisfiable when the range lies entirely past the end.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the final N bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _if_range_matches(request, etag, last_modified):
+    """False when an If-Range validator no longer matches, so the full body must be sent."""
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith(('"', 'W/')):
+        return validator == etag
+    return last_modified is not None and parse_http_date_safe(validator) == last_modified
+
+
+def _respond(request, size, content_type, etag, last_modified, make_response):
+    headers = {'ETag': etag, 'Accept-Ranges': 'bytes', 'Cache-Control': CACHE_CONTROL}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        if response.status_code == 304:
+            for name, value in headers.items():
+                response[name] = value
+        return response
+
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    start, end = byte_range or (0, size - 1)
+    response = make_response(start, end - start + 1)
+    response['Content-Type'] = content_type
+    response['Content-Length'] = end - start + 1
+    for name, value in headers.items():
+        response[name] = value
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def serve_bytes(request, data, content_type, etag):
+    """Respond with in-memory content; etag is an opaque string identifying the bytes."""
+    etag = f'"{etag}"'
+    return _respond(request, len(data), content_type, etag, None,
+                    lambda start, length: HttpResponse(data[start:start + length]))
+
+
+class _MappedFile:
+    def __init__(self, path, stat):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.buffer = b''
+        if self.size:
+            with open(path, 'rb') as f:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._digest = None
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.buffer).hexdigest()
+        return self._digest
+
+
+class MappedFiles:
+    """Process-local memory maps of served files, remapped when a file's size or mtime changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+
+    def get(self, path):
+        """Return the mapping for path; raises FileNotFoundError."""
+        stat = os.stat(path)
+        mapped = self._files.get(path)
+        if mapped is None or (mapped.size, mapped.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            mapped = _MappedFile(path, stat)
+            with self._lock:
+                self._files[path] = mapped
+        return mapped
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+
+mapped_files = MappedFiles()
+
+
+class _RangeFile:
+    """
+    File-like view of `length` bytes of a mapped file from `start`.
+
+    read() slices the memory map. fileno() opens the file positioned at the
+    current offset, which gunicorn's file_wrapper hands to sendfile() along
+    with the response's Content-Length.
+    """
+
+    def __init__(self, mapped, start, length):
+        self._mapped = mapped
+        self._position = start
+        self._end = start + length
+        self._file = None
+
+    def read(self, size=-1):
+        end = self._end if size < 0 else min(self._position + size, self._end)
+        data = self._mapped.buffer[self._position:end]
+        self._position = end
+        return data
+
+    def fileno(self):
+        if self._file is None:
+            self._file = open(self._mapped.path, 'rb', buffering=0)
+            self._file.seek(self._position)
+        return self._file.fileno()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def serve_file(request, path, content_type, digest=None):
+    """
+    Respond with a file on disk. The strong ETag is `digest` when the caller
+    knows the content hash (e.g. from a manifest), otherwise the file's
+    SHA-256, computed once per mapping. Raises FileNotFoundError.
+    """
+    mapped = mapped_files.get(path)
+    etag = f'"{digest or mapped.digest}"'
+
+    def make_response(start, length):
+        response = FileResponse(_RangeFile(mapped, start, length))
+        response.block_size = BLOCK_SIZE
+        return response
+
+    return _respond(request, mapped.size, content_type, etag, mapped.mtime_ns // 10 ** 9, make_response)
@@ -0,0 +1,142 @@
+"""
+Per-user, per-game statistics.
+
+UserGameStats and UserBandStats hold running totals so the profile can show
+per-game and per-band accuracy without scanning GameSession. The submit
+endpoints describe each answered round in a StatsDelta, which
+apply_gamification() writes inside its profile transaction: the profile
+row lock serializes a user's submits, so the counters are exact and the
+first answer to a game can insert its row without racing another.
+
+rebuild() recomputes both tables from GameSession history (see the
+rebuild_game_stats command). A round is a note attempt or a challenge-less
+EQ or rhythm session; sessions recorded before the game, frequency band
+and accuracy columns existed only count towards the note game, through
+their challenge.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import GameSession, UserBandStats, UserGameStats
+
+
+class StatsDelta:
+    """The stats changes of one or more answered rounds, by game and frequency band."""
+
+    def __init__(self):
+        self.games = {}
+        self.bands = {}
+
+    def __bool__(self):
+        return bool(self.games or self.bands)
+
+    def add(self, game_id, correct=False, perfect=False, score=None, accuracy=None, frequency_band_id=None):
+        """
+        Record one round. `score` is the best score the round reached (the
+        parent session's score for note rounds), `accuracy` the rhythm tap
+        accuracy and `frequency_band_id` the band of an EQ round.
+        """
+        if game_id is None:
+            return
+        game = self.games.setdefault(game_id, {
+            'plays': 0, 'correct': 0, 'perfect_scores': 0, 'best_score': 0, 'accuracy_total': 0.0,
+        })
+        game['plays'] += 1
+        game['correct'] += int(correct)
+        game['perfect_scores'] += int(perfect)
+        if score is not None:
+            game['best_score'] = max(game['best_score'], score)
+        if accuracy is not None:
+            game['accuracy_total'] += accuracy
+        if frequency_band_id is not None:
+            band = self.bands.setdefault(frequency_band_id, {'plays': 0, 'correct': 0})
+            band['plays'] += 1
+            band['correct'] += int(correct)
+
+    def apply(self, user_id):
+        """Add the delta to the user's rows, creating missing ones. Call with the user's profile locked."""
+        for game_id, totals in self.games.items():
+            updated = UserGameStats.objects.filter(user_id=user_id, game_id=game_id).update(
+                plays=F('plays') + totals['plays'],
+                correct=F('correct') + totals['correct'],
+                perfect_scores=F('perfect_scores') + totals['perfect_scores'],
+                best_score=Greatest(F('best_score'), totals['best_score']),
+                accuracy_total=F('accuracy_total') + totals['accuracy_total'],
+            )
+            if not updated:
+                UserGameStats.objects.create(user_id=user_id, game_id=game_id, **totals)
+        for band_id, totals in self.bands.items():
+            updated = UserBandStats.objects.filter(user_id=user_id, frequency_band_id=band_id).update(
+                plays=F('plays') + totals['plays'],
+                correct=F('correct') + totals['correct'],
+            )
+            if not updated:
+                UserBandStats.objects.create(user_id=user_id, frequency_band_id=band_id, **totals)
+
+
+def rebuild(user_ids=None):
+    """
+    Replace the stats rows of the given users (all users by default) with
+    totals recomputed from GameSession history, in one transaction.
+    Returns (game rows, band rows) written.
+    """
+    # scoring imports this module for GamificationTotals
+    from .scoring import RHYTHM_CORRECT_ACCURACY
+
+    sessions = GameSession.objects.filter(user__isnull=False)
+    game_stats, band_stats = UserGameStats.objects.all(), UserBandStats.objects.all()
+    if user_ids is not None:
+        sessions = sessions.filter(user_id__in=user_ids)
+        game_stats, band_stats = game_stats.filter(user_id__in=user_ids), band_stats.filter(user_id__in=user_ids)
+
+    # Note attempts and challenge-less EQ/rhythm sessions are rounds; note parent sessions carry the best score
+    # Any non-attempt session that reached 100 is a perfect score, note sessions included
+    round_filter = Q(is_attempt=True) | Q(challenge__isnull=True)
+    correct_filter = (
+        Q(is_attempt=True, score=1)
+        | Q(frequency_band__isnull=False, score=100)
+        | Q(accuracy__gte=RHYTHM_CORRECT_ACCURACY)
+    )
+    per_game = (
+        sessions
+        .annotate(game_key=Coalesce('game', 'challenge__game'))
+        .filter(game_key__isnull=False)
+        .order_by()
+        .values('user_id', 'game_key')
+        .annotate(
+            plays=Count('id', filter=round_filter),
+            correct=Count('id', filter=round_filter & correct_filter),
+            perfect_scores=Count('id', filter=Q(is_attempt=False, score__gte=100)),
+            best_score=Coalesce(Max('score', filter=Q(is_attempt=False)), 0),
+            accuracy_total=Coalesce(Sum('accuracy'), 0.0),
+        )
+    )
+    per_band = (
+        sessions
+        .filter(frequency_band__isnull=False)
+        .order_by()
+        .values('user_id', 'frequency_band_id')
+        .annotate(plays=Count('id'), correct=Count('id', filter=Q(score=100)))
+    )
+
+    with transaction.atomic():
+        game_rows = [
+            UserGameStats(
+                user_id=row['user_id'], game_id=row['game_key'], plays=row['plays'], correct=row['correct'],
+                perfect_scores=row['perfect_scores'], best_score=row['best_score'],
+                accuracy_total=row['accuracy_total'],
+            )
+            for row in per_game if row['plays']
+        ]
+        band_rows = [
+            UserBandStats(user_id=row['user_id'], frequency_band_id=row['frequency_band_id'],
+                          plays=row['plays'], correct=row['correct'])
+            for row in per_band
+        ]
+        game_stats.delete()
+        band_stats.delete()
+        UserGameStats.objects.bulk_create(game_rows, batch_size=1000)
+        UserBandStats.objects.bulk_create(band_rows, batch_size=1000)
+    return len(game_rows), len(band_rows)
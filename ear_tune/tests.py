@@ -4,11 +4,40 @@ tests.py
 Unit tests for the EarTune "Notes" game.
 """
 
-from django.test import TestCase, Client
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import tracemalloc
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+from django.db import connection
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Game, Challenge, GameSession
+from scripts import generate_eq_samples
+from . import rhythm
+from .achievements import catalogue, reached_achievements
+from .analysis import FeatureStore, analyze_audio, analyze_library, band_contrast_db, difficulty_for, spectra
+from .answers import answer_matches, compile_answer
+from .audio import integrated_loudness, loudness_gain
+from .catalogue import bump_catalogue_version
+from .clicktrack import click_kernel, click_track, render_clicks
+from .eq import apply_eq, mix_eq, mix_eq_blocks, peak_filter, peak_filter_blocks
+from .gamification import apply_gamification
+from .leaderboard import RankedList
+from .models import Achievement, FrequencyBand, Game, Challenge, GameSession, RhythmChallenge, UserAchievement, UserProfile, check_and_unlock_achievements
+from .render_cache import ByteLRU, DiskLRU
+from .rhythm import expected_onsets_ms, score_taps
+from .sampling import bump_sampler_version, sampler
+from .scoring import note_answer_is_correct
+from .serving import RangeNotSatisfiable, parse_range
 from .utils import validate_answer
+from .variants import VariantIndex, note_audio_path, transcode_library, variant_index
 
 class NotesGameTests(TestCase):
     def setUp(self):
@@ -33,8 +62,8 @@ class NotesGameTests(TestCase):
         url = reverse('ear_tune:game_detail', args=[self.game.id])
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        # Check that the computed audio file name "c3.wav" appears in the response.
-        self.assertIn("c3.wav", response.content.decode())
+        # The note's recording is C3.wav on disk; the URL follows the file's case.
+        self.assertIn("c3.wav", response.content.decode().lower())
 
     def test_correct_answer_increments_session_score(self):
         """Correct answer ('c') should increment score and keep session active."""
@@ -70,3 +99,620 @@ class UtilsTests(TestCase):
         result, score =validate_answer("d", "c")
         self.assertEqual(result, "Incorrect. Try again!")
         self.assertEqual(score, 0)
+
+
+class AnswerMatcherTests(TestCase):
+    def test_enharmonic_spellings(self):
+        for answer in ('asharp', 'A#', 'a♯', 'Bb', 'B flat', 'b♭', 'A-Sharp'):
+            self.assertTrue(answer_matches('asharp', answer), answer)
+        for answer in ('a', 'b', 'bsharp', 'as'):
+            self.assertFalse(answer_matches('asharp', answer), answer)
+        # Naturals have enharmonic spellings too
+        self.assertTrue(answer_matches('c', 'B#'))
+        self.assertTrue(answer_matches('e', 'fb'))
+
+    def test_alternatives_and_plain_answers(self):
+        self.assertTrue(answer_matches('major third_maj3', 'MAJ3'))
+        self.assertTrue(answer_matches('major third_maj3', 'Major Third'))
+        self.assertFalse(answer_matches('major third_maj3', 'minor third'))
+        self.assertIs(compile_answer('asharp'), compile_answer('asharp'))
+
+    def test_api_and_template_view_agree(self):
+        self.assertEqual(validate_answer('Db', 'csharp'), ("Correct!", 1))
+        challenge = Challenge(correct_answer='csharp')
+        self.assertTrue(note_answer_is_correct(challenge, 'c#'))
+
+
+class ChallengeSamplerTests(TestCase):
+    def setUp(self):
+        sampler.invalidate()
+        self.game = Game.objects.create(name='Notes', description='Test notes game')
+        self.challenges = [
+            Challenge.objects.create(game=self.game, challenge_type='note', prompt='Identify this note.', correct_answer=note)
+            for note in 'abc'
+        ]
+
+    def test_choice_returns_matching_challenge(self):
+        challenge = sampler.choice(Challenge, challenge_type='note', game_id=self.game.id)
+        self.assertIn(challenge, self.challenges)
+
+    def test_warm_choice_is_single_query(self):
+        sampler.ids(Challenge, challenge_type='note', game_id=self.game.id)
+        with self.assertNumQueries(1):
+            sampler.choice(Challenge, challenge_type='note', game_id=self.game.id)
+
+    def test_choice_with_no_matches_returns_none(self):
+        self.assertIsNone(sampler.choice(Challenge, challenge_type='chord', game_id=self.game.id))
+
+    def test_index_is_invalidated_on_save_and_delete(self):
+        self.assertEqual(len(sampler.ids(Challenge, game_id=self.game.id)), 3)
+        Challenge.objects.create(game=self.game, challenge_type='note', prompt='Identify this note.', correct_answer='d')
+        self.assertEqual(len(sampler.ids(Challenge, game_id=self.game.id)), 4)
+        self.challenges[0].delete()
+        self.assertEqual(len(sampler.ids(Challenge, game_id=self.game.id)), 3)
+
+    def test_stale_id_is_rebuilt(self):
+        sampler.ids(Challenge, game_id=self.game.id)
+        # Bypass signals, as a delete in another worker process would.
+        Challenge.objects.filter(id__in=[c.id for c in self.challenges[:2]])._raw_delete('default')
+        for _ in range(10):
+            self.assertEqual(sampler.choice(Challenge, game_id=self.game.id), self.challenges[2])
+
+    def test_changed_rows_no_longer_match(self):
+        sampler.ids(Challenge, challenge_type='note', game_id=self.game.id)
+        # A bulk update sends no signals, and the index still lists these ids as notes
+        Challenge.objects.filter(id__in=[c.id for c in self.challenges[:2]]).update(challenge_type='chord')
+        for _ in range(10):
+            self.assertEqual(sampler.choice(Challenge, challenge_type='note', game_id=self.game.id),
+                             self.challenges[2])
+
+    def test_shared_version_rebuilds_other_workers(self):
+        sampler.ids(Challenge, game_id=self.game.id)
+        # Another process inserts rows without signals, then bumps the shared version
+        Challenge.objects.bulk_create([Challenge(game=self.game, challenge_type='note', correct_answer='d')])
+        with override_settings(SAMPLER_CHECK_INTERVAL=3600):
+            self.assertEqual(len(sampler.ids(Challenge, game_id=self.game.id)), 3)
+        bump_sampler_version(Challenge)
+        with override_settings(SAMPLER_CHECK_INTERVAL=0):
+            self.assertEqual(len(sampler.ids(Challenge, game_id=self.game.id)), 4)
+
+    def test_arrays_of_older_versions_are_dropped(self):
+        sampler.ids(Challenge, game_id=self.game.id)
+        sampler.ids(Challenge, challenge_type='note')
+        bump_sampler_version(Challenge)
+        with override_settings(SAMPLER_CHECK_INTERVAL=0):
+            sampler.ids(Challenge, challenge_type='note')
+        self.assertEqual(list(sampler._ids), [('ear_tune.Challenge', (('challenge_type', 'note'),))])
+
+
+class CatalogueTests(TestCase):
+    def setUp(self):
+        catalogue.invalidate()
+        self.user = User.objects.create(username='testuser')
+        self.games = [Game.objects.create(name=name) for name in ('Notes', 'Frequency Recognition')]
+        FrequencyBand.objects.create(name='Mids', min_frequency=500, max_frequency=2000, center_frequency=1000)
+
+    def test_lookups_are_served_from_memory(self):
+        catalogue.games()
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogue.game(name='Frequency Recognition'), self.games[1])
+            self.assertEqual(catalogue.game(id=str(self.games[0].id)), self.games[0])
+            self.assertEqual([band.name for band in catalogue.frequency_bands()], ['Mids'])
+            with self.assertRaises(Game.DoesNotExist):
+                catalogue.game(id='not-an-id')
+
+    def test_hot_endpoints_read_no_catalogue_rows(self):
+        catalogue.games()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get(reverse('game-list')).json()), 2)
+            self.assertEqual(self.client.get(reverse('game-detail', args=[self.games[0].id])).json()['name'], 'Notes')
+            self.assertEqual(len(self.client.get(reverse('frequency-band-list')).json()), 1)
+        self.assertEqual(self.client.get(reverse('game-detail', args=[999])).status_code, 404)
+
+    def test_save_reloads_catalogue(self):
+        catalogue.games()
+        Game.objects.create(name='Rhythm Recognition')
+        self.assertEqual(catalogue.game(name='Rhythm Recognition').name, 'Rhythm Recognition')
+
+    def test_version_bump_from_another_worker_reloads(self):
+        catalogue.games()
+        # A queryset update sends no signals, like an edit made in another worker.
+        Game.objects.filter(pk=self.games[0].pk).update(name='Pitch')
+        bump_catalogue_version()
+        with override_settings(CATALOGUE_CHECK_INTERVAL=3600):
+            self.assertEqual(catalogue.game(id=self.games[0].id).name, 'Notes')
+        with override_settings(CATALOGUE_CHECK_INTERVAL=0):
+            self.assertEqual(catalogue.game(id=self.games[0].id).name, 'Pitch')
+
+
+class AchievementEngineTests(TestCase):
+    def setUp(self):
+        catalogue.invalidate()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.played = [
+            Achievement.objects.create(name=f'Played {value}', description='', icon='*',
+                                       criteria_type='games_played', criteria_value=value)
+            for value in (1, 5, 10)
+        ]
+        self.perfect = Achievement.objects.create(name='Perfect 2', description='', icon='*',
+                                                  criteria_type='perfect_scores', criteria_value=2)
+
+    def test_reached_achievements_skips_unlocked_and_unreached(self):
+        reached = reached_achievements('games_played', 7, {self.played[0].id})
+        self.assertEqual(reached, [self.played[1]])
+
+    def test_only_changed_criteria_are_evaluated(self):
+        apply_gamification(self.user)
+        apply_gamification(self.user, perfect_scores=1)
+        self.assertFalse(UserAchievement.objects.filter(achievement=self.perfect).exists())
+        # Counter moves from 1 to 2 and crosses the threshold.
+        progress = apply_gamification(self.user, perfect_scores=1)
+        self.assertEqual([a['name'] for a in progress['unlocked_achievements']], ['Perfect 2'])
+        self.assertEqual(self.user.profile.total_perfect_scores, 2)
+
+    def test_no_lookup_when_no_threshold_is_reached(self):
+        Achievement.objects.filter(criteria_type='games_played').delete()
+        catalogue.invalidate()
+        catalogue.achievements('games_played')
+        # Locked profile read, UPDATE, and the savepoint pair; no unlock lookup.
+        with self.assertNumQueries(4):
+            apply_gamification(self.user)
+
+    def test_full_check_unlocks_achievements_added_later(self):
+        for _ in range(5):
+            apply_gamification(self.user)
+        late = Achievement.objects.create(name='Played 3', description='', icon='*',
+                                          criteria_type='games_played', criteria_value=3)
+        unlocked = check_and_unlock_achievements(self.user)
+        self.assertEqual([a['id'] for a in unlocked], [late.id])
+
+
+class RankedListTests(TestCase):
+    def test_matches_sorted_list_under_random_updates(self):
+        rng = random.Random(0)
+        RankedList.LOAD = 4  # force many bucket splits and merges
+        try:
+            expected = rng.sample(range(-10000, 10000), 300)
+            ranked = RankedList(expected)
+            expected.sort()
+            for _ in range(2000):
+                if expected and rng.random() < 0.5:
+                    key = expected.pop(rng.randrange(len(expected)))
+                    ranked.remove(key)
+                else:
+                    key = rng.randrange(-10000, 10000)
+                    if key in expected:
+                        continue
+                    ranked.add(key)
+                    expected.insert(sorted(expected + [key]).index(key), key)
+                self.assertEqual(len(ranked), len(expected))
+            for position, key in enumerate(expected):
+                self.assertEqual(ranked.index(key), position)
+            self.assertEqual(ranked.slice(0, len(expected)), expected)
+            self.assertEqual(ranked.slice(17, 42), expected[17:42])
+        finally:
+            RankedList.LOAD = 512
+
+
+class RhythmScoringTests(TestCase):
+    def test_matches_as_many_taps_as_possible(self):
+        # First-match pairs the 0ms onset with the 90ms tap and strands the 150ms onset.
+        result = score_taps([0, 150], [90, -60])
+        self.assertEqual(result['correct_taps'], 2)
+        self.assertEqual(result['offsets'], [-60.0, -60.0])
+
+    def test_agrees_with_sequential_greedy(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            expected = np.sort([rng.uniform(0, 3000) for _ in range(rng.randrange(1, 40))])
+            taps = np.sort([rng.uniform(0, 3000) for _ in range(rng.randrange(1, 40))])
+            lo = np.searchsorted(taps, expected - 100, side='left')
+            hi = np.searchsorted(taps, expected + 100, side='right')
+            self.assertEqual(
+                rhythm._match(expected, taps, 100).tolist(),
+                rhythm._match_sequential(expected, taps, lo, hi).tolist()
+            )
+
+    def test_timing_statistics(self):
+        expected = [i * 500 for i in range(8)]
+        result = score_taps(expected, [onset + 10 + i * 5 for i, onset in enumerate(expected)] + [5000])
+        self.assertEqual(result['accuracy'], 100)
+        self.assertAlmostEqual(result['mean_offset_ms'], 27.5)
+        self.assertAlmostEqual(result['tempo_drift'], 10.0)
+        self.assertEqual(score_taps([0, 500], [])['offsets'], [None, None])
+
+    def test_beat_patterns_use_tempo(self):
+        onsets = expected_onsets_ms({'beats': [0, 1, 1.5], 'subdivision': 'mixed'}, tempo=120)
+        self.assertEqual(onsets.tolist(), [0, 500, 750])
+
+    def test_stored_timeline_covers_every_bar(self):
+        game = Game.objects.create(name='Rhythm Recognition')
+        # Triplets at 110 BPM in 3/4: the stored timeline keeps the exact thirds, over both bars
+        timeline = rhythm.onset_timeline_ms([0, 1 / 3, 2 / 3, 2, 3], tempo=110, beats_per_bar=3, bars=2)
+        challenge = RhythmChallenge.objects.create(
+            game=game, pattern_data={}, tempo=110, difficulty='beginner', audio_file='a.mp3',
+            correct_pattern={'beats': [0, 0.333, 0.667, 2]}, onsets_ms=rhythm.pack_onsets(timeline[::-1]),
+        )
+        onsets = rhythm.challenge_onsets_ms(RhythmChallenge.objects.get(pk=challenge.pk))
+        self.assertEqual(onsets.dtype, rhythm.ONSET_DTYPE)
+        np.testing.assert_allclose(onsets, [0, 60000 / 330, 120000 / 330, 60000 / 55,
+                                            1636.3636, 1636.3636 + 60000 / 330, 1636.3636 + 120000 / 330,
+                                            1636.3636 + 60000 / 55], atol=1e-3)
+        self.assertEqual(score_taps(onsets, onsets.tolist())['accuracy'], 100)
+
+    def test_check_taps_accepts_only_finite_numbers(self):
+        rhythm.check_taps([0, 499.5, -20], 4)
+        for taps in ([None], [float('inf')], [float('nan')], [True], ['1'], [[0]], [10 ** 400], (0, 500), None):
+            with self.assertRaises(ValueError, msg=repr(taps)):
+                rhythm.check_taps(taps, 4)
+
+    def test_check_taps_limits_the_count(self):
+        limit = rhythm.MAX_TAPS_PER_ONSET * 4 + rhythm.SPARE_TAPS
+        rhythm.check_taps([0] * limit, 4)
+        with self.assertRaises(ValueError):
+            rhythm.check_taps([0] * (limit + 1), 4)
+
+    def test_legacy_challenges_fall_back_to_the_pattern(self):
+        challenge = RhythmChallenge(tempo=120, correct_pattern={'beats': [0, 1, 1.5]})
+        self.assertEqual(rhythm.challenge_onsets_ms(challenge).tolist(), [0, 500, 750])
+
+
+class ClickTrackTests(TestCase):
+    def test_clicks_land_on_the_nearest_sample(self):
+        kernel = np.ones(10, dtype=np.float32) * 0.25
+        # A triplet at 110 BPM: 363.636 ms is sample 16036.4, not the 16023 int(ms) would give
+        track = render_clicks([0, 60000 / 110 * 2 / 3], [0, 0], [kernel], 1000)
+        self.assertEqual(np.flatnonzero(track).tolist(), list(range(10)) + list(range(16036, 16046)))
+
+    def test_overlaps_add_up_and_clip(self):
+        kernel = np.ones(10, dtype=np.float32) * 0.4
+        track = render_clicks([0, 0, 0.1, 0.1, 0.1], [0, 0, 0, 0, 0], [kernel], 1)
+        self.assertAlmostEqual(float(track[0]), 0.8, places=6)
+        self.assertEqual(float(track[5]), 1.0)
+        # Clicks past the end are cut off rather than lengthening the track
+        self.assertEqual(len(track), 44)
+
+    def test_click_track_uses_downbeat_click(self):
+        track = click_track([0, 1, 1.5], tempo=120, bars=2)
+        self.assertEqual(len(track), 4 * 44100)
+        self.assertEqual(track.dtype, np.float32)
+        downbeat, offbeat = click_kernel(1200, -8), click_kernel(600, -14)
+        np.testing.assert_allclose(track[:len(downbeat)], downbeat)
+        np.testing.assert_allclose(track[33075:33075 + len(offbeat)], offbeat)
+
+
+class RhythmChallengeUpsertTests(TestCase):
+    """The catalogue generator upserts challenges on (game, pattern_key)."""
+
+    def challenge(self, game, pattern_key, tempo):
+        return RhythmChallenge(game=game, pattern_key=pattern_key, pattern_data={}, tempo=tempo,
+                               difficulty='beginner', audio_file='a.mp3', correct_pattern={'beats': [0]})
+
+    def test_rerun_updates_in_place(self):
+        game = Game.objects.create(name='Rhythm Recognition')
+        # Hand-made challenges have no key and never conflict
+        RhythmChallenge.objects.bulk_create([self.challenge(game, None, 80), self.challenge(game, None, 80)])
+        for tempo in [90, 100]:
+            RhythmChallenge.objects.bulk_create(
+                [self.challenge(game, 'a', tempo), self.challenge(game, 'b', tempo)],
+                update_conflicts=True, unique_fields=['game', 'pattern_key'], update_fields=['tempo'],
+            )
+        self.assertEqual(RhythmChallenge.objects.count(), 4)
+        self.assertEqual(
+            sorted(RhythmChallenge.objects.filter(pattern_key__isnull=False).values_list('pattern_key', 'tempo')),
+            [('a', 100), ('b', 100)]
+        )
+
+
+class RenderCacheTests(TestCase):
+    def test_byte_lru_evicts_least_recently_used(self):
+        cache = ByteLRU(max_bytes=10)
+        cache.put('a', b'aaaa', 4)
+        cache.put('b', b'bbbb', 4)
+        cache.get('a')
+        cache.put('c', b'cccc', 4)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'aaaa')
+        cache.put('huge', b'x' * 11, 11)
+        self.assertIsNone(cache.get('huge'))
+
+    def test_disk_lru_stays_within_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskLRU(directory, max_bytes=10)
+            for key in 'abc':
+                cache.put(key, key.encode() * 4)
+            self.assertEqual(sorted(os.listdir(directory)), ['b', 'c'])
+            # A fresh index (another worker) picks up what is on disk
+            self.assertEqual(DiskLRU(directory, max_bytes=10).get('c'), b'cccc')
+
+
+class EQAnalysisTests(TestCase):
+    BANDS = [(20, 60, 40), (60, 250, 120), (500, 2000, 1000)]
+    GAINS = [-6, 12]
+
+    def source(self, seconds=1, sample_rate=44100):
+        t = np.arange(seconds * sample_rate) / sample_rate
+        return 0.3 * np.sin(2 * np.pi * 110 * t) + 0.2 * np.sin(2 * np.pi * 1000 * t)
+
+    def test_matches_rendered_audio(self):
+        audio_data = self.source()
+        _, delta_db = analyze_audio(audio_data, 44100, self.BANDS, self.GAINS)
+        frequencies, power, _, _ = spectra(audio_data, audio_data, 44100)
+        original = band_contrast_db(frequencies, power, self.BANDS)
+        for band_index, (_, _, center_freq) in enumerate(self.BANDS):
+            for gain_index, gain_db in enumerate(self.GAINS):
+                rendered = apply_eq(audio_data, 44100, center_freq, gain_db)
+                frequencies, power, _, _ = spectra(rendered, rendered, 44100)
+                measured = band_contrast_db(frequencies, power, self.BANDS)[band_index] - original[band_index]
+                self.assertAlmostEqual(float(delta_db[band_index, gain_index]), measured, places=3)
+
+    def test_changes_to_empty_bands_are_inaudible(self):
+        band_level_db, delta_db = analyze_audio(self.source(), 44100, self.BANDS, self.GAINS)
+        self.assertLess(band_level_db[0], -39)
+        self.assertIsNone(difficulty_for(delta_db[0, 1]))
+        self.assertEqual(difficulty_for(delta_db[2, 1]), 'beginner')
+
+    def test_features_are_cached_by_file_contents(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, copy = os.path.join(directory, 'a.wav'), os.path.join(directory, 'b.wav')
+            sf.write(first, self.source(), 44100)
+            cache_path = os.path.join(directory, 'features.npz')
+            store = FeatureStore(cache_path)
+            features, analyzed = analyze_library([first], self.BANDS, self.GAINS, store, workers=1)
+            self.assertEqual(analyzed, 1)
+            store.save()
+
+            shutil.copy(first, copy)
+            cached, analyzed = analyze_library([first, copy], self.BANDS, self.GAINS, FeatureStore(cache_path))
+            self.assertEqual(analyzed, 0)
+            np.testing.assert_allclose(cached[copy][1], features[first][1])
+
+
+class StreamingEQTests(TestCase):
+    def test_blocks_match_in_memory_eq(self):
+        audio_data = np.random.default_rng(0).standard_normal(10007) * 0.5
+        filtered = peak_filter_blocks(audio_data, np.empty_like(audio_data), 44100, 3500, block_frames=1000)
+        np.testing.assert_allclose(filtered, peak_filter(audio_data, 44100, 3500), rtol=0, atol=1e-12)
+        for gain_db in [-12, 3, 12]:
+            streamed = np.concatenate(list(mix_eq_blocks(audio_data, filtered, gain_db, block_frames=1000)))
+            np.testing.assert_allclose(streamed, mix_eq(audio_data, filtered, gain_db), rtol=0, atol=1e-12)
+        # Shorter than filtfilt's padding, like peak_filter()
+        with self.assertRaises(ValueError):
+            peak_filter_blocks(audio_data[:5], np.empty(5), 44100, 1000)
+
+    def test_memory_is_bounded_by_the_block_size(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source_path, filtered_path = os.path.join(directory, 'source.npy'), os.path.join(directory, 'f.npy')
+            np.save(source_path, np.random.default_rng(0).standard_normal(1 << 21) * 0.5)
+            audio_data = np.load(source_path, mmap_mode='r')
+            filtered = np.lib.format.open_memmap(filtered_path, mode='w+', dtype=np.float64, shape=audio_data.shape)
+            tracemalloc.start()
+            try:
+                peak_filter_blocks(audio_data, filtered, 44100, 120, block_frames=4096)
+                for _ in mix_eq_blocks(audio_data, filtered, 12, block_frames=4096):
+                    pass
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            del audio_data, filtered
+        # The signal is 16 MiB; the in-memory path allocates several copies of it
+        self.assertLess(peak, 1 << 20)
+
+
+class EQSampleManifestTests(TestCase):
+    """The incremental build in scripts/generate_eq_samples.py must never keep a stale render."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.source = os.path.join(self.root, 'sources', 'tone.wav')
+        os.makedirs(os.path.dirname(self.source))
+        self.write_source(440)
+        self.sources = [(self.source, os.path.join(self.root, 'out'))]
+        self.bands = {'mids': 1000, 'presence': 6500}
+        self.manifest_path = os.path.join(self.root, 'out', '.manifest.json')
+
+    def write_source(self, frequency):
+        # Ten periods, so a new source also has a new size whatever the mtime resolution
+        t = np.arange(44100 * 10 // frequency) / 44100
+        sf.write(self.source, 0.1 * np.sin(2 * np.pi * frequency * t), 44100)
+
+    def build(self, bands=None):
+        """Plan a build from the saved manifest and 'render' every stale output; returns (stale, pruned)."""
+        manifest = generate_eq_samples.BuildManifest(self.manifest_path)
+        keys, stale, pruned = generate_eq_samples.plan_build(manifest, self.sources, bands or self.bands, [-6, 6])
+        for output_path in stale:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            open(output_path, 'wb').close()
+            manifest.record(output_path, keys[output_path])
+        manifest.save()
+        return {os.path.basename(path) for path in stale}, pruned
+
+    def test_unchanged_outputs_are_skipped(self):
+        stale, _ = self.build()
+        self.assertEqual(len(stale), 1 + 2 * 2)
+        self.assertEqual(self.build(), (set(), 0))
+        # A deleted output is rendered again
+        os.remove(os.path.join(self.root, 'out', 'tone_mids_6db.wav'))
+        self.assertEqual(self.build(), ({'tone_mids_6db.wav'}, 0))
+
+    def test_changed_source_or_render_code_rerenders(self):
+        stale, _ = self.build()
+        self.write_source(880)
+        self.assertEqual(self.build(), (stale, 0))
+        with mock.patch.object(generate_eq_samples, 'RENDER_CODE_VERSION', 'next'):
+            self.assertEqual(self.build(), (stale, 0))
+            self.assertEqual(self.build(), (set(), 0))
+
+    def test_removed_outputs_are_pruned(self):
+        self.build()
+        self.assertEqual(self.build(bands={'mids': 1000}), (set(), 2))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'out', 'tone_presence_6db.wav')))
+        with open(self.manifest_path) as f:
+            outputs = json.load(f)['outputs']
+        self.assertEqual(sorted(outputs), ['tone.wav', 'tone_mids_-6db.wav', 'tone_mids_6db.wav'])
+
+
+class AudioVariantTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.root, 'audio', 'notes'))
+        t = np.arange(48000) / 48000
+        sf.write(os.path.join(self.root, 'audio', 'notes', 'A3.wav'), 0.05 * np.sin(2 * np.pi * 220 * t), 48000)
+
+    def test_loudness_gain_reaches_target(self):
+        t = np.arange(48000) / 48000
+        tone = 0.1 * np.sin(2 * np.pi * 997 * t)
+        gain = loudness_gain(tone, 48000, target_lufs=-20, peak_dbfs=0)
+        self.assertAlmostEqual(integrated_loudness(tone * gain, 48000), -20, places=1)
+        # The peak limit wins over the loudness target
+        self.assertLessEqual(loudness_gain(tone, 48000, target_lufs=0, peak_dbfs=-1) * 0.1, 10 ** (-1 / 20) + 1e-9)
+
+    def test_transcode_is_incremental(self):
+        log = []
+        self.assertEqual(transcode_library(self.root, ['audio/notes'], ['opus'], log=log.append), (1, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'audio', 'notes', 'A3.ogg')))
+        self.assertEqual(transcode_library(self.root, ['audio/notes'], ['opus'], log=log.append), (0, 1))
+        # Changing the target loudness re-encodes
+        self.assertEqual(transcode_library(self.root, ['audio/notes'], ['opus'], target_lufs=-20, log=log.append), (1, 0))
+
+    def test_variants_smallest_first_case_insensitive(self):
+        with override_settings(STATICFILES_DIRS=[self.root], STATIC_URL='/static/'):
+            index = VariantIndex()
+            # Without a manifest only the WAV is offered
+            self.assertEqual([v['url'] for v in index.variants('audio/notes/a3.wav')], ['/audio/notes/A3.wav'])
+            transcode_library(self.root, ['audio/notes'], ['opus'], log=lambda message: None)
+            variants = index.variants(note_audio_path('a'))
+        self.assertEqual([v['codec'] for v in variants], ['opus', 'wav'])
+        self.assertEqual(variants[0]['url'], '/audio/notes/A3.ogg')
+        self.assertLess(variants[0]['bytes'], variants[1]['bytes'])
+
+
+class AudioServingTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.root, 'audio', 'notes'))
+        self.data = bytes(range(256)) * 40
+        with open(os.path.join(self.root, 'audio', 'notes', 'A3.ogg'), 'wb') as f:
+            f.write(self.data)
+        settings = override_settings(STATICFILES_DIRS=[self.root])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.url = reverse('ear_tune:audio', args=['notes/A3.ogg'])
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-', 100), (0, 99))
+        self.assertEqual(parse_range('bytes=10-19', 100), (10, 19))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        for ignored in (None, 'bytes=5-1', 'bytes=0-1,5-6', 'items=0-1', 'bytes=-'):
+            self.assertIsNone(parse_range(ignored, 100))
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=100-', 100)
+
+    def test_full_and_ranged_responses(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'audio/ogg; codecs=opus')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertFalse(response['ETag'].startswith('W/'))
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        # A stale If-Range validator gets the whole file instead of the range
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+
+    def test_etag_comes_from_manifest(self):
+        path = os.path.join(self.root, 'audio', 'notes', 'B3.wav')
+        sf.write(path, np.zeros(4800), 48000)
+        transcode_library(self.root, ['audio/notes'], [], log=lambda message: None)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(variant_index.content_hash('audio/notes/B3.wav', os.path.getsize(path)), digest)
+        # A size that no longer matches the manifest falls back to hashing the file
+        self.assertIsNone(variant_index.content_hash('audio/notes/B3.wav', 1))
+        response = self.client.get(reverse('ear_tune:audio', args=['notes/B3.wav']))
+        self.assertEqual(response['ETag'], f'"{digest}"')
+
+    def test_rejects_paths_outside_the_library(self):
+        self.assertEqual(self.client.get('/audio/../variants.json').status_code, 404)
+        self.assertEqual(self.client.get(reverse('ear_tune:audio', args=['notes/missing.ogg'])).status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    EXPLAIN the hot GameSession/UserProfile queries on a seeded table and check
+    each one is served by its index. The default seed keeps the suite fast;
+    set EXPLAIN_SEED_ROWS=1000000 to run the harness at production scale.
+    """
+    SEED_ROWS = int(os.environ.get('EXPLAIN_SEED_ROWS', 20000))
+    USERS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(cls.USERS)])
+        UserProfile.objects.bulk_create([UserProfile(user=user, xp=rng.randint(0, 10000)) for user in users])
+        games = Game.objects.bulk_create([Game(name=f'Game {i}') for i in range(5)])
+        challenges = Challenge.objects.bulk_create([
+            Challenge(game=game, challenge_type='note', prompt='Identify this note.', correct_answer=note)
+            for game in games for note in 'abcdefg'
+        ])
+        batch = []
+        for i in range(cls.SEED_ROWS):
+            batch.append(GameSession(
+                user=users[i % cls.USERS],
+                challenge=rng.choice(challenges),
+                score=rng.choice([0, 1, 100]),
+                active=rng.random() < 0.05,
+                is_attempt=rng.random() < 0.6,
+            ))
+            if len(batch) >= 10000:
+                GameSession.objects.bulk_create(batch)
+                batch = []
+        GameSession.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = users[0]
+        cls.game = games[0]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"{index_name} not used:\n{plan}")
+
+    def test_history_uses_index(self):
+        queryset = GameSession.objects.filter(user=self.user, is_attempt=False).order_by('-date_played', '-id')[:20]
+        self.assertUsesIndex(queryset, 'gamesession_history_idx')
+
+    def test_active_session_uses_index(self):
+        queryset = GameSession.objects.filter(user=self.user, challenge__game=self.game, active=True)
+        self.assertUsesIndex(queryset, 'gamesession_active_idx')
+
+    def test_perfect_score_count_uses_index(self):
+        queryset = GameSession.objects.filter(user=self.user, score=100, is_attempt=False)
+        self.assertUsesIndex(queryset, 'gamesession_perfect_idx')
+
+    def test_leaderboard_uses_index(self):
+        queryset = UserProfile.objects.order_by('-xp')[:10]
+        self.assertUsesIndex(queryset, 'userprofile_xp_idx')
@@ -7,4 +7,5 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('game/<int:game_id>/', views.game_detail, name='game_detail'),
     path('history/', views.game_history, name='game_history'),
+    path('audio/<path:path>', views.serve_audio, name='audio'),
 ]
\ No newline at end of file
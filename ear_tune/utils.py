@@ -1,19 +1,55 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+from .answers import answer_matches
+
+
 def validate_answer(user_input, correct_value):
     """
     Validate the user's answer against the correct answer.
-    Supports multiple valid answers separated by underscores.
+    Accepts any spelling ear_tune.answers matches: underscore-separated
+    alternatives, enharmonic note names and case differences.
     """
-    user_input = user_input.strip().lower()
-    correct_value = correct_value.strip().lower()
-    
-    is_correct = False
-    if "_" in correct_value:
-        acceptable = [val.strip().lower() for val in correct_value.split("_")]
-        is_correct = user_input in acceptable
-    else:
-        is_correct = user_input == correct_value
-        
-    if is_correct:
+    if answer_matches(correct_value, user_input):
         return "Correct!", 1
     else:
-        return "Incorrect. Try again!", 0
\ No newline at end of file
+        return "Incorrect. Try again!", 0
+
+
+def encode_cursor(session):
+    """Opaque cursor pointing just past a session in (date_played, id) order."""
+    raw = f"{session.date_played.isoformat()}|{session.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (date_played, id) position encoded in a cursor, or raise ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date_played, session_id = raw.split('|')
+        return datetime.fromisoformat(date_played), int(session_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('Invalid cursor.') from e
+
+
+def keyset_page(queryset, cursor=None, page_size=20):
+    """
+    Return (sessions, next_cursor) for one page of sessions, newest first.
+    Pages are keyed on (date_played, id) rather than an OFFSET, so every
+    page is an index range scan no matter how deep the history goes.
+    """
+    if cursor:
+        date_played, session_id = decode_cursor(cursor)
+        # The redundant date_played__lte bound lets the planner seek the index instead of scanning it.
+        queryset = queryset.filter(
+            Q(date_played__lt=date_played) | Q(id__lt=session_id),
+            date_played__lte=date_played
+        )
+    sessions = list(queryset.order_by('-date_played', '-id')[:page_size + 1])
+    if len(sessions) > page_size:
+        sessions = sessions[:page_size]
+        return sessions, encode_cursor(sessions[-1])
+    return sessions, None
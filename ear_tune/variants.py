@@ -0,0 +1,239 @@
+"""
+Compressed variants of the static audio library.
+
+transcode_library() encodes every WAV under the given static directories
+to Opus (and AAC when ffmpeg is installed), loudness-normalized to a common
+target, and records the variants in static/audio/variants.json. Files are
+only re-encoded when their source or the encoding settings change.
+
+EQ renders ("drums_mids_-6db.wav") are normalized with the gain of their
+unprocessed source ("drums.wav") so the level difference the EQ introduces
+is kept.
+
+The API reads the manifest through variant_index.variants(), which lists the
+variants of a WAV smallest first so clients can pick the first codec they
+support. The files are served by ear_tune.views.serve_audio, which uses the
+recorded hashes as ETags.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import soundfile as sf
+from django.conf import settings
+from django.urls import reverse
+
+from .audio import CODECS, DEFAULT_BITRATES, encode, loudness_gain
+
+MANIFEST_PATH = 'audio/variants.json'
+DEFAULT_TARGET_LUFS = -16.0
+
+_RENDER_SUFFIX = re.compile(r'_-?\d+db$')
+
+
+def static_root():
+    """Source static directory holding the audio library."""
+    return str(settings.STATICFILES_DIRS[0])
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reference_source(path):
+    """The unprocessed source of an EQ render, or the file itself."""
+    stem, extension = os.path.splitext(path)
+    if not _RENDER_SUFFIX.search(stem):
+        return path
+    prefix = _RENDER_SUFFIX.sub('', stem)
+    while '_' in os.path.basename(prefix):
+        prefix = prefix.rsplit('_', 1)[0]
+        if os.path.isfile(prefix + extension):
+            return prefix + extension
+    return path
+
+
+def transcode_library(root, directories, codecs, target_lufs=DEFAULT_TARGET_LUFS, bitrates=None,
+                      force=False, log=print):
+    """
+    Encode every WAV under root/<directory> into the given codecs and update
+    the manifest. Returns (encoded, skipped) counts.
+    """
+    bitrates = {**DEFAULT_BITRATES, **(bitrates or {})}
+    manifest_path = os.path.join(root, MANIFEST_PATH)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    sources = []
+    for directory in directories:
+        for dirpath, _, filenames in os.walk(os.path.join(root, directory)):
+            sources.extend(
+                os.path.join(dirpath, name) for name in sorted(filenames)
+                # isfile() also skips dangling symlinks
+                if name.endswith('.wav') and os.path.isfile(os.path.join(dirpath, name))
+            )
+
+    encoded = skipped = 0
+    gains = {}  # reference path -> gain
+    hashes = {}
+    seen = set()
+    for path in sources:
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        seen.add(relative)
+        reference = _reference_source(path)
+        for source in {path, reference}:
+            if source not in hashes:
+                hashes[source] = _file_hash(source)
+        params = [hashes[path], hashes[reference], target_lufs, sorted((c, bitrates.get(c)) for c in codecs)]
+        key = hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+        entry = manifest.get(relative)
+        if not force and entry and entry['key'] == key and all(
+            'hash' in variant and os.path.exists(os.path.join(root, variant['path']))
+            for variant in entry['variants'].values()
+        ):
+            skipped += 1
+            continue
+
+        audio_data, sample_rate = sf.read(path)
+        if reference not in gains:
+            reference_data, reference_rate = (audio_data, sample_rate) if reference == path else sf.read(reference)
+            gains[reference] = loudness_gain(reference_data, reference_rate, target_lufs)
+        normalized = audio_data * gains[reference]
+
+        variants = {'wav': {'path': relative, 'bytes': os.path.getsize(path), 'hash': hashes[path]}}
+        for codec in codecs:
+            if codec == 'wav':
+                continue
+            variant_relative = os.path.splitext(relative)[0] + CODECS[codec]['extension']
+            data = encode(normalized, sample_rate, codec, bitrates.get(codec))
+            # Replace rather than rewrite: the serving workers may have the old file mapped
+            variant_path = os.path.join(root, variant_relative)
+            with open(f"{variant_path}.tmp", 'wb') as f:
+                f.write(data)
+            os.replace(f"{variant_path}.tmp", variant_path)
+            variants[codec] = {
+                'path': variant_relative, 'bytes': len(data), 'hash': hashlib.sha256(data).hexdigest()
+            }
+        manifest[relative] = {'key': key, 'gain': round(gains[reference], 6), 'variants': variants}
+        encoded += 1
+        log(f"Encoded {relative}: " + ', '.join(
+            f"{codec} {variant['bytes'] // 1024} KiB" for codec, variant in variants.items()
+        ))
+
+    # Drop entries (and their encoded files) whose WAV is gone
+    for relative in [relative for relative in manifest if relative not in seen]:
+        if not any(relative.startswith(directory.rstrip('/') + '/') for directory in directories):
+            continue
+        for codec, variant in manifest.pop(relative)['variants'].items():
+            variant_path = os.path.join(root, variant['path'])
+            if codec != 'wav' and os.path.exists(variant_path):
+                os.remove(variant_path)
+        log(f"Removed variants of {relative}")
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(f"{manifest_path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return encoded, skipped
+
+
+def _resolve_case(relative):
+    """Find a static file whose path differs from `relative` only in case."""
+    directory, name = os.path.split(relative)
+    try:
+        names = os.listdir(os.path.join(static_root(), directory))
+    except FileNotFoundError:
+        return relative
+    if name in names:
+        return relative
+    matches = [candidate for candidate in names if candidate.lower() == name.lower()]
+    return f"{directory}/{matches[0]}" if matches else relative
+
+
+class VariantIndex:
+    """Process-local view of the variants manifest, reloaded when the file changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._entries = {}
+        self._files = {}
+
+    def _load(self):
+        path = os.path.join(static_root(), MANIFEST_PATH)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            entries = {}
+            if mtime is not None:
+                with open(path) as f:
+                    entries = {relative.lower(): entry for relative, entry in json.load(f).items()}
+            # Every encoded file (and source WAV) by its own path
+            files = {
+                variant['path']: variant
+                for entry in entries.values() for variant in entry['variants'].values()
+            }
+            with self._lock:
+                self._entries, self._files, self._mtime = entries, files, mtime
+        return self._entries
+
+    def content_hash(self, relative, size):
+        """
+        SHA-256 the manifest recorded for a static file, or None if the file
+        is not in the manifest or its size no longer matches.
+        """
+        self._load()
+        variant = self._files.get(relative)
+        if variant is None or variant['bytes'] != size:
+            return None
+        return variant.get('hash')
+
+    def variants(self, relative):
+        """
+        Variants of a static WAV (path relative to the static root), smallest
+        first, as [{'codec', 'url', 'content_type', 'bytes', 'hash'}], where
+        hash is the SHA-256 the file is served with as its ETag. Without a
+        manifest entry only the WAV itself is listed, with no size or hash.
+        Matching is case-insensitive, so 'audio/notes/a3.wav' finds A3.wav.
+        """
+        entry = self._load().get(relative.lower())
+        if entry is None:
+            variants = {'wav': {'path': _resolve_case(relative), 'bytes': None}}
+        else:
+            variants = entry['variants']
+        ordered = sorted(variants.items(), key=lambda item: (item[0] == 'wav', item[1]['bytes'] or 0))
+        return [
+            {
+                'codec': codec,
+                'url': audio_url(variant['path']),
+                'content_type': CODECS[codec]['content_type'],
+                'bytes': variant['bytes'],
+                'hash': variant.get('hash'),
+            }
+            for codec, variant in ordered
+        ]
+
+
+variant_index = VariantIndex()
+
+
+def audio_url(relative):
+    """URL of a static audio file (path relative to the static root, under audio/)."""
+    return reverse('ear_tune:audio', args=[relative.removeprefix('audio/')])
+
+
+def note_audio_path(correct_answer):
+    """Static path of the recording for a note challenge's answer."""
+    return f"audio/notes/{correct_answer.lower()}3.wav"
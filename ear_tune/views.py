@@ -1,19 +1,32 @@
-import random
+import os
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect, get_object_or_404
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.shortcuts import render, redirect
+from django.utils._os import safe_join
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
+from .audio import CODECS
+from .catalogue import catalogue
 from .models import Game, Challenge, GameSession
 from .forms import AnswerForm
-from .utils import validate_answer
+from .sampling import sampler
+from .serving import serve_file
+from .utils import keyset_page, validate_answer
+from .variants import note_audio_path, static_root, variant_index
+
+HISTORY_PAGE_SIZE = 50
 
+CONTENT_TYPES = {codec['extension']: codec['content_type'] for codec in CODECS.values()}
 
 
 # Create your views here.
 @login_required
 def home(request):
     """ Render the homepage with a welcome message and a list of available games."""
-    games = Game.objects.all()
+    games = catalogue.games()
     welcome_message = "Welcome to EarTune! Please select a game to begin."
     return render(request, 'ear_tune/home.html', {
         'games': games,
@@ -26,7 +39,7 @@ def game_selection(request):
     """
     Render the game selection screen with a list of available games.
     """
-    games = Game.objects.all()
+    games = catalogue.games()
     return render(request, 'ear_tune/game_selection.html', {'games': games})
 
 
@@ -34,14 +47,16 @@ def game_selection(request):
 @csrf_exempt
 def game_detail(request, game_id):
     """Render a game detail page; retrieves the first challenge for the game."""
-    game = get_object_or_404(Game, id=game_id)
-    challenges = list(game.challenges.all())
-    challenge = random.choice(challenges) if challenges else None
+    try:
+        game = catalogue.game(id=game_id)
+    except Game.DoesNotExist:
+        raise Http404('No game matches the given query.')
+    challenge = sampler.choice(Challenge, game_id=game.id)
     result = None
-    audio_file = None
+    audio_variants = []
 
     if challenge and challenge.challenge_type == "note":
-        audio_file = f"{challenge.correct_answer.lower()}3.wav"
+        audio_variants = variant_index.variants(note_audio_path(challenge.correct_answer))
 
     active_session = GameSession.objects.filter(user=request.user, challenge__game=game, active=True).first()
     if not active_session:
@@ -51,14 +66,7 @@ def game_detail(request, game_id):
         form = AnswerForm(request.POST)
         if form.is_valid():
             answer = form.cleaned_data['answer']
-            user_input = answer.strip().lower()
-            correct_value = challenge.correct_answer.strip().lower()
-
-            # Debug output to check the normalized values.
-            print("DEBUG: User input =", repr(user_input))
-            print("DEBUG: Correct answer =", repr(correct_value))
-
-            result_message, score = validate_answer(user_input, correct_value)
+            result_message, score = validate_answer(answer, challenge.correct_answer)
             
             if score == 1:  # correct answer
                 active_session.score += 1
@@ -80,15 +88,41 @@ def game_detail(request, game_id):
         'challenge': challenge,
         'form': form,
         'result': result,
-        'audio_file': audio_file,
+        'audio_variants': audio_variants,
         'active_session': active_session,
     })
 
 
 @login_required
 def game_history(request):
-    """Render a page displaying a list of all game sessions."""
-    sessions = GameSession.objects.filter(user=request.user).order_by('-date_played')
-    return render(request, 'ear_tune/game_history.html', {'sessions': sessions})
+    """Render a page of the user's game sessions, newest first, with a link to the next page."""
+    sessions = GameSession.objects.filter(user=request.user, is_attempt=False).select_related('challenge')
+    try:
+        sessions, next_cursor = keyset_page(sessions, cursor=request.GET.get('cursor'), page_size=HISTORY_PAGE_SIZE)
+    except ValueError:
+        return redirect('ear_tune:game_history')
+    return render(request, 'ear_tune/game_history.html', {'sessions': sessions, 'next_cursor': next_cursor})
 
 
+
+
+@require_safe
+def serve_audio(request, path):
+    """
+    Serve a file from the static audio library with Range and conditional
+    request support. Public, like the rest of the static files, so <audio>
+    elements can load it without credentials.
+    """
+    try:
+        full_path = safe_join(static_root(), 'audio', path)
+    except SuspiciousFileOperation:
+        raise Http404
+    content_type = CONTENT_TYPES.get(os.path.splitext(full_path)[1].lower())
+    if content_type is None or not os.path.isfile(full_path):
+        raise Http404
+    size = os.path.getsize(full_path)
+    digest = variant_index.content_hash(f'audio/{path}', size)
+    try:
+        return serve_file(request, full_path, content_type, digest)
+    except FileNotFoundError:
+        raise Http404
@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 import Confetti from 'react-confetti';
 import axios from '../axiosConfig';
+import { audioUrl, useChallengeBundle } from '../utils/useChallengeBundle';
 import LevelUpModal from './LevelUpModal';
 import AchievementUnlockModal from './AchievementUnlockModal';
 
@@ -11,6 +12,7 @@ function FrequencyGame() {
   
   // State
   const [challenge, setChallenge] = useState(null);
+  const [bundleToken, setBundleToken] = useState(null);
   const [frequencyBands, setFrequencyBands] = useState([]);
   const [selectedBand, setSelectedBand] = useState(null);
   const [selectedChange, setSelectedChange] = useState(null);
@@ -45,9 +47,13 @@ function FrequencyGame() {
     return () => window.removeEventListener('resize', handleResize);
   }, []);
   
+  // Upcoming challenges are fetched in batches and their audio preloaded
+  const bundle = useChallengeBundle();
+
   // Load frequency bands on mount
   useEffect(() => {
     loadFrequencyBands();
+    bundle.reset({ kind: 'eq', difficulty });
     loadNewChallenge();
   }, [difficulty]);
   
@@ -67,10 +73,9 @@ function FrequencyGame() {
     setSelectedChange(null);
     
     try {
-      const response = await axios.get('/api/v1/eq-challenge/random/', {
-        params: { difficulty }
-      });
-      setChallenge(response.data);
+      const item = await bundle.next();
+      setChallenge(item ? item.challenge : null);
+      setBundleToken(item ? item.bundle : null);
       setLoading(false);
     } catch (error) {
       console.error('Error loading challenge:', error);
@@ -104,7 +109,8 @@ function FrequencyGame() {
       const response = await axios.post('/api/v1/eq-challenge/submit/', {
         challenge_id: challenge.id,
         frequency_band_id: selectedBand,
-        change_amount: selectedChange
+        change_amount: selectedChange,
+        bundle: bundleToken
       });
 
       const { correct, correct_answer, xp_earned, level_up, new_level, unlocked_achievements } = response.data;
@@ -287,16 +293,25 @@ function FrequencyGame() {
 
         {challenge && (
           <>
+            {/* Each version is offered in every codec, smallest first; the browser plays the first it supports */}
             <audio
               ref={originalAudioRef}
-              src={`/static/audio/eq_samples/${challenge.source_audio}`}
+              key={`original-${challenge.id}`}
               onEnded={() => setCurrentlyPlaying(null)}
-            />
+            >
+              {challenge.audio_variants.original.map(variant => (
+                <source key={variant.codec} src={audioUrl(variant.url)} type={variant.content_type} />
+              ))}
+            </audio>
             <audio
               ref={processedAudioRef}
-              src={`/static/audio/eq_samples/${challenge.source_audio}_${challenge.frequency_band.name.toLowerCase().replaceAll(' ', '_')}_${challenge.change_amount}db.wav`}
+              key={`processed-${challenge.id}`}
               onEnded={() => setCurrentlyPlaying(null)}
-            />
+            >
+              {challenge.audio_variants.processed.map(variant => (
+                <source key={variant.codec} src={audioUrl(variant.url)} type={variant.content_type} />
+              ))}
+            </audio>
           </>
         )}
       </motion.div>
@@ -3,6 +3,7 @@ import React, { useEffect, useState, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 import axios from '../axiosConfig';
+import { audioUrl, useChallengeBundle } from '../utils/useChallengeBundle';
 import LevelUpModal from './LevelUpModal';
 import AchievementUnlockModal from './AchievementUnlockModal';
 
@@ -13,7 +14,8 @@ function GameDetail() {
   // State variables
   const [game, setGame] = useState(null);
   const [challenge, setChallenge] = useState(null);
-  const [audioFile, setAudioFile] = useState('');
+  const [audioVariants, setAudioVariants] = useState([]);
+  const [bundleToken, setBundleToken] = useState(null);
   const [answer, setAnswer] = useState('');
   const [feedback, setFeedback] = useState('');
   const [feedbackType, setFeedbackType] = useState(''); // 'success', 'error', or ''
@@ -44,14 +46,18 @@ function GameDetail() {
       });
   }, [gameId]);
 
-  // Fetch a random challenge
+  // Upcoming challenges are fetched in batches and their audio preloaded
+  const bundle = useChallengeBundle();
+
+  // Fetch the next challenge of the session
   const fetchRandomChallenge = async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`/api/v1/challenges/random/?game_id=${gameId}`);
-      setChallenge(response.data);
-      const newAudio = response.data.correct_answer.toLowerCase() + "3.wav";
-      setAudioFile(newAudio);
+      const item = await bundle.next();
+      setChallenge(item ? item.challenge : null);
+      setBundleToken(item ? item.bundle : null);
+      // Encodings of the note, smallest first; the browser plays the first it supports
+      setAudioVariants(item ? item.challenge.audio_variants : []);
       setLoading(false);
     } catch (error) {
       console.error("Error fetching challenge:", error);
@@ -66,6 +72,8 @@ function GameDetail() {
         game_id: gameId
       });
       setSessionId(response.data.id);
+      // The session fixes the order of its challenges
+      bundle.reset({ kind: 'note', game_id: gameId, session_id: response.data.id });
       setScore(0);
       setAttemptsLeft(3);
       setGameOver(false);
@@ -103,7 +111,8 @@ function GameDetail() {
       const response = await axios.post('/api/v1/submit-answer/', {
         challenge_id: challenge.id,
         answer: answer.trim(),
-        session_id: sessionId
+        session_id: sessionId,
+        bundle: bundleToken
       });
 
       const { result, xp_earned, level_up, new_level, unlocked_achievements } = response.data;
@@ -287,10 +296,12 @@ function GameDetail() {
               </div>
 
               <div className="audio-section mb-6">
-                {audioFile && (
+                {audioVariants.length > 0 && (
                   <>
-                    <audio ref={audioRef} key={audioFile}>
-                      <source src={`/static/audio/notes/${audioFile}`} type="audio/wav" />
+                    <audio ref={audioRef} key={audioVariants[0].url}>
+                      {audioVariants.map(variant => (
+                        <source key={variant.codec} src={audioUrl(variant.url)} type={variant.content_type} />
+                      ))}
                       Your browser does not support the audio element.
                     </audio>
                     <div className="audio-controls flex justify-center">
@@ -2,25 +2,43 @@
 import React, { useEffect, useState } from 'react';
 import axios from '../axiosConfig';
 
+const HISTORY_URL = '/api/v1/game-sessions/';
+const HISTORY_FIELDS = 'id,date_played,game_name,score,active';
+
 function GameHistory() {
   const [sessions, setSessions] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
+  // Fetch one page of the user's game session history, only with the fields shown below
+  const fetchPage = (url) => axios.get(url, {
+    params: url === HISTORY_URL ? { fields: HISTORY_FIELDS } : undefined
+  }).then(response => {
+    setSessions(previous => [...previous, ...response.data.results]);
+    setNextPage(response.data.next);
+  });
+
   useEffect(() => {
-    // Fetch user's game session history
-    axios.get('/api/v1/game-sessions/')
-      .then(response => {
-        setSessions(response.data);
-        setLoading(false);
-      })
+    fetchPage(HISTORY_URL)
       .catch(error => {
         console.error('Error fetching game history:', error);
         setError('Failed to load game history. Please try again later.');
-        setLoading(false);
-      });
+      })
+      .finally(() => setLoading(false));
   }, []);
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchPage(nextPage)
+      .catch(error => {
+        console.error('Error fetching game history:', error);
+        setError('Failed to load game history. Please try again later.');
+      })
+      .finally(() => setLoadingMore(false));
+  };
+
   if (loading) return <div className="loading">Loading game history...</div>;
   if (error) return <div className="error-message">{error}</div>;
 
@@ -43,13 +61,18 @@ function GameHistory() {
               {sessions.map(session => (
                 <tr key={session.id}>
                   <td>{new Date(session.date_played).toLocaleString()}</td>
-                  <td>{session.challenge?.game?.name || 'Unknown Game'}</td>
+                  <td>{session.game_name || 'Unknown Game'}</td>
                   <td>{session.score}</td>
                   <td>{session.active ? 'In Progress' : 'Completed'}</td>
                 </tr>
               ))}
             </tbody>
           </table>
+          {nextPage && (
+            <button className="load-more" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       ) : (
         <div className="no-history">
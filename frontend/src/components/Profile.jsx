@@ -253,6 +253,56 @@ function Profile() {
           </motion.div>
         </motion.div>
 
+        {/* Per-Game Stats */}
+        {profile.game_stats?.length > 0 && (
+          <motion.div
+            variants={cardVariants}
+            className="info-card bg-white/80 backdrop-blur-lg rounded-2xl shadow-xl border border-slate-100 p-6 mt-6"
+          >
+            <h3 className="text-xl font-bold text-slate-800 mb-4">By Game</h3>
+            <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
+              {profile.game_stats.map(stats => (
+                <div key={stats.game} className="rounded-xl bg-slate-50 p-4">
+                  <p className="text-lg font-semibold text-slate-800">{stats.game_name}</p>
+                  <p className="text-sm text-slate-600 mt-1">
+                    {stats.correct} / {stats.plays} correct ({stats.accuracy.toFixed(1)}%)
+                  </p>
+                  <p className="text-sm text-slate-600">Best score: {stats.best_score}</p>
+                  {stats.perfect_scores > 0 && (
+                    <p className="text-sm text-slate-600">Perfect scores: {stats.perfect_scores}</p>
+                  )}
+                  {stats.average_accuracy > 0 && (
+                    <p className="text-sm text-slate-600">
+                      Average timing accuracy: {stats.average_accuracy.toFixed(1)}%
+                    </p>
+                  )}
+                </div>
+              ))}
+            </div>
+            {profile.band_stats?.length > 0 && (
+              <>
+                <h4 className="text-lg font-semibold text-slate-700 mt-6 mb-2">EQ Accuracy by Band</h4>
+                <div className="space-y-2">
+                  {profile.band_stats.map(band => (
+                    <div key={band.frequency_band} className="flex items-center gap-4">
+                      <span className="w-32 text-sm text-slate-600">{band.frequency_band_name}</span>
+                      <div className="flex-1 h-3 bg-slate-200 rounded-full overflow-hidden">
+                        <div
+                          className="h-full bg-gradient-to-r from-indigo-500 to-purple-500"
+                          style={{ width: `${band.accuracy}%` }}
+                        />
+                      </div>
+                      <span className="w-24 text-right text-sm text-slate-600">
+                        {band.accuracy.toFixed(0)}% ({band.plays})
+                      </span>
+                    </div>
+                  ))}
+                </div>
+              </>
+            )}
+          </motion.div>
+        )}
+
         {/* Additional Info */}
         <motion.div
           variants={cardVariants}
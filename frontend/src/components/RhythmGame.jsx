@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 import confetti from 'canvas-confetti';
 import axios from '../axiosConfig';
+import { useChallengeBundle } from '../utils/useChallengeBundle';
 import LevelUpModal from './LevelUpModal';
 import AchievementUnlockModal from './AchievementUnlockModal';
 
@@ -11,6 +12,7 @@ function RhythmGame() {
 
   // State
   const [challenge, setChallenge] = useState(null);
+  const [bundleToken, setBundleToken] = useState(null);
   const [loading, setLoading] = useState(true);
   const [isPlaying, setIsPlaying] = useState(false);
   const [tappedBeats, setTappedBeats] = useState([]);
@@ -33,8 +35,12 @@ function RhythmGame() {
   const startTimeRef = useRef(null);
   const metronomeIntervalRef = useRef(null);
 
+  // Upcoming challenges are fetched in batches
+  const bundle = useChallengeBundle();
+
   // Load new challenge on mount
   useEffect(() => {
+    bundle.reset({ kind: 'rhythm' });
     loadNewChallenge();
 
     // Cleanup on unmount
@@ -67,8 +73,9 @@ function RhythmGame() {
     setIsPlaying(false);
 
     try {
-      const response = await axios.get('/api/v1/rhythm-challenge/random/');
-      setChallenge(response.data);
+      const item = await bundle.next();
+      setChallenge(item ? item.challenge : null);
+      setBundleToken(item ? item.bundle : null);
       setLoading(false);
     } catch (error) {
       console.error('Error loading challenge:', error);
@@ -136,7 +143,8 @@ function RhythmGame() {
     try {
       const response = await axios.post('/api/v1/rhythm-challenge/submit/', {
         challenge_id: challenge.id,
-        user_taps: tappedBeats
+        user_taps: tappedBeats,
+        bundle: bundleToken
       });
 
       const { accuracy: scoreAccuracy, correct, xp_earned, level_up, new_level, unlocked_achievements } = response.data;
@@ -0,0 +1,92 @@
+// src/utils/useChallengeBundle.js - Prefetched queue of upcoming challenges
+import { useRef } from 'react';
+import axios, { API_URL } from '../axiosConfig';
+
+// Fetch the next batch once this few challenges are left
+const REFILL_AT = 2;
+
+// Audio URLs from the API are relative to the API host
+export const audioUrl = (url) => (url.startsWith('http') ? url : `${API_URL}${url}`);
+
+// The first variant this browser can play; variants are listed smallest first
+export const playableVariant = (variants) => {
+  const probe = document.createElement('audio');
+  return variants.find(variant => probe.canPlayType(variant.content_type)) || variants[variants.length - 1];
+};
+
+// Note challenges list their variants directly, EQ challenges per version
+const variantLists = (challenge) => {
+  const variants = challenge.audio_variants;
+  if (!variants) return [];
+  return (Array.isArray(variants) ? [variants] : Object.values(variants)).filter(list => list.length > 0);
+};
+
+export const useChallengeBundle = () => {
+  const params = useRef(null);
+  const queue = useRef([]);
+  const token = useRef(null);
+  const pending = useRef(null);
+  const generation = useRef(0);
+  const preloaded = useRef(new Map());
+
+  // Start loading the audio of an upcoming challenge while the current round plays
+  const preload = (challenge) => {
+    variantLists(challenge).forEach(list => {
+      const url = audioUrl(playableVariant(list).url);
+      if (!preloaded.current.has(url)) {
+        const audio = new Audio();
+        audio.preload = 'auto';
+        audio.src = url;
+        preloaded.current.set(url, audio);
+      }
+    });
+  };
+
+  const refill = () => {
+    if (!pending.current) {
+      const started = generation.current;
+      const query = token.current ? { after: token.current } : params.current;
+      pending.current = axios.get('/api/v1/challenges/bundle/', { params: query })
+        .then(({ data }) => {
+          // Ignore a batch for a sequence that was reset while it was loading
+          if (started !== generation.current) return;
+          token.current = data.bundle;
+          data.challenges.forEach(challenge => {
+            queue.current.push({ challenge, bundle: data.bundle });
+            preload(challenge);
+          });
+        })
+        .finally(() => {
+          if (started === generation.current) pending.current = null;
+        });
+    }
+    return pending.current;
+  };
+
+  // Start a new sequence, e.g. { kind: 'eq', difficulty } or { kind: 'note', game_id, session_id }
+  const reset = (newParams) => {
+    generation.current += 1;
+    params.current = newParams;
+    queue.current = [];
+    token.current = null;
+    pending.current = null;
+  };
+
+  // Resolves to { challenge, bundle } for the next round (send bundle with the answer), or null
+  const next = async () => {
+    if (queue.current.length === 0) {
+      await refill();
+    }
+    const item = queue.current.shift() || null;
+    if (item) {
+      // The round's own <audio> element takes over from the preloader
+      variantLists(item.challenge).forEach(list => preloaded.current.delete(audioUrl(playableVariant(list).url)));
+    }
+    if (queue.current.length < REFILL_AT) {
+      refill().catch(error => console.error('Error prefetching challenges:', error));
+    }
+    return item;
+  };
+
+  return { next, reset };
+};
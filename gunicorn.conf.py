@@ -0,0 +1,32 @@
+"""
+Gunicorn settings, read from the project root (see the Procfile).
+
+SERVER_MODE=wsgi (the default) serves ll_project.wsgi with sync workers,
+or threaded workers when GUNICORN_THREADS > 1. Every in-flight request
+holds a worker thread, so concurrency is WEB_CONCURRENCY * GUNICORN_THREADS.
+
+SERVER_MODE=asgi serves ll_project.asgi with uvicorn workers. The hot API
+endpoints (api.async_views) wait on the event loop rather than in a
+thread, so a few workers hold many slow clients; the database is only
+touched from short-lived thread hops. The settings turn persistent database
+connections off in this mode, as Django recommends for ASGI, so put
+PgBouncer or another pooler in front of PostgreSQL.
+"""
+
+import os
+
+mode = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+errorlog = '-'
+
+if mode == 'asgi':
+    wsgi_app = 'll_project.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+elif mode == 'wsgi':
+    wsgi_app = 'll_project.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+    worker_class = 'gthread' if threads > 1 else 'sync'
+else:
+    raise ValueError(f"SERVER_MODE must be 'wsgi' or 'asgi', not {mode!r}")
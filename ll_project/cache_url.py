@@ -0,0 +1,56 @@
+"""
+CACHE_URL parsing, the cache counterpart of dj_database_url.
+
+    locmem://[name]              per-process memory (the default)
+    file:///absolute/path        shared by the workers of one host
+    redis://[:password@]host:port/db, rediss://...
+                                 shared by every worker; needs the redis package
+    dummy://                     no caching
+
+Query parameters `timeout` and `key_prefix` set TIMEOUT and KEY_PREFIX;
+any other parameter is passed on in OPTIONS (e.g. max_entries=10000).
+"""
+
+from urllib.parse import parse_qsl, urlsplit
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def _number(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse(url):
+    """Return a CACHES entry for a cache URL; raises ValueError for an unknown scheme."""
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ValueError(f'Unsupported cache URL scheme {parts.scheme!r}; expected one of: {", ".join(BACKENDS)}')
+
+    entry = {'BACKEND': BACKENDS[parts.scheme]}
+    if parts.scheme == 'locmem':
+        entry['LOCATION'] = parts.netloc
+    elif parts.scheme == 'file':
+        entry['LOCATION'] = parts.path
+    elif parts.scheme in ('redis', 'rediss'):
+        entry['LOCATION'] = parts._replace(query='').geturl()
+
+    options = {}
+    for name, value in parse_qsl(parts.query):
+        if name == 'timeout':
+            entry['TIMEOUT'] = None if value == 'none' else _number(value)
+        elif name == 'key_prefix':
+            entry['KEY_PREFIX'] = value
+        else:
+            options[name] = _number(value)
+    if options:
+        entry['OPTIONS'] = options
+    return entry
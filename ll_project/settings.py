@@ -14,6 +14,8 @@ from pathlib import Path
 from decouple import config, Csv
 import dj_database_url
 
+from . import cache_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -87,15 +89,29 @@ WSGI_APPLICATION = 'll_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# 'wsgi' or 'asgi'; see gunicorn.conf.py
+SERVER_MODE = config('SERVER_MODE', default='wsgi')
+
 DATABASES = {
     'default': dj_database_url.config(
         default=config('DATABASE_URL', default=f'sqlite:///{BASE_DIR / "db.sqlite3"}'),
-        conn_max_age=600,
+        # Persistent connections are per thread and leak under ASGI; pool outside Django there
+        conn_max_age=0 if SERVER_MODE == 'asgi' else 600,
         conn_health_checks=True,
     )
 }
 
 
+# Cache
+# Process-local by default; point CACHE_URL at Redis (redis://host:6379/0) or a
+# shared directory (file:///var/tmp/eartune-cache) so that invalidations reach
+# every worker. See ll_project/cache_url.py for the accepted URLs.
+
+CACHES = {
+    'default': cache_url.parse(config('CACHE_URL', default='locmem://')),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -118,7 +134,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # 'rest_framework.authentication.SessionAuthentication',
         # 'rest_framework.authentication.TokenAuthentication',  # Enable if you add token auth
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.AsyncJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
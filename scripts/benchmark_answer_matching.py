@@ -0,0 +1,67 @@
+"""
+Microbenchmark note answer validation.
+
+Runs 1M validations (by default) of a mix of right and wrong answers, in
+several spellings, against the note challenge answers. Compares the
+previous per-call parsing (split correct_answer on "_" and normalize both
+strings every time) with the compiled matchers of ear_tune.answers.
+
+Usage:
+    python scripts/benchmark_answer_matching.py
+    python scripts/benchmark_answer_matching.py --validations 5000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+from ear_tune.answers import answer_matches
+
+NOTES = ['c', 'csharp', 'd', 'dsharp', 'e', 'f', 'fsharp', 'g', 'gsharp', 'a', 'asharp', 'b']
+SUBMISSIONS = NOTES + ['C', ' d ', 'Asharp', 'c#', 'Eb', 'b flat', 'x']
+
+
+def legacy_matches(correct_answer, answer):
+    """The validation SubmitAnswer and validate_answer used to do inline."""
+    user_input = answer.strip().lower()
+    correct_value = correct_answer.strip().lower()
+    if "_" in correct_value:
+        acceptable = [val.strip().lower() for val in correct_value.split("_")]
+        return user_input in acceptable
+    return user_input == correct_value
+
+
+def run(func, pairs):
+    start = time.perf_counter()
+    correct = sum(func(correct_answer, answer) for correct_answer, answer in pairs)
+    return time.perf_counter() - start, correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--validations', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Every other challenge accepts an alternative spelling, as multi-answer challenges do
+    answers = [note if i % 2 else f'{note}_{note}3' for i, note in enumerate(NOTES)]
+    pairs = [(rng.choice(answers), rng.choice(SUBMISSIONS)) for _ in range(args.validations)]
+
+    legacy_seconds, legacy_correct = run(legacy_matches, pairs)
+    compiled_seconds, compiled_correct = run(answer_matches, pairs)
+    for name, seconds, correct in [('legacy', legacy_seconds, legacy_correct),
+                                   ('compiled', compiled_seconds, compiled_correct)]:
+        print(f"{name:>8}: {seconds:.2f} s, {seconds / args.validations * 1e9:.0f} ns/validation, "
+              f"{correct} accepted")
+    print(f"speedup: {legacy_seconds / compiled_seconds:.2f}x "
+          f"(compiled also accepts enharmonic and spaced spellings the legacy check rejects)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Load test for audio delivery: the WhiteNoise static path the game pages use
+today against the Range/ETag audio view (ear_tune.views.serve_audio).
+
+Both are served over HTTP from a threaded WSGI server. Each simulated player
+loads every note once the way <audio> does (GET with "Range: bytes=0-") and
+then replays it `--replays` times with the validators from the first
+response, as a browser does when the cached copy needs revalidating.
+Reports latency per request and the bytes on the wire (headers and body).
+
+Rows:
+    whitenoise wav   /static/audio/notes/*.wav (the current path)
+    view wav         /audio/notes/*.wav (same bytes, new view)
+    view opus        /audio/notes/*.ogg (what clients now pick)
+
+Run `python manage.py transcode_audio` first so the Opus variants exist.
+
+Usage:
+    python scripts/benchmark_audio_serving.py
+    python scripts/benchmark_audio_serving.py --clients 16 --replays 5
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from whitenoise import WhiteNoise
+
+from bench_utils import print_table
+from ear_tune.variants import static_root
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(app):
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fetch(port, path, headers):
+    """GET path; returns (status, response headers, bytes on the wire, seconds)."""
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('GET', path, headers={'Host': '127.0.0.1', **headers})
+    response = connection.getresponse()
+    body = response.read()
+    elapsed = time.perf_counter() - start
+    header_bytes = sum(len(name) + len(value) + 4 for name, value in response.getheaders())
+    connection.close()
+    return response.status, dict(response.getheaders()), header_bytes + len(body), elapsed
+
+
+def play_session(port, paths, replays):
+    samples, transferred = [], 0
+    for path in paths:
+        status, headers, size, elapsed = fetch(port, path, {'Range': 'bytes=0-'})
+        assert status in (200, 206), (path, status)
+        samples.append(elapsed)
+        transferred += size
+        validators = {}
+        if 'ETag' in headers:
+            validators['If-None-Match'] = headers['ETag']
+        if 'Last-Modified' in headers:
+            validators['If-Modified-Since'] = headers['Last-Modified']
+        for _ in range(replays):
+            status, _, size, elapsed = fetch(port, path, validators)
+            assert status in (200, 304), (path, status)
+            samples.append(elapsed)
+            transferred += size
+    return samples, transferred
+
+
+def run(port, paths, clients, replays):
+    with ThreadPoolExecutor(clients) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: play_session(port, paths, replays), range(clients)))
+        wall = time.perf_counter() - start
+    samples = sorted(sample * 1000 for result in results for sample in result[0])
+    transferred = sum(result[1] for result in results)
+    return {
+        'requests': len(samples),
+        'p50': samples[len(samples) // 2],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'rps': len(samples) / wall,
+        'bytes': transferred,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent players')
+    parser.add_argument('--replays', type=int, default=3, help='Revalidated replays per note')
+    args = parser.parse_args()
+
+    notes_dir = os.path.join(static_root(), 'audio', 'notes')
+    wavs = sorted(name for name in os.listdir(notes_dir) if name.endswith('.wav'))
+    oggs = [name[:-4] + '.ogg' for name in wavs if os.path.exists(os.path.join(notes_dir, name[:-4] + '.ogg'))]
+
+    whitenoise = start_server(WhiteNoise(get_wsgi_application(), root=notes_dir, prefix='/static/audio/notes/'))
+    view = start_server(get_wsgi_application())
+    scenarios = [
+        ('whitenoise wav', whitenoise, [f'/static/audio/notes/{name}' for name in wavs]),
+        ('view wav', view, [f'/audio/notes/{name}' for name in wavs]),
+    ]
+    if oggs:
+        scenarios.append(('view opus', view, [f'/audio/notes/{name}' for name in oggs]))
+    else:
+        print("No Opus variants found; run `python manage.py transcode_audio` to include them.")
+
+    rows = []
+    baseline = None
+    for name, server, paths in scenarios:
+        port = server.server_address[1]
+        run(port, paths[:1], 1, 1)  # warm up mappings and imports
+        stats = run(port, paths, args.clients, args.replays)
+        baseline = baseline or stats['bytes']
+        rows.append([name, stats['requests'], f"{stats['p50']:.2f}", f"{stats['p99']:.2f}",
+                     f"{stats['rps']:.0f}", f"{stats['bytes'] / 1024:.0f}", f"{baseline / stats['bytes']:.1f}x"])
+    for _, server, _ in scenarios[:2]:
+        server.shutdown()
+
+    print(f"{args.clients} clients x {len(wavs)} notes, 1 load + {args.replays} revalidations each")
+    print_table(['path', 'requests', 'p50 ms', 'p99 ms', 'req/s', 'KiB sent', 'less data'], rows)
+
+
+if __name__ == '__main__':
+    main()
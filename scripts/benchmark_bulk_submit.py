@@ -0,0 +1,110 @@
+"""
+Benchmark bulk answer submission against one request per answer.
+
+Submits the same mixed batch of note, EQ and rhythm answers either as N
+JWT-authenticated POSTs to the per-game endpoints or as one POST to
+/api/v1/submit-answers/, and reports the time and queries per batch.
+Runs against a throwaway test database.
+
+Usage:
+    python scripts/benchmark_bulk_submit.py
+    python scripts/benchmark_bulk_submit.py --batch 60 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bench_utils import measure, print_table, test_database
+from ear_tune.models import Challenge, EQChallenge, FrequencyBand, Game, GameSession, RhythmChallenge
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch', type=int, default=30, help='Answers per batch')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with test_database():
+        user = User.objects.create(username='bench')
+        client = APIClient(HTTP_HOST='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        challenge = Challenge.objects.create(game=Game.objects.create(name='Notes'), challenge_type='note',
+                                             prompt='Identify this note.', correct_answer='c')
+        band = FrequencyBand.objects.create(name='Mids', min_frequency=500, max_frequency=2000, center_frequency=1000)
+        eq_challenge = EQChallenge.objects.create(game=Game.objects.create(name='Frequency Recognition'),
+                                                  source_audio='pink_noise', frequency_band=band,
+                                                  change_amount=6, difficulty='beginner')
+        rhythm_challenge = RhythmChallenge.objects.create(
+            game=Game.objects.create(name='Rhythm Recognition'), pattern_data={}, difficulty='beginner',
+            audio_file='static/audio/rhythm/bench.mp3', correct_pattern=list(range(0, 8000, 500))
+        )
+
+        def batch():
+            session = GameSession.objects.create(user=user, challenge=challenge)
+            answers = []
+            for i in range(args.batch):
+                kind = ('note', 'eq', 'rhythm')[i % 3]
+                if kind == 'note':
+                    answers.append(('submit-answer', {'type': 'note', 'challenge_id': challenge.id,
+                                                      'session_id': session.id, 'answer': 'c'}))
+                elif kind == 'eq':
+                    answers.append(('submit-eq-answer', {'type': 'eq', 'challenge_id': eq_challenge.id,
+                                                         'frequency_band_id': band.id, 'change_amount': 6}))
+                else:
+                    answers.append(('submit-rhythm-answer', {'type': 'rhythm', 'challenge_id': rhythm_challenge.id,
+                                                             'user_taps': list(range(10, 8000, 500))}))
+            return answers
+
+        def single():
+            for name, answer in batch():
+                response = client.post(reverse(name), answer, format='json')
+                assert response.status_code == 200, response.data
+
+        def bulk():
+            response = client.post(reverse('submit-answers-bulk'),
+                                   {'answers': [answer for _, answer in batch()]}, format='json')
+            assert response.status_code == 200, response.data
+
+        def count_queries(func):
+            # The test client closes the connection after each request, which
+            # clears connection.queries, so count with an execute wrapper instead
+            queries = []
+
+            def counter(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(counter):
+                func()
+            return len(queries)
+
+        rows = []
+        for name, func in [('one request per answer', single), ('bulk', bulk)]:
+            queries = count_queries(func)
+            stats = measure(func, repeat=args.repeat, warmup=1)
+            rows.append([name, f"{stats['p50']:.1f}", f"{stats['p99']:.1f}", queries])
+
+    print(f"{args.batch} answers per batch (note, EQ and rhythm in turn)")
+    print_table(['path', 'p50 ms', 'p99 ms', 'queries'], rows)
+
+
+if __name__ == '__main__':
+    main()
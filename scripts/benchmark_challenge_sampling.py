@@ -0,0 +1,101 @@
+"""
+Benchmark random challenge selection against catalogue size.
+
+Compares the old approach (load the filtered queryset into a list and call
+random.choice) with the sampling index in ear_tune.sampling, from 100 up to
+1M challenges. Runs against a throwaway test database.
+
+Usage:
+    python scripts/benchmark_challenge_sampling.py
+    python scripts/benchmark_challenge_sampling.py --sizes 100 10000 --legacy-max 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+from bench_utils import measure, print_table, test_database
+from ear_tune.models import Challenge, Game
+from ear_tune.sampling import sampler
+
+
+def seed_challenges(game, target):
+    """Top up the challenge table to `target` rows for the game."""
+    existing = Challenge.objects.filter(game=game).count()
+    batch = []
+    for i in range(existing, target):
+        batch.append(Challenge(
+            game=game,
+            challenge_type='note',
+            prompt='Identify this note.',
+            correct_answer=random.choice('abcdefg'),
+        ))
+        if len(batch) >= 10000:
+            Challenge.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Challenge.objects.bulk_create(batch)
+
+
+def legacy_pick(game_id):
+    challenges = list(Challenge.objects.filter(challenge_type='note', game__id=game_id))
+    return random.choice(challenges)
+
+
+def indexed_pick(game_id):
+    return sampler.choice(Challenge, challenge_type='note', game_id=game_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--legacy-max', type=int, default=100000,
+                        help='skip the legacy list() approach above this size')
+    args = parser.parse_args()
+
+    rows = []
+    with test_database():
+        game = Game.objects.create(name='Notes', description='Benchmark game')
+        for size in sorted(args.sizes):
+            print(f"Seeding {size} challenges...")
+            seed_challenges(game, size)
+
+            sampler.invalidate()
+            start = time.perf_counter()
+            sampler.ids(Challenge, challenge_type='note', game_id=game.id)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            indexed = measure(lambda: indexed_pick(game.id), repeat=args.repeat)
+            if size <= args.legacy_max:
+                legacy = measure(lambda: legacy_pick(game.id), repeat=max(5, args.repeat // 20), warmup=1)
+                legacy_p50 = f"{legacy['p50']:.3f}"
+            else:
+                legacy_p50 = 'skipped'
+
+            rows.append([
+                size,
+                legacy_p50,
+                f"{indexed['p50']:.3f}",
+                f"{indexed['p99']:.3f}",
+                f"{build_ms:.1f}",
+            ])
+
+    print()
+    print_table(['challenges', 'list() p50 ms', 'index p50 ms', 'index p99 ms', 'index build ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark click-track rendering against pattern length and density.
+
+Compares ear_tune.clicktrack with the overlay loop
+scripts/generate_rhythm_challenges.py used before: one
+AudioSegment.overlay() per click, each of which copies the whole track,
+at a position truncated to whole milliseconds. When pydub is installed
+the loop runs on pydub itself; otherwise a NumPy replica of overlay()
+(copy the 16-bit track, saturating add at int(ms)) stands in for it.
+Also reports the worst click placement error of both against the exact
+onset, for the triplet pattern. Needs no database.
+
+Usage:
+    python scripts/benchmark_click_track.py
+    python scripts/benchmark_click_track.py --legacy-max-clicks 512 --repeat 3
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+from bench_utils import measure, print_table
+from ear_tune.clicktrack import SAMPLE_RATE, click_kernel, click_track, pattern_onsets
+
+try:
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+except ImportError:
+    AudioSegment = None
+
+# (name, pattern, tempo, bars)
+CASES = [
+    ('4 bars quarters', [0, 1, 2, 3], 80, 4),
+    ('4 bars triplets', [0, 0.667, 1.333, 2, 2.667, 3.333], 110, 4),
+    ('16 bars 16ths', [i * 0.25 for i in range(16)], 90, 16),
+    ('64 bars 32nds', [i * 0.125 for i in range(32)], 120, 64),
+]
+
+
+def pydub_overlay_loop(pattern, tempo, bars):
+    """generate_syncopated_pattern() as it was, on pydub."""
+    def click(frequency, volume_db):
+        return Sine(frequency).to_audio_segment(duration=50).fade_in(5).fade_out(5) + volume_db
+
+    ms_per_beat = 60000 / tempo
+    audio = AudioSegment.silent(duration=int(ms_per_beat * 4 * bars))
+    clicks = [click(1200, -8), click(800, -12), click(600, -14)]
+    for bar in range(bars):
+        for beat in pattern:
+            kind = 0 if beat == 0 else 1 if beat == int(beat) else 2
+            audio = audio.overlay(clicks[kind], position=int(bar * 4 * ms_per_beat + beat * ms_per_beat))
+    return audio
+
+
+def replica_overlay_loop(pattern, tempo, bars):
+    """The same loop with overlay() replicated in NumPy: copy the track, saturating add at int(ms)."""
+    ms_per_beat = 60000 / tempo
+    audio = np.zeros(int(ms_per_beat * 4 * bars) * SAMPLE_RATE // 1000, dtype=np.int16)
+    clicks = [(click_kernel(f, v) * 32767).astype(np.int32) for f, v in [(1200, -8), (800, -12), (600, -14)]]
+    for bar in range(bars):
+        for beat in pattern:
+            kind = 0 if beat == 0 else 1 if beat == int(beat) else 2
+            start = int(bar * 4 * ms_per_beat + beat * ms_per_beat) * SAMPLE_RATE // 1000
+            audio = audio.copy()
+            end = min(start + len(clicks[kind]), len(audio))
+            mixed = audio[start:end].astype(np.int32) + clicks[kind][:end - start]
+            audio[start:end] = np.clip(mixed, -32768, 32767)
+    return audio
+
+
+def placement_error_ms(pattern, tempo, bars):
+    """Worst |placed - exact| onset error of the old int(ms) placement and of rounding to samples."""
+    exact, _ = pattern_onsets(pattern, tempo, 4, bars)
+    legacy = np.floor(exact)
+    sampled = np.rint(exact * SAMPLE_RATE / 1000) * 1000 / SAMPLE_RATE
+    return np.abs(legacy - exact).max(), np.abs(sampled - exact).max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--legacy-max-clicks', type=int, default=4096,
+                        help='Skip the overlay loop for patterns with more clicks than this')
+    args = parser.parse_args()
+
+    legacy_loop = pydub_overlay_loop if AudioSegment is not None else replica_overlay_loop
+    print(f"legacy loop: {'pydub' if AudioSegment is not None else 'NumPy replica of pydub overlay()'}")
+
+    rows = []
+    for name, pattern, tempo, bars in CASES:
+        clicks = len(pattern) * bars
+        new = measure(lambda: click_track(pattern, tempo, bars=bars), repeat=args.repeat, warmup=1)
+        if clicks <= args.legacy_max_clicks:
+            old = measure(lambda: legacy_loop(pattern, tempo, bars), repeat=args.repeat, warmup=1)
+            old_ms, speedup = f"{old['p50']:.1f}", f"{old['p50'] / new['p50']:.0f}x"
+        else:
+            old_ms = speedup = '-'
+        rows.append([name, clicks, f'{bars * 4 * 60 / tempo:.0f}', old_ms, f"{new['p50']:.2f}", speedup])
+    print_table(['pattern', 'clicks', 'track s', 'overlay loop ms', 'clicktrack ms', 'speedup'], rows)
+
+    legacy_error, sampled_error = placement_error_ms(*CASES[1][1:])
+    print(f"\ntriplet placement error: int(ms) {legacy_error:.3f} ms, "
+          f"sample-rounded {sampled_error:.4f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark EQ sample rendering throughput against worker count.
+
+Synthesizes a library of noise stems in a temporary directory and renders
+every (stem, band, gain) combination with generate_eq_samples.render_all,
+once per worker count, after a serial in-process baseline (the old
+process_audio_file loop). Reports renders/second and speedup over it.
+
+Usage:
+    python scripts/benchmark_eq_render.py
+    python scripts/benchmark_eq_render.py --stems 200 --seconds 30 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+# Add the scripts directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import print_table
+from generate_eq_samples import apply_eq, frequency_bands, gain_amounts, render_all
+
+
+def make_library(directory, stems, seconds, sample_rate=44100):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(stems):
+        path = os.path.join(directory, f'stem{i}.wav')
+        sf.write(path, rng.normal(0, 0.1, (seconds * sample_rate, 2)), sample_rate)
+        paths.append(path)
+    return paths
+
+
+def render_serial(sources):
+    """One render after another in this process, as process_audio_file used to."""
+    start = time.perf_counter()
+    renders = 0
+    for input_path, output_dir in sources:
+        audio_data, sample_rate = sf.read(input_path)
+        audio_data = np.mean(audio_data, axis=1)
+        for band_name, center_freq in frequency_bands.items():
+            for gain_db in gain_amounts:
+                processed = apply_eq(audio_data, sample_rate, center_freq, gain_db)
+                sf.write(os.path.join(output_dir, f'{renders}.wav'), processed, sample_rate)
+                renders += 1
+    return renders, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stems', type=int, default=24)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Worker counts to try (default: powers of two up to the CPU count)')
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Synthesizing {args.stems} stems of {args.seconds}s...")
+        library = make_library(directory, args.stems, args.seconds)
+
+        rows = []
+        output_dir = os.path.join(directory, 'serial')
+        os.makedirs(output_dir)
+        renders, seconds = render_serial([(path, output_dir) for path in library])
+        baseline = renders / seconds
+        rows.append(['serial', renders, f"{seconds:.1f}", f"{baseline:.1f}", '1.00'])
+
+        for workers in worker_counts:
+            output_dir = os.path.join(directory, f'workers{workers}')
+            renders, seconds = render_all(
+                [(path, output_dir) for path in library], frequency_bands, gain_amounts,
+                workers=workers, verbose=False
+            )
+            rate = renders / seconds
+            rows.append([f'{workers} workers', renders, f"{seconds:.1f}", f"{rate:.1f}", f"{rate / baseline:.2f}"])
+
+    print(f"\n{cpus} CPUs")
+    print_table(['run', 'renders', 'seconds', 'renders/s', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
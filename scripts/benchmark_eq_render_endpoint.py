@@ -0,0 +1,83 @@
+"""
+Benchmark the on-demand EQ render endpoint.
+
+Measures GET /api/v1/eq-challenge/<id>/audio/ for a synthesized stem:
+cold (nothing cached, full render), warm from the disk cache (new worker,
+empty memory cache) and warm from the memory cache, for WAV and Opus.
+Runs against a throwaway test database and temporary directories.
+
+Usage:
+    python scripts/benchmark_eq_render_endpoint.py
+    python scripts/benchmark_eq_render_endpoint.py --seconds 30 --repeat 50
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+import numpy as np
+import soundfile as sf
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from bench_utils import measure, print_table, test_database
+from ear_tune.models import EQChallenge, FrequencyBand, Game
+from ear_tune.render_cache import renderer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=int, default=5, help='Length of the source stem')
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as cache_dir, \
+            override_settings(EQ_SOURCE_DIRS=[source_dir], EQ_RENDER_CACHE_DIR=cache_dir), test_database():
+        rng = np.random.default_rng(0)
+        sf.write(os.path.join(source_dir, 'stem.wav'), rng.normal(0, 0.1, (args.seconds * 44100, 2)), 44100)
+        game = Game.objects.create(name='Frequency Recognition')
+        band = FrequencyBand.objects.create(name='Mids', min_frequency=500, max_frequency=2000, center_frequency=1000)
+        challenge = EQChallenge.objects.create(game=game, source_audio='stem', frequency_band=band,
+                                               change_amount=6, difficulty='beginner')
+        client = APIClient()
+        url = reverse('eq-challenge-audio', args=[challenge.id])
+
+        def cold(codec):
+            renderer.reset()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return client.get(url, {'codec': codec})
+
+        def warm_disk(codec):
+            renderer.reset()
+            return client.get(url, {'codec': codec})
+
+        rows = []
+        for codec in ('wav', 'opus'):
+            size = len(client.get(url, {'codec': codec}).content)
+            for name, func in [('cold', cold), ('warm disk', warm_disk), ('warm memory', None)]:
+                if func is None:
+                    client.get(url, {'codec': codec})
+                    stats = measure(lambda: client.get(url, {'codec': codec}), repeat=args.repeat * 10)
+                else:
+                    stats = measure(lambda: func(codec), repeat=args.repeat, warmup=1)
+                rows.append([codec, name, f"{stats['p50']:.2f}", f"{stats['p99']:.2f}", f"{size / 1024:.0f}"])
+
+    print(f"{args.seconds}s stem, 44.1 kHz")
+    print_table(['codec', 'cache', 'p50 ms', 'p99 ms', 'KiB'], rows)
+
+
+if __name__ == '__main__':
+    main()
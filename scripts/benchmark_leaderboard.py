@@ -0,0 +1,101 @@
+"""
+Benchmark leaderboard reads against the number of profiles.
+
+Compares the old ORDER BY -xp query (plus a COUNT for "my rank") with the
+materialized leaderboard in ear_tune.leaderboard. Profiles are seeded with
+bulk inserts into a throwaway test database.
+
+Usage:
+    python scripts/benchmark_leaderboard.py
+    python scripts/benchmark_leaderboard.py --sizes 1000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+
+from bench_utils import measure, print_table, test_database
+from ear_tune.leaderboard import leaderboard
+from ear_tune.models import UserProfile
+
+
+def seed_profiles(target):
+    """Top up users and profiles to `target` rows (bulk_create skips the profile signal)."""
+    existing = User.objects.count()
+    for start in range(existing, target, 10000):
+        stop = min(start + 10000, target)
+        users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(start, stop)])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, xp=random.randint(0, 100000)) for user in users
+        ])
+
+
+def sql_top10():
+    return list(UserProfile.objects.select_related('user').order_by('-xp')[:10])
+
+
+def sql_rank(profile):
+    return UserProfile.objects.filter(xp__gt=profile.xp).count() + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = []
+    with test_database():
+        for size in sorted(args.sizes):
+            print(f"Seeding {size} profiles...")
+            seed_profiles(size)
+            user_ids = list(UserProfile.objects.values_list('user_id', flat=True)[:1000])
+            profile = UserProfile.objects.get(user_id=user_ids[0])
+
+            leaderboard.reset()
+            start = time.perf_counter()
+            len(leaderboard)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            sql_top = measure(sql_top10, repeat=max(5, args.repeat // 20), warmup=1)
+            sql_my_rank = measure(lambda: sql_rank(profile), repeat=max(5, args.repeat // 20), warmup=1)
+            top = measure(lambda: leaderboard.page(0, 10), repeat=args.repeat)
+            rank = measure(lambda: leaderboard.rank(random.choice(user_ids)), repeat=args.repeat)
+            around = measure(lambda: leaderboard.around(random.choice(user_ids), 5), repeat=args.repeat)
+            update = measure(
+                lambda: leaderboard.update(random.choice(user_ids), random.randint(0, 100000)),
+                repeat=args.repeat
+            )
+
+            rows.append([
+                size,
+                f"{sql_top['p50']:.3f}",
+                f"{sql_my_rank['p50']:.3f}",
+                f"{top['p50']:.3f}",
+                f"{rank['p50']:.4f}",
+                f"{around['p50']:.4f}",
+                f"{update['p50']:.4f}",
+                f"{build_ms:.0f}",
+            ])
+
+    print()
+    print_table(['profiles', 'SQL top10 ms', 'SQL rank ms', 'top10 ms', 'rank ms', 'around ms',
+                 'update ms', 'build ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
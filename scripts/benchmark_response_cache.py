@@ -0,0 +1,81 @@
+"""
+Benchmark the public catalogue endpoints with and without the response cache.
+
+Requests /api/v1/games/, /api/v1/games/<id>/ and /api/v1/frequency-bands/
+through the Django test client and reports requests per second with the
+response cache off (RESPONSE_CACHE_TIMEOUT=0: every request serializes and
+renders), on, and on with a client revalidating by ETag (304s). Both runs
+read catalogue rows from the in-process catalogue, so the difference is
+serializer and renderer work. Runs against a throwaway test database.
+
+Usage:
+    python scripts/benchmark_response_cache.py
+    python scripts/benchmark_response_cache.py --games 50 --requests 5000
+    CACHE_URL=file:///tmp/eartune-cache python scripts/benchmark_response_cache.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from bench_utils import print_table, test_database
+from ear_tune.models import FrequencyBand, Game
+
+
+def requests_per_second(client, url, count, **headers):
+    client.get(url, **headers)
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.get(url, **headers)
+    elapsed = time.perf_counter() - start
+    assert response.status_code in (200, 304), response.status_code
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--bands', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and mode')
+    args = parser.parse_args()
+
+    with test_database():
+        games = [Game.objects.create(name=f'Game {i}', description='A game. ' * 20) for i in range(args.games)]
+        for i in range(args.bands):
+            FrequencyBand.objects.create(name=f'Band {i}', min_frequency=20 * 2 ** i, max_frequency=40 * 2 ** i,
+                                         center_frequency=30 * 2 ** i, order=i)
+        urls = [reverse('game-list'), reverse('game-detail', args=[games[0].id]), reverse('frequency-band-list')]
+        client = Client(HTTP_HOST='localhost')
+        cache.clear()
+
+        rows = []
+        for url in urls:
+            with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+                uncached = requests_per_second(client, url, args.requests)
+            cached = requests_per_second(client, url, args.requests)
+            etag = client.get(url)['ETag']
+            revalidated = requests_per_second(client, url, args.requests, HTTP_IF_NONE_MATCH=etag)
+            rows.append([url, f'{uncached:.0f}', f'{cached:.0f}', f'{revalidated:.0f}', f'{cached / uncached:.2f}x'])
+
+    print(f"{args.games} games, {args.bands} frequency bands, cache backend {settings.CACHES['default']['BACKEND']}")
+    print_table(['endpoint', 'uncached req/s', 'cached req/s', '304 req/s', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark rhythm tap scoring against submission size.
+
+Compares the old nested first-match loop from SubmitRhythmAnswerView with
+ear_tune.rhythm.score_taps on an evenly spaced pattern tapped with
+Gaussian timing jitter plus a few stray taps. Needs no database.
+
+Usage:
+    python scripts/benchmark_rhythm_scoring.py
+    python scripts/benchmark_rhythm_scoring.py --sizes 100 10000 --legacy-max 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+from bench_utils import measure, print_table
+from ear_tune.rhythm import score_taps
+
+
+def legacy_score(correct_pattern, user_taps, tolerance=100):
+    """The scoring loop SubmitRhythmAnswerView used before ear_tune.rhythm."""
+    correct_count = 0
+    matched_user_taps = set()
+    for correct_tap in correct_pattern:
+        for i, user_tap in enumerate(user_taps):
+            if i not in matched_user_taps:
+                if abs(user_tap - correct_tap) <= tolerance:
+                    correct_count += 1
+                    matched_user_taps.add(i)
+                    break
+    return correct_count
+
+
+def make_submission(size, rng):
+    expected = [i * 250 for i in range(size)]
+    taps = [onset + rng.gauss(0, 40) for onset in expected if rng.random() > 0.02]
+    taps += [rng.uniform(0, size * 250) for _ in range(size // 50)]
+    rng.shuffle(taps)
+    return expected, taps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 100, 1000, 10000])
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='Largest size to run the legacy loop for')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rows = []
+    for size in sorted(args.sizes):
+        expected, taps = make_submission(size, rng)
+        new = measure(lambda: score_taps(expected, taps), repeat=args.repeat)
+        matched = score_taps(expected, taps)['correct_taps']
+
+        legacy_p50, legacy_matched = '-', '-'
+        if size <= args.legacy_max:
+            repeat = max(1, args.repeat // max(1, size // 100))
+            legacy = measure(lambda: legacy_score(expected, taps), repeat=repeat, warmup=1)
+            legacy_p50, legacy_matched = f"{legacy['p50']:.3f}", legacy_score(expected, taps)
+
+        rows.append([size, legacy_p50, f"{new['p50']:.3f}", f"{new['p99']:.3f}", legacy_matched, matched])
+
+    print_table(['taps', 'loop p50 ms', 'numpy p50 ms', 'numpy p99 ms', 'loop matched', 'numpy matched'], rows)
+
+
+if __name__ == '__main__':
+    main()
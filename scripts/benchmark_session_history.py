@@ -0,0 +1,105 @@
+"""
+Benchmark time-to-first-page of a user's game session history.
+
+Compares the old unpaginated response (every non-attempt session through
+the full GameSessionSerializer) with the cursor-paginated endpoint, with
+and without a ?fields= projection, and a page deep in the history.
+Sessions are bulk inserted into a throwaway test database.
+
+Usage:
+    python scripts/benchmark_session_history.py
+    python scripts/benchmark_session_history.py --sessions 10000
+"""
+
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.serializers import GameSessionSerializer
+from bench_utils import measure, print_table, test_database
+from ear_tune.models import Challenge, Game, GameSession
+from ear_tune.utils import encode_cursor
+
+
+def seed_sessions(user, count):
+    """Bulk insert `count` sessions, one minute apart, plus an attempt for every tenth."""
+    game = Game.objects.create(name='Notes')
+    challenge = Challenge.objects.create(game=game, challenge_type='note', prompt='?', correct_answer='c')
+    start = timezone.now() - timedelta(minutes=count)
+    for offset in range(0, count, 10000):
+        sessions = GameSession.objects.bulk_create([
+            GameSession(user=user, challenge=challenge, score=i % 101, active=False, attempts_left=0)
+            for i in range(offset, min(offset + 10000, count))
+        ])
+        GameSession.objects.bulk_create([
+            GameSession(user=user, challenge=challenge, is_attempt=True, parent_session=session)
+            for session in sessions[::10]
+        ])
+    # date_played is auto_now_add, so spread the timestamps afterwards
+    for i, pk in enumerate(GameSession.objects.filter(user=user).order_by('id').values_list('pk', flat=True)):
+        if i % 10000 == 0:
+            GameSession.objects.filter(user=user, pk__gte=pk).update(date_played=start + timedelta(minutes=i))
+
+
+def legacy_history(user):
+    """The pre-pagination response: every session, all fields."""
+    sessions = GameSession.objects.filter(user=user, is_attempt=False).select_related('challenge__game')
+    sessions = sessions.order_by('-date_played')
+    return JSONRenderer().render(GameSessionSerializer(sessions, many=True).data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        user = User.objects.create(username='bench')
+        print(f"Seeding {args.sessions} sessions...")
+        seed_sessions(user, args.sessions)
+
+        client = APIClient()
+        client.force_authenticate(user=user)
+        url = reverse('game-session-list')
+        deep = GameSession.objects.filter(user=user, is_attempt=False).order_by('-date_played', '-id')[
+            int(args.sessions * 0.9)
+        ]
+        fields = 'id,date_played,game_name,score,active'
+        cases = [
+            ('unpaginated, all fields', lambda: legacy_history(user), 3),
+            ('first page, all fields', lambda: client.get(url).content, args.repeat),
+            ('first page, fields=', lambda: client.get(url, {'fields': fields}).content, args.repeat),
+            ('page at 90%, fields=', lambda: client.get(url, {'fields': fields, 'cursor': encode_cursor(deep)}).content,
+             args.repeat),
+        ]
+
+        rows = []
+        for name, func, repeat in cases:
+            size = len(func())
+            stats = measure(func, repeat=repeat, warmup=1)
+            rows.append([name, f"{stats['p50']:.2f}", f"{stats['p99']:.2f}", f"{size / 1024:.1f}"])
+
+    print()
+    print_table(['request', 'p50 ms', 'p99 ms', 'response KiB'], rows)
+
+
+if __name__ == '__main__':
+    main()
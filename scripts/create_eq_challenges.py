@@ -1,10 +1,29 @@
 """
 Script to create EQChallenge database entries for the frequency recognition game.
 Run this after generating audio samples with generate_eq_samples.py
+
+Challenges are calibrated by measured audibility rather than by the size
+of the EQ change alone: every source stem the renderer can serve is
+analyzed with ear_tune.analysis, which measures how far each (band, gain)
+moves the band's level against the rest of the spectrum. Difficulty
+follows the measured change, and combinations the source cannot make
+audible (a sub-bass change on a pad with nothing below 400 Hz) are not
+created; --prune also deletes existing ones.
+
+Features are cached per file hash in cache/eq_features.npz, so a rerun
+only analyzes new or changed stems. The rest are analyzed on a process
+pool.
+
+Usage:
+    python scripts/create_eq_challenges.py
+    python scripts/create_eq_challenges.py --workers 8 --prune
 """
 
+import argparse
 import os
 import sys
+import time
+
 import django
 
 # Add the project directory to the path
@@ -15,11 +34,43 @@ sys.path.insert(0, project_dir)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
 django.setup()
 
+from django.db.models import Count
+
+from ear_tune.analysis import FeatureStore, analyze_library, difficulty_for
 from ear_tune.models import Game, FrequencyBand, EQChallenge
+from ear_tune.render_cache import renderer
+from ear_tune.sampling import bump_sampler_version
+
+# EQ change amounts (in dB)
+CHANGE_AMOUNTS = [-12, -9, -6, -3, 3, 6, 9, 12]
+
+DIFFICULTIES = ['beginner', 'intermediate', 'advanced']
+
 
+def discover_sources():
+    """{source_audio: path} for every stem the renderer can serve; earlier directories win."""
+    sources = {}
+    for directory in renderer.source_dirs():
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.wav'):
+                sources.setdefault(name[:-len('.wav')], os.path.join(directory, name))
+    return sources
 
-def create_eq_challenges():
-    """Create EQChallenge entries for all generated audio files."""
+
+def plan_challenges(sources, features, frequency_bands, change_amounts=CHANGE_AMOUNTS):
+    """Yield (source_audio, frequency_band, change_amount, measured delta dB, difficulty or None)."""
+    for source_audio, path in sources.items():
+        _, delta_db = features[path]
+        for band_index, freq_band in enumerate(frequency_bands):
+            for gain_index, change_amount in enumerate(change_amounts):
+                delta = float(delta_db[band_index, gain_index])
+                yield source_audio, freq_band, change_amount, delta, difficulty_for(delta)
+
+
+def create_eq_challenges(workers=None, cache_path=None, prune=False, batch_size=1000):
+    """Create, recalibrate and optionally prune EQChallenge entries for every source stem."""
 
     print("=" * 60)
     print("Creating EQ Challenges")
@@ -36,70 +87,87 @@ def create_eq_challenges():
         print(f"Using existing game: {game.name}")
 
     # Get all frequency bands
-    frequency_bands = FrequencyBand.objects.all()
-    if not frequency_bands.exists():
+    frequency_bands = list(FrequencyBand.objects.all())
+    if not frequency_bands:
         print("\nError: No frequency bands found in database!")
         print("Please load the frequency_bands.json fixture first:")
         print("  python manage.py loaddata ear_tune/fixtures/frequency_bands.json")
         return
 
-    print(f"\nFound {frequency_bands.count()} frequency bands")
-
-    # Source audio files that were generated
-    source_files = ['pink_noise', 'drums', 'bass', 'synth_pad']
-
-    # EQ change amounts (in dB)
-    change_amounts = [-12, -9, -6, -3, 3, 6, 9, 12]
-
-    # Difficulty mapping based on change amount
-    def get_difficulty(change_amount):
-        abs_change = abs(change_amount)
-        if abs_change >= 9:
-            return 'beginner'  # Easier to hear
-        elif abs_change >= 6:
-            return 'intermediate'
-        else:
-            return 'advanced'  # Harder to hear subtle changes
-
-    created_count = 0
-    skipped_count = 0
-
-    print("\nCreating challenges...")
-
-    for source_file in source_files:
-        for freq_band in frequency_bands:
-            for change_amount in change_amounts:
-                # Create the challenge
-                band_name_slug = freq_band.name.lower().replace(' ', '_')
-                difficulty = get_difficulty(change_amount)
-
-                challenge, created = EQChallenge.objects.get_or_create(
-                    game=game,
-                    source_audio=source_file,
-                    frequency_band=freq_band,
-                    change_amount=change_amount,
-                    defaults={'difficulty': difficulty}
-                )
-
-                if created:
-                    created_count += 1
-                    if created_count <= 10 or created_count % 50 == 0:
-                        print(f"  Created: {source_file} | {freq_band.name} | {change_amount:+d}dB | {difficulty}")
-                else:
-                    skipped_count += 1
+    sources = discover_sources()
+    if not sources:
+        print("\nError: No source stems found!")
+        print("Run scripts/generate_eq_samples.py first, or add WAV files to one of:")
+        for directory in renderer.source_dirs():
+            print(f"  {directory}")
+        return
+
+    print(f"\nFound {len(frequency_bands)} frequency bands and {len(sources)} source stems")
+
+    # Measure every (source, band, change) combination, reusing cached features
+    store = FeatureStore(cache_path or os.path.join(project_dir, 'cache', 'eq_features.npz'))
+    bands = [(band.min_frequency, band.max_frequency, band.center_frequency) for band in frequency_bands]
+    started = time.perf_counter()
+    features, analyzed = analyze_library(list(sources.values()), bands, CHANGE_AMOUNTS, store, workers=workers)
+    analysis_seconds = time.perf_counter() - started
+    store.prune(sources.values())
+    store.save()
+    print(f"Analyzed {analyzed} stems in {analysis_seconds:.1f}s, {len(sources) - analyzed} cached")
+
+    existing = {
+        (challenge.source_audio, challenge.frequency_band_id, challenge.change_amount): challenge
+        for challenge in EQChallenge.objects.filter(game=game, source_audio__in=list(sources))
+    }
+    new, recalibrated, inaudible = [], [], []
+    for source_audio, freq_band, change_amount, delta, difficulty in plan_challenges(
+            sources, features, frequency_bands):
+        challenge = existing.get((source_audio, freq_band.id, change_amount))
+        if difficulty is None:
+            inaudible.append((source_audio, freq_band, change_amount, delta, challenge))
+        elif challenge is None:
+            new.append(EQChallenge(game=game, source_audio=source_audio, frequency_band=freq_band,
+                                   change_amount=change_amount, difficulty=difficulty))
+        elif challenge.difficulty != difficulty:
+            challenge.difficulty = difficulty
+            recalibrated.append(challenge)
+
+    EQChallenge.objects.bulk_create(new, batch_size=batch_size)
+    EQChallenge.objects.bulk_update(recalibrated, ['difficulty'], batch_size=batch_size)
+    stale = [challenge.id for *_, challenge in inaudible if challenge is not None]
+    pruned = EQChallenge.objects.filter(id__in=stale).delete()[0] if prune and stale else 0
+    # Bulk writes send no signals; tell the serving workers to rebuild their sampling index
+    bump_sampler_version(EQChallenge)
+
+    if inaudible:
+        print(f"\nInaudible combinations ({len(inaudible)}), not created:")
+        for source_audio, freq_band, change_amount, delta, _ in inaudible[:10]:
+            print(f"  {source_audio} | {freq_band.name} | {change_amount:+d}dB | measured {delta:+.1f}dB")
+        if len(inaudible) > 10:
+            print(f"  ... and {len(inaudible) - 10} more")
 
     print("\n" + "=" * 60)
     print("Summary")
     print("=" * 60)
-    print(f"Challenges created: {created_count}")
-    print(f"Challenges skipped (already exist): {skipped_count}")
+    print(f"Challenges created: {len(new)}")
+    print(f"Challenges recalibrated: {len(recalibrated)}")
+    if prune:
+        print(f"Inaudible challenges deleted: {pruned}")
+    elif stale:
+        print(f"Inaudible challenges kept: {len(stale)} (rerun with --prune to delete them)")
     print(f"Total challenges in database: {EQChallenge.objects.count()}")
     print("\nBreakdown by difficulty:")
-    for diff in ['beginner', 'intermediate', 'advanced']:
-        count = EQChallenge.objects.filter(difficulty=diff).count()
-        print(f"  {diff.capitalize()}: {count}")
+    counts = dict(EQChallenge.objects.values_list('difficulty').annotate(count=Count('id')).order_by())
+    for diff in DIFFICULTIES:
+        print(f"  {diff.capitalize()}: {counts.get(diff, 0)}")
     print("=" * 60)
 
 
 if __name__ == '__main__':
-    create_eq_challenges()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--cache', dest='cache_path', default=None,
+                        help='Feature cache file (default: cache/eq_features.npz)')
+    parser.add_argument('--prune', action='store_true',
+                        help='Delete existing challenges that measure as inaudible')
+    args = parser.parse_args()
+    create_eq_challenges(workers=args.workers, cache_path=args.cache_path, prune=args.prune)
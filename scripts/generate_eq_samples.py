@@ -1,46 +1,45 @@
 """
 Script to generate EQ'd audio samples for the frequency recognition game.
 Handles both generated test files and custom user files.
+
+Builds are incremental: a manifest in the output directory records, for
+every output, a key over the source file's hash, the EQ parameters and the
+rendering code. Reruns only render outputs that are missing or stale, and
+delete outputs whose source or band/gain is gone.
+
+Renders run on a process pool, one job per (source, band): the filter pass
+is shared by all of that band's gains. Each source is decoded once and
+spilled to a .npy buffer that the workers memory-map, so the audio is
+shared through the page cache instead of being pickled into every job.
+Decoding and rendering stream in blocks (ear_tune.eq.peak_filter_blocks
+and mix_eq_blocks), so multi-minute custom stems render in bounded memory.
+
+Usage:
+    python scripts/generate_eq_samples.py
+    python scripts/generate_eq_samples.py --workers 8
 """
 
+import argparse
+import hashlib
+import json
 import os
 import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import numpy as np
 import soundfile as sf
 from scipy import signal
 
-def apply_eq(audio_data, sample_rate, center_freq, gain_db, q_factor=1.0):
-    """Apply parametric EQ to audio data."""
-    # Convert gain from dB to linear
-    gain_linear = 10 ** (gain_db / 20)
-    
-    # Design a peaking EQ filter
-    nyquist = sample_rate / 2
-    normalized_freq = center_freq / nyquist
-    
-    # Ensure normalized frequency is valid
-    if normalized_freq >= 1.0:
-        normalized_freq = 0.99
-    
-    # Create peaking filter coefficients
-    b, a = signal.iirpeak(normalized_freq, q_factor, sample_rate)
-    
-    # Apply the filter with gain
-    if gain_db > 0:
-        filtered = signal.filtfilt(b, a, audio_data) * gain_linear
-        # Mix with original (parallel processing)
-        output = audio_data + (filtered - audio_data) * 0.7
-    else:
-        # For cuts, apply inverse filter
-        filtered = signal.filtfilt(b, a, audio_data)
-        output = audio_data - (audio_data - filtered) * abs(gain_linear - 1)
-    
-    # Normalize to prevent clipping
-    max_val = np.max(np.abs(output))
-    if max_val > 1.0:
-        output = output / max_val
-    
-    return output
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+from ear_tune.eq import (
+    Q_FACTOR, RENDER_CODE_VERSION, STREAM_BLOCK_FRAMES, apply_eq, mix_eq, mix_eq_blocks, peak_filter,
+    peak_filter_blocks,
+)
 
 def generate_test_audio(output_dir):
     """Generate test audio files for basic training."""
@@ -91,40 +90,243 @@ def generate_test_audio(output_dir):
     
     return files_created
 
-def process_audio_file(input_path, output_dir, frequency_bands, gain_amounts):
-    """Process a single audio file with various EQ settings."""
-    # Load audio file
-    audio_data, sample_rate = sf.read(input_path)
-    
-    # Handle stereo files by converting to mono
-    if len(audio_data.shape) > 1:
-        audio_data = np.mean(audio_data, axis=1)
-    
+def load_source(input_path, buffer_path, original_output_path=None, block_frames=STREAM_BLOCK_FRAMES):
+    """
+    Decode a source to mono and spill the samples to a .npy buffer for the
+    workers, saving the unprocessed copy to original_output_path if given.
+    The source is read, mixed down and written a block at a time.
+    Returns the sample rate.
+    """
+    info = sf.info(input_path)
+    buffer = np.lib.format.open_memmap(buffer_path, mode='w+', dtype=np.float64, shape=(info.frames,))
+
+    # Save original (without processing if it's already in output dir)
+    original = None
+    if original_output_path and input_path != original_output_path:
+        os.makedirs(os.path.dirname(original_output_path), exist_ok=True)
+        original = sf.SoundFile(original_output_path, 'w', info.samplerate, 1)
+
+    try:
+        position = 0
+        for block in sf.blocks(input_path, blocksize=block_frames, always_2d=True):
+            # Handle stereo files by converting to mono
+            mono = block.mean(axis=1)
+            buffer[position:position + len(mono)] = mono
+            position += len(mono)
+            if original is not None:
+                original.write(mono)
+    finally:
+        if original is not None:
+            original.close()
+    buffer.flush()
+    del buffer
+    return info.samplerate
+
+def render_targets(input_path, output_dir, frequency_bands, gain_amounts):
+    """
+    Yield (output_path, center_freq, gain_db) for every file rendered from a
+    source. The unprocessed copy comes first, with a center_freq of None.
+    """
     # Get filename without extension
     filename = os.path.splitext(os.path.basename(input_path))[0]
-    
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Save original (without processing if it's already in output dir)
-    original_output_path = os.path.join(output_dir, f"{filename}.wav")
-    if input_path != original_output_path:
-        sf.write(original_output_path, audio_data, sample_rate)
-    
-    # Process each frequency band
+    yield os.path.join(output_dir, f"{filename}.wav"), None, 0
     for band_name, center_freq in frequency_bands.items():
         for gain_db in gain_amounts:
             if gain_db == 0:
                 continue  # Skip no change
-                
-            # Apply EQ
-            processed = apply_eq(audio_data, sample_rate, center_freq, gain_db)
-            
-            # Save processed file
-            output_filename = f"{filename}_{band_name}_{gain_db}db.wav"
-            output_path = os.path.join(output_dir, output_filename)
-            sf.write(output_path, processed, sample_rate)
-            print(f"Created: {output_filename}")
+            yield os.path.join(output_dir, f"{filename}_{band_name}_{gain_db}db.wav"), center_freq, gain_db
+
+def render_job(buffer_path, sample_rate, center_freq, outputs, block_frames=STREAM_BLOCK_FRAMES):
+    """
+    Render every gain of one band from a memory-mapped source (runs in a worker).
+    `outputs` is a list of (output_path, gain_db); the filter pass is shared.
+    Sources longer than one block are streamed: the filtered signal goes to
+    a memory-mapped file next to the buffer and each output is mixed and
+    written a block at a time, so memory does not grow with the source.
+    """
+    audio_data = np.load(buffer_path, mmap_mode='r')
+    if len(audio_data) <= block_frames:
+        filtered = peak_filter(audio_data, sample_rate, center_freq, Q_FACTOR)
+        for output_path, gain_db in outputs:
+            sf.write(output_path, mix_eq(audio_data, filtered, gain_db), sample_rate)
+        return [output_path for output_path, _ in outputs]
+
+    filtered_path = f"{os.path.splitext(buffer_path)[0]}_{center_freq}.npy"
+    filtered = np.lib.format.open_memmap(filtered_path, mode='w+', dtype=np.float64, shape=audio_data.shape)
+    try:
+        peak_filter_blocks(audio_data, filtered, sample_rate, center_freq, Q_FACTOR, block_frames)
+        for output_path, gain_db in outputs:
+            with sf.SoundFile(output_path, 'w', sample_rate, 1) as f:
+                for block in mix_eq_blocks(audio_data, filtered, gain_db, block_frames):
+                    f.write(block)
+    finally:
+        del filtered
+        os.remove(filtered_path)
+    return [output_path for output_path, _ in outputs]
+
+def render_all(sources, frequency_bands, gain_amounts, workers=None, verbose=True, wanted=None, on_rendered=None):
+    """
+    Render every (source, band, gain) combination on a process pool, one
+    job per (source, band).
+    `sources` is a list of (input_path, output_dir). Pass `wanted` to render
+    only the output paths it returns True for; sources with nothing wanted
+    are not decoded. `on_rendered` is called with each finished output path.
+    At most two sources per worker are decoded ahead, which bounds memory
+    on large libraries.
+    Returns (renders, seconds).
+    """
+    workers = workers or os.cpu_count() or 1
+    max_buffered = 2 * workers
+    pending = {}  # future -> buffer path
+    remaining = {}  # buffer path -> jobs still running
+    renders = 0
+
+    def finished(output_path):
+        nonlocal renders
+        renders += 1
+        if verbose:
+            print(f"Created: {os.path.basename(output_path)}")
+        if on_rendered:
+            on_rendered(output_path)
+
+    def collect(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            buffer_path = pending.pop(future)
+            for output_path in future.result():
+                finished(output_path)
+            remaining[buffer_path] -= 1
+            if not remaining[buffer_path]:
+                del remaining[buffer_path]
+                os.remove(buffer_path)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as buffer_dir, ProcessPoolExecutor(max_workers=workers) as pool:
+        for index, (input_path, output_dir) in enumerate(sources):
+            original_output_path, bands = None, {}
+            for output_path, center_freq, gain_db in render_targets(input_path, output_dir, frequency_bands, gain_amounts):
+                if wanted is not None and not wanted(output_path):
+                    continue
+                if center_freq is None:
+                    original_output_path = output_path
+                else:
+                    bands.setdefault(center_freq, []).append((output_path, gain_db))
+            if original_output_path is None and not bands:
+                continue
+
+            while len(remaining) >= max_buffered:
+                collect(FIRST_COMPLETED)
+
+            # Ensure output directory exists
+            os.makedirs(output_dir, exist_ok=True)
+            buffer_path = os.path.join(buffer_dir, f"{index}.npy")
+            sample_rate = load_source(input_path, buffer_path, original_output_path)
+            if original_output_path:
+                finished(original_output_path)
+
+            remaining[buffer_path] = 0
+            for center_freq, outputs in bands.items():
+                future = pool.submit(render_job, buffer_path, sample_rate, center_freq, outputs)
+                pending[future] = buffer_path
+                remaining[buffer_path] += 1
+            if not remaining[buffer_path]:
+                del remaining[buffer_path]
+                os.remove(buffer_path)
+
+        while pending:
+            collect(FIRST_COMPLETED)
+    return renders, time.perf_counter() - start
+
+def process_audio_file(input_path, output_dir, frequency_bands, gain_amounts, workers=None):
+    """Process a single audio file with various EQ settings."""
+    return render_all([(input_path, output_dir)], frequency_bands, gain_amounts, workers=workers)
+
+def render_key(source_hash, center_freq, gain_db):
+    """Identify one output by everything that determines its contents."""
+    params = [source_hash, center_freq, gain_db, Q_FACTOR, RENDER_CODE_VERSION]
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+class BuildManifest:
+    """
+    Render keys of the files in an output directory, saved as JSON next to
+    them. Source hashes are cached by (size, mtime), so an unchanged
+    library is checked without reading the audio again.
+    """
+    SAVE_EVERY = 256
+
+    def __init__(self, path):
+        self.path = path
+        self.root = os.path.dirname(path)
+        self.sources, self.outputs = {}, {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == 1:
+                self.sources, self.outputs = data['sources'], data['outputs']
+        self._unsaved = 0
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.root)
+
+    def source_hash(self, path):
+        """SHA-256 of a source file, reusing the cached digest if the file is unchanged."""
+        stat = os.stat(path)
+        cached = self.sources.get(self._relative(path))
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self.sources[self._relative(path)] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()
+        }
+        return digest.hexdigest()
+
+    def is_current(self, output_path, key):
+        return self.outputs.get(self._relative(output_path)) == key and os.path.exists(output_path)
+
+    def record(self, output_path, key):
+        self.outputs[self._relative(output_path)] = key
+        self._unsaved += 1
+        if self._unsaved >= self.SAVE_EVERY:
+            self.save()
+
+    def prune(self, keep_outputs, keep_sources):
+        """Delete tracked outputs that are no longer produced; return how many were removed."""
+        keep_outputs = {self._relative(path) for path in keep_outputs}
+        keep_sources = {self._relative(path) for path in keep_sources}
+        orphans = [path for path in self.outputs if path not in keep_outputs]
+        for path in orphans:
+            full_path = os.path.join(self.root, path)
+            if os.path.exists(full_path):
+                os.remove(full_path)
+            del self.outputs[path]
+        self.sources = {path: entry for path, entry in self.sources.items() if path in keep_sources}
+        return len(orphans)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'version': 1, 'sources': self.sources, 'outputs': self.outputs}, f)
+        os.replace(temp_path, self.path)
+        self._unsaved = 0
+
+def plan_build(manifest, sources, frequency_bands, gain_amounts):
+    """
+    Work out which outputs are missing or were rendered from other inputs,
+    and prune the ones no longer produced.
+    Returns ({output_path: render key}, stale output paths, orphans removed).
+    """
+    keys = {}
+    for file_path, output_subdir in sources:
+        source_hash = manifest.source_hash(file_path)
+        for output_path, center_freq, gain_db in render_targets(file_path, output_subdir, frequency_bands, gain_amounts):
+            keys[output_path] = render_key(source_hash, center_freq, gain_db)
+    stale = {output_path for output_path, key in keys.items() if not manifest.is_current(output_path, key)}
+    pruned = manifest.prune(keys, [file_path for file_path, _ in sources])
+    return keys, stale, pruned
 
 # Define frequency bands (matching our Django model)
 frequency_bands = {
@@ -142,6 +344,11 @@ gain_amounts = [-12, -9, -6, -3, 3, 6, 9, 12]
 
 # Main execution
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
     source_dir = 'static/audio/eq_samples/sources'
     output_dir = 'static/audio/eq_samples'
     
@@ -183,10 +390,9 @@ if __name__ == "__main__":
     print(f"- {len(generated_files)} generated files")
     print(f"- {len(custom_files)} custom files")
     
-    # Process each file
+    # Pair each file with its output directory
+    sources = []
     for file_path in all_files:
-        print(f"\nProcessing: {file_path}")
-        
         # Determine output subdirectory based on source
         if file_path.startswith(generated_dir):
             output_subdir = os.path.join(output_dir, 'generated')
@@ -195,9 +401,23 @@ if __name__ == "__main__":
             rel_path = os.path.relpath(file_path, custom_dir)
             custom_subdir = os.path.dirname(rel_path)
             output_subdir = os.path.join(output_dir, 'custom', custom_subdir)
-        
-        os.makedirs(output_subdir, exist_ok=True)
-        process_audio_file(file_path, output_subdir, frequency_bands, gain_amounts)
+        sources.append((file_path, output_subdir))
+    
+    # Work out which outputs are missing or were rendered from other inputs
+    manifest = BuildManifest(os.path.join(output_dir, '.manifest.json'))
+    keys, stale, pruned = plan_build(manifest, sources, frequency_bands, gain_amounts)
+    print(f"{len(keys) - len(stale)} outputs up to date, {len(stale)} to render, {pruned} orphans removed")
+
+    try:
+        renders, seconds = render_all(
+            sources, frequency_bands, gain_amounts, workers=args.workers,
+            wanted=stale.__contains__,
+            on_rendered=lambda output_path: manifest.record(output_path, keys[output_path])
+        )
+    finally:
+        manifest.save()
     
     print("\nAudio generation complete!")
-    print(f"Processed files saved to: {output_dir}")
\ No newline at end of file
+    if renders:
+        print(f"Rendered {renders} files in {seconds:.1f}s ({renders / seconds:.1f} renders/s)")
+    print(f"Processed files saved to: {output_dir}")
@@ -1,14 +1,41 @@
 """
-Script to generate rhythm challenge audio files and database entries.
-Creates click tracks for beginner, intermediate, and advanced difficulties.
+Script to generate the rhythm challenge catalogue: click-track audio files
+and RhythmChallenge rows.
+
+Patterns are drawn from a grammar of meters, beat subdivisions (quarters,
+eighths, triplets, sixteenths), onset sets on the subdivision grid and
+tempos. Each pattern is scored for difficulty (meter, subdivision,
+syncopation, tempo) and the catalogue is filled with an equal share per
+difficulty as far as the grammar allows. Sampling is seeded, so a run with
+the same arguments produces the same patterns.
+
+Runs are idempotent: every pattern has a key over what defines it, its
+audio file is named after the key and only rendered when missing (or with
+--force), and rows are upserted on (game, pattern_key) in batches with
+bulk_create(update_conflicts=True). Each row stores the exact onset
+timeline of its audio, every bar in ms, packed for scoring (see
+ear_tune.rhythm). Existing challenges are kept unless
+--prune is given, which deletes the game's challenges this run did not
+produce. Audio is synthesized with ear_tune.clicktrack and encoded to MP3
+on a process pool.
+
+Usage:
+    python scripts/generate_rhythm_challenges.py
+    python scripts/generate_rhythm_challenges.py --count 100000 --workers 8 --prune
 """
 
+import argparse
+import hashlib
+import json
+import math
 import os
+import random
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import django
-import numpy as np
-from pydub import AudioSegment
-from pydub.generators import Sine
+import soundfile as sf
 
 # Add the project directory to the path
 project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -18,388 +45,271 @@ sys.path.insert(0, project_dir)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
 django.setup()
 
+from ear_tune.clicktrack import click_track
 from ear_tune.models import RhythmChallenge, Game
+from ear_tune.rhythm import onset_timeline_ms, pack_onsets
+from ear_tune.sampling import bump_sampler_version
 
+GAME_NAME = 'Rhythm Recognition'
 
-def generate_click_sound(frequency=1000, duration_ms=50, volume_db=-10):
-    """
-    Generate a single click sound.
-
-    Args:
-        frequency: Frequency of the click in Hz
-        duration_ms: Duration of the click in milliseconds
-        volume_db: Volume adjustment in decibels
-
-    Returns:
-        AudioSegment: The generated click sound
-    """
-    # Generate a short sine wave
-    click = Sine(frequency).to_audio_segment(duration=duration_ms)
-
-    # Apply a quick fade in/out to avoid pops
-    click = click.fade_in(5).fade_out(5)
+# Meter -> difficulty points. The beat is the denominator's note value; the tempo counts those beats.
+METERS = {'2/4': 0, '3/4': 0, '4/4': 0, '6/8': 1, '5/4': 2, '7/8': 2}
 
-    # Adjust volume
-    click = click + volume_db
+# Grid steps per beat -> (name, difficulty points)
+SUBDIVISIONS = {1: ('quarter', 0), 2: ('eighth', 1), 3: ('triplet', 2), 4: ('sixteenth', 2)}
 
-    return click
+TEMPOS = range(60, 181, 5)
+FAST_TEMPO = 140
+# Sixteenths and triplets above this tempo are too dense to tap
+MAX_SUBDIVIDED_TEMPO = 120
 
+DIFFICULTIES = ['beginner', 'intermediate', 'advanced']
+BARS = 4
 
-def generate_rhythm_pattern(pattern, tempo, time_signature="4/4", bars=4):
-    """
-    Generate an audio file from a rhythm pattern.
-
-    Args:
-        pattern: List of beat positions (e.g., [0, 1, 2, 3] for quarter notes)
-        tempo: Tempo in BPM
-        time_signature: Time signature (e.g., "4/4")
-        bars: Number of bars to generate
-
-    Returns:
-        AudioSegment: The generated rhythm pattern
-    """
-    # Parse time signature
-    beats_per_bar, note_value = map(int, time_signature.split('/'))
-
-    # Calculate timing
-    ms_per_beat = (60000 / tempo)  # milliseconds per beat
-    ms_per_bar = ms_per_beat * beats_per_bar
-    total_duration = ms_per_bar * bars
 
-    # Create silent audio segment
-    audio = AudioSegment.silent(duration=int(total_duration))
+def beats_per_bar(meter):
+    return int(meter.split('/')[0])
 
-    # Generate different sounds for downbeats and other beats
-    downbeat_click = generate_click_sound(frequency=1200, volume_db=-8)
-    regular_click = generate_click_sound(frequency=800, volume_db=-12)
 
-    # Add clicks for each bar
-    for bar in range(bars):
-        bar_start = bar * ms_per_bar
+def pattern_key(meter, subdivision, steps, tempo):
+    """Stable identity of a pattern: everything that determines its challenge."""
+    params = [meter, subdivision, list(steps), tempo, BARS]
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()[:32]
 
-        for beat_position in pattern:
-            if beat_position < beats_per_bar:
-                click_time = bar_start + (beat_position * ms_per_beat)
 
-                # Use downbeat click for first beat of each bar
-                if beat_position == 0:
-                    audio = audio.overlay(downbeat_click, position=int(click_time))
-                else:
-                    audio = audio.overlay(regular_click, position=int(click_time))
+def pattern_beats(subdivision, steps):
+    """Onset positions in beats, e.g. steps [0, 3, 5] on a triplet grid -> [0, 1, 1.666667]."""
+    return [round(step / subdivision, 6) for step in steps]
 
-    return audio
 
-
-def generate_syncopated_pattern(pattern, tempo, time_signature="4/4", bars=4):
+def difficulty_points(meter, subdivision, steps, tempo):
     """
-    Generate a syncopated rhythm pattern with more complex subdivisions.
-
-    Args:
-        pattern: List of tuples (beat_position, subdivision)
-                 e.g., [(0, 0), (0.5, 0), (1, 0), (1.5, 0)] for eighth notes
-        tempo: Tempo in BPM
-        time_signature: Time signature
-        bars: Number of bars
-
-    Returns:
-        AudioSegment: The generated rhythm pattern
+    Score how hard a pattern is to hear and tap: the meter, the finest
+    subdivision, each syncopated onset (an off-beat onset whose next beat is
+    silent) and a fast tempo.
     """
-    # Parse time signature
-    beats_per_bar, note_value = map(int, time_signature.split('/'))
-
-    # Calculate timing
-    ms_per_beat = (60000 / tempo)
-    ms_per_bar = ms_per_beat * beats_per_bar
-    total_duration = ms_per_bar * bars
-
-    # Create silent audio segment
-    audio = AudioSegment.silent(duration=int(total_duration))
-
-    # Generate different sounds
-    downbeat_click = generate_click_sound(frequency=1200, volume_db=-8)
-    regular_click = generate_click_sound(frequency=800, volume_db=-12)
-    offbeat_click = generate_click_sound(frequency=600, volume_db=-14)
-
-    # Add clicks for each bar
-    for bar in range(bars):
-        bar_start = bar * ms_per_bar
-
-        for beat_position in pattern:
-            if beat_position < beats_per_bar:
-                click_time = bar_start + (beat_position * ms_per_beat)
-
-                # Determine click type
-                if beat_position == 0:
-                    click = downbeat_click
-                elif beat_position == int(beat_position):
-                    click = regular_click
-                else:
-                    click = offbeat_click
-
-                audio = audio.overlay(click, position=int(click_time))
-
-    return audio
-
-
-def create_beginner_challenges(output_dir, game):
-    """Create beginner level rhythm challenges."""
-    challenges = []
-
-    # Beginner patterns (simple quarter and half notes)
-    patterns = [
-        {
-            'name': 'quarter_notes',
-            'pattern': [0, 1, 2, 3],
-            'tempo': 80,
-            'description': 'Quarter notes',
-            'correct_pattern': {'beats': [0, 1, 2, 3], 'subdivision': 'quarter'}
-        },
-        {
-            'name': 'half_notes',
-            'pattern': [0, 2],
-            'tempo': 80,
-            'description': 'Half notes',
-            'correct_pattern': {'beats': [0, 2], 'subdivision': 'half'}
-        },
-        {
-            'name': 'whole_note',
-            'pattern': [0],
-            'tempo': 80,
-            'description': 'Whole note',
-            'correct_pattern': {'beats': [0], 'subdivision': 'whole'}
-        },
-        {
-            'name': 'dotted_half',
-            'pattern': [0, 3],
-            'tempo': 90,
-            'description': 'Dotted half notes in 3/4',
-            'correct_pattern': {'beats': [0], 'subdivision': 'dotted_half'}
+    points = METERS[meter] + SUBDIVISIONS[subdivision][1]
+    onsets = set(steps)
+    grid = beats_per_bar(meter) * subdivision
+    for step in steps:
+        if step % subdivision and (step // subdivision + 1) * subdivision % grid not in onsets:
+            points += 1
+    if tempo >= FAST_TEMPO:
+        points += 1
+    return points
+
+
+def difficulty_for(points):
+    if points <= 1:
+        return 'beginner'
+    if points <= 3:
+        return 'intermediate'
+    return 'advanced'
+
+
+def draw_pattern(rng):
+    """One random pattern from the grammar, or None if the draw is rejected."""
+    meter = rng.choice(list(METERS))
+    subdivision = rng.choice(list(SUBDIVISIONS))
+    tempo = rng.choice(TEMPOS)
+    if subdivision > 2 and tempo > MAX_SUBDIVIDED_TEMPO:
+        return None
+    density = rng.uniform(0.25, 0.9)
+    steps = [0] + [step for step in range(1, beats_per_bar(meter) * subdivision) if rng.random() < density]
+    # The pattern must actually use its subdivision, so a sixteenth pattern is not just eighths
+    finest = 2 if subdivision == 4 else subdivision
+    if subdivision > 1 and not any(step % finest for step in steps):
+        return None
+    return meter, subdivision, tuple(steps), tempo
+
+
+def sample_patterns(count, seed=0, difficulties=DIFFICULTIES, patience=20000):
+    """
+    Draw up to `count` distinct patterns of the given difficulties in a
+    seeded order, aiming for an equal share of each. The grammar holds far
+    fewer beginner patterns than advanced ones: once `patience` draws in a
+    row add nothing, the shares are lifted, and sampling stops when the
+    grammar yields no new patterns at all.
+    """
+    rng = random.Random(seed)
+    quota = math.ceil(count / len(difficulties))
+    filled = dict.fromkeys(difficulties, 0)
+    seen = set()
+    patterns = []
+    idle = 0
+    while len(patterns) < count:
+        if idle >= patience:
+            if quota >= count:
+                break
+            quota, idle = count, 0
+        idle += 1
+        drawn = draw_pattern(rng)
+        if drawn is None:
+            continue
+        key = pattern_key(*drawn)
+        difficulty = difficulty_for(difficulty_points(*drawn))
+        if key in seen or filled.get(difficulty, quota) >= quota:
+            continue
+        seen.add(key)
+        filled[difficulty] += 1
+        idle = 0
+        meter, subdivision, steps, tempo = drawn
+        patterns.append({
+            'key': key, 'meter': meter, 'subdivision': subdivision, 'steps': steps, 'tempo': tempo,
+            'difficulty': difficulty,
+        })
+    return patterns
+
+
+def describe(pattern):
+    name = SUBDIVISIONS[pattern['subdivision']][0]
+    return f"{len(pattern['steps'])} onsets on a {name} grid in {pattern['meter']} at {pattern['tempo']} BPM"
+
+
+def render_audio(output_path, meter, subdivision, steps, tempo, sample_rate):
+    """Synthesize and encode one pattern's click track (runs in a worker)."""
+    audio = click_track(pattern_beats(subdivision, steps), tempo, meter, BARS, sample_rate=sample_rate)
+    temp_path = f"{output_path}.tmp"
+    sf.write(temp_path, audio, sample_rate, format='MP3')
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def pattern_onsets_ms(pattern):
+    """The exact onset timeline of a pattern over all BARS bars, in ms."""
+    exact_beats = [step / pattern['subdivision'] for step in pattern['steps']]
+    return onset_timeline_ms(exact_beats, pattern['tempo'], beats_per_bar(pattern['meter']), BARS)
+
+
+def challenge_row(game, pattern, audio_file):
+    beats = pattern_beats(pattern['subdivision'], pattern['steps'])
+    return RhythmChallenge(
+        game=game,
+        pattern_key=pattern['key'],
+        onsets_ms=pack_onsets(pattern_onsets_ms(pattern)),
+        pattern_data={'pattern': beats, 'description': describe(pattern)},
+        tempo=pattern['tempo'],
+        time_signature=pattern['meter'],
+        difficulty=pattern['difficulty'],
+        audio_file=audio_file,
+        correct_pattern={
+            'beats': beats,
+            'subdivision': SUBDIVISIONS[pattern['subdivision']][0],
+            'time_signature': pattern['meter'],
         },
-    ]
+    )
 
-    for pattern_info in patterns:
-        # Generate audio
-        audio = generate_rhythm_pattern(
-            pattern_info['pattern'],
-            pattern_info['tempo'],
-            time_signature="4/4",
-            bars=4
-        )
-
-        # Save audio file
-        filename = f"beginner_{pattern_info['name']}.mp3"
-        filepath = os.path.join(output_dir, filename)
-        audio.export(filepath, format='mp3', bitrate='192k')
-
-        # Create database entry
-        challenge = RhythmChallenge.objects.create(
-            game=game,
-            pattern_data={
-                'pattern': pattern_info['pattern'],
-                'description': pattern_info['description']
-            },
-            tempo=pattern_info['tempo'],
-            time_signature="4/4",
-            difficulty='beginner',
-            audio_file=f'static/audio/rhythm/{filename}',
-            correct_pattern=pattern_info['correct_pattern']
-        )
-        challenges.append(challenge)
-        print(f"Created beginner challenge: {pattern_info['name']}")
-
-    return challenges
-
-
-def create_intermediate_challenges(output_dir, game):
-    """Create intermediate level rhythm challenges."""
-    challenges = []
-
-    # Intermediate patterns (eighth notes, simple syncopation)
-    patterns = [
-        {
-            'name': 'eighth_notes',
-            'pattern': [0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5],
-            'tempo': 100,
-            'description': 'Eighth notes',
-            'correct_pattern': {'beats': [0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5], 'subdivision': 'eighth'}
-        },
-        {
-            'name': 'quarter_eighth',
-            'pattern': [0, 1, 1.5, 2, 3],
-            'tempo': 100,
-            'description': 'Mixed quarter and eighth notes',
-            'correct_pattern': {'beats': [0, 1, 1.5, 2, 3], 'subdivision': 'mixed'}
-        },
-        {
-            'name': 'simple_syncopation',
-            'pattern': [0, 0.5, 1.5, 2, 2.5, 3.5],
-            'tempo': 110,
-            'description': 'Simple syncopation',
-            'correct_pattern': {'beats': [0, 0.5, 1.5, 2, 2.5, 3.5], 'subdivision': 'syncopated'}
-        },
-        {
-            'name': 'dotted_quarter',
-            'pattern': [0, 1.5, 3],
-            'tempo': 95,
-            'description': 'Dotted quarter notes',
-            'correct_pattern': {'beats': [0, 1.5, 3], 'subdivision': 'dotted_quarter'}
-        },
-    ]
 
-    for pattern_info in patterns:
-        # Generate audio
-        audio = generate_syncopated_pattern(
-            pattern_info['pattern'],
-            pattern_info['tempo'],
-            time_signature="4/4",
-            bars=4
-        )
-
-        # Save audio file
-        filename = f"intermediate_{pattern_info['name']}.mp3"
-        filepath = os.path.join(output_dir, filename)
-        audio.export(filepath, format='mp3', bitrate='192k')
-
-        # Create database entry
-        challenge = RhythmChallenge.objects.create(
-            game=game,
-            pattern_data={
-                'pattern': pattern_info['pattern'],
-                'description': pattern_info['description']
-            },
-            tempo=pattern_info['tempo'],
-            time_signature="4/4",
-            difficulty='intermediate',
-            audio_file=f'static/audio/rhythm/{filename}',
-            correct_pattern=pattern_info['correct_pattern']
-        )
-        challenges.append(challenge)
-        print(f"Created intermediate challenge: {pattern_info['name']}")
-
-    return challenges
-
-
-def create_advanced_challenges(output_dir, game):
-    """Create advanced level rhythm challenges."""
-    challenges = []
-
-    # Advanced patterns (sixteenth notes, complex syncopation, triplets)
-    patterns = [
-        {
-            'name': 'sixteenth_notes',
-            'pattern': [i * 0.25 for i in range(16)],
-            'tempo': 90,
-            'description': 'Sixteenth notes',
-            'correct_pattern': {'beats': [i * 0.25 for i in range(16)], 'subdivision': 'sixteenth'}
-        },
-        {
-            'name': 'complex_syncopation',
-            'pattern': [0, 0.5, 1.25, 2, 2.75, 3.5],
-            'tempo': 120,
-            'description': 'Complex syncopation with sixteenth notes',
-            'correct_pattern': {'beats': [0, 0.5, 1.25, 2, 2.75, 3.5], 'subdivision': 'complex_syncopated'}
-        },
-        {
-            'name': 'triplet_feel',
-            'pattern': [0, 0.667, 1.333, 2, 2.667, 3.333],
-            'tempo': 110,
-            'description': 'Triplet feel',
-            'correct_pattern': {'beats': [0, 0.667, 1.333, 2, 2.667, 3.333], 'subdivision': 'triplet'}
-        },
-        {
-            'name': 'odd_meter',
-            'pattern': [0, 1, 2, 3, 4],
-            'tempo': 100,
-            'description': '5/4 time signature',
-            'correct_pattern': {'beats': [0, 1, 2, 3, 4], 'subdivision': 'quarter', 'time_signature': '5/4'}
-        },
+def build_catalogue(game, patterns, output_dir, workers=None, batch_size=1000, sample_rate=22050, force=False,
+                    verbose=True):
+    """
+    Render the missing audio and upsert the rows, one batch at a time, so
+    rows are only written once their audio exists.
+    Returns (rendered, upserted, render seconds, database seconds).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rendered = upserted = 0
+    render_seconds = database_seconds = 0.0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(patterns), batch_size):
+            batch = patterns[start:start + batch_size]
+            jobs = []
+            for pattern in batch:
+                output_path = os.path.join(output_dir, f"{pattern['key']}.mp3")
+                if force or not os.path.exists(output_path):
+                    jobs.append((output_path, pattern['meter'], pattern['subdivision'], pattern['steps'],
+                                 pattern['tempo'], sample_rate))
+
+            started = time.perf_counter()
+            if jobs:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                rendered += sum(1 for _ in pool.map(render_audio, *zip(*jobs), chunksize=chunksize))
+            render_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            RhythmChallenge.objects.bulk_create(
+                [challenge_row(game, pattern, f"static/audio/rhythm/{pattern['key']}.mp3") for pattern in batch],
+                update_conflicts=True,
+                unique_fields=['game', 'pattern_key'],
+                update_fields=['pattern_data', 'tempo', 'time_signature', 'difficulty', 'audio_file',
+                               'correct_pattern', 'onsets_ms'],
+            )
+            database_seconds += time.perf_counter() - started
+            upserted += len(batch)
+            if verbose:
+                print(f"{upserted}/{len(patterns)} challenges ({rendered} rendered)")
+    # Upserts send no post_save signals; tell the serving workers to rebuild their sampling index
+    bump_sampler_version(RhythmChallenge)
+    return rendered, upserted, render_seconds, database_seconds
+
+
+def prune(game, keys, output_dir, batch_size=1000):
+    """Delete the game's challenges (and their generated audio) that are not in `keys`; return how many."""
+    stale = [
+        (challenge_id, key)
+        for challenge_id, key in RhythmChallenge.objects.filter(game=game).values_list('id', 'pattern_key')
+        if key not in keys
     ]
-
-    for pattern_info in patterns:
-        # Generate audio
-        time_sig = pattern_info.get('time_signature', "4/4")
-        if 'time_signature' in pattern_info['correct_pattern']:
-            time_sig = pattern_info['correct_pattern']['time_signature']
-
-        audio = generate_syncopated_pattern(
-            pattern_info['pattern'],
-            pattern_info['tempo'],
-            time_signature=time_sig,
-            bars=4
-        )
-
-        # Save audio file
-        filename = f"advanced_{pattern_info['name']}.mp3"
-        filepath = os.path.join(output_dir, filename)
-        audio.export(filepath, format='mp3', bitrate='192k')
-
-        # Create database entry
-        challenge = RhythmChallenge.objects.create(
-            game=game,
-            pattern_data={
-                'pattern': pattern_info['pattern'],
-                'description': pattern_info['description']
-            },
-            tempo=pattern_info['tempo'],
-            time_signature=time_sig,
-            difficulty='advanced',
-            audio_file=f'static/audio/rhythm/{filename}',
-            correct_pattern=pattern_info['correct_pattern']
-        )
-        challenges.append(challenge)
-        print(f"Created advanced challenge: {pattern_info['name']}")
-
-    return challenges
+    for start in range(0, len(stale), batch_size):
+        batch = stale[start:start + batch_size]
+        RhythmChallenge.objects.filter(id__in=[challenge_id for challenge_id, _ in batch]).delete()
+        for _, key in batch:
+            audio_path = os.path.join(output_dir, f"{key}.mp3")
+            if key and os.path.exists(audio_path):
+                os.remove(audio_path)
+    return len(stale)
 
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=300, help='Challenges to generate (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='Sampling seed (default: %(default)s)')
+    parser.add_argument('--difficulty', action='append', dest='difficulties', choices=DIFFICULTIES,
+                        help='Only generate this difficulty; repeat for several (default: all)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per upsert (default: %(default)s)')
+    parser.add_argument('--sample-rate', type=int, default=22050,
+                        help='Audio sample rate; the clicks are at most 1.2 kHz (default: %(default)s)')
+    parser.add_argument('--force', action='store_true', help='Re-render audio files that already exist')
+    parser.add_argument('--prune', action='store_true',
+                        help="Delete the game's challenges that this run does not generate")
+    args = parser.parse_args()
+
     # Define output directory
     output_dir = os.path.join(project_dir, 'static', 'audio', 'rhythm')
-
-    # Create directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-
     print(f"Output directory: {output_dir}")
 
-    # Get or create the Rhythm Training game
     game, created = Game.objects.get_or_create(
-        name='Rhythm Training',
+        name=GAME_NAME,
         defaults={
             'description': 'Test your ability to identify and reproduce rhythm patterns'
         }
     )
+    print(f"{'Created new' if created else 'Using existing'} '{GAME_NAME}' game")
 
-    if created:
-        print("Created new 'Rhythm Training' game")
-    else:
-        print("Using existing 'Rhythm Training' game")
-
-    # Clear existing rhythm challenges for this game
-    existing_count = RhythmChallenge.objects.filter(game=game).count()
-    if existing_count > 0:
-        print(f"Removing {existing_count} existing rhythm challenges...")
-        RhythmChallenge.objects.filter(game=game).delete()
-
-    # Generate challenges for all difficulty levels
-    print("\n=== Generating Beginner Challenges ===")
-    beginner_challenges = create_beginner_challenges(output_dir, game)
+    started = time.perf_counter()
+    patterns = sample_patterns(args.count, args.seed, args.difficulties or DIFFICULTIES)
+    sample_seconds = time.perf_counter() - started
+    if len(patterns) < args.count:
+        print(f"The pattern grammar only yielded {len(patterns)} of {args.count} challenges")
 
-    print("\n=== Generating Intermediate Challenges ===")
-    intermediate_challenges = create_intermediate_challenges(output_dir, game)
-
-    print("\n=== Generating Advanced Challenges ===")
-    advanced_challenges = create_advanced_challenges(output_dir, game)
+    rendered, upserted, render_seconds, database_seconds = build_catalogue(
+        game, patterns, output_dir, workers=args.workers, batch_size=args.batch_size,
+        sample_rate=args.sample_rate, force=args.force
+    )
+    pruned = prune(game, {pattern['key'] for pattern in patterns}, output_dir) if args.prune else 0
 
     # Summary
-    total_challenges = len(beginner_challenges) + len(intermediate_challenges) + len(advanced_challenges)
     print("\n" + "=" * 50)
     print("Rhythm Challenge Generation Complete!")
     print("=" * 50)
-    print(f"Beginner:     {len(beginner_challenges)} challenges")
-    print(f"Intermediate: {len(intermediate_challenges)} challenges")
-    print(f"Advanced:     {len(advanced_challenges)} challenges")
-    print(f"Total:        {total_challenges} challenges")
+    for difficulty in args.difficulties or DIFFICULTIES:
+        print(f"{difficulty.capitalize() + ':':<14}{sum(p['difficulty'] == difficulty for p in patterns)} challenges")
+    print(f"Upserted:     {upserted} challenges, {rendered} audio files rendered, {pruned} pruned")
+    print(f"Time:         sampling {sample_seconds:.1f}s, rendering {render_seconds:.1f}s, "
+          f"database {database_seconds:.1f}s")
     print(f"\nAudio files saved to: {output_dir}")
     print("=" * 50)
 
@@ -0,0 +1,214 @@
+"""
+HTTP load test for comparing the WSGI and ASGI server modes.
+
+Opens --clients keep-alive connections to a running server; each client
+alternates fetching a random EQ challenge and submitting an answer to it
+(--submit-every sets how often it submits) for --duration seconds. Reports
+throughput, latency and errors. When the server runs on this host, the
+process and thread counts of the server processes (matched by --server-match
+in their command line) and, on PostgreSQL, the open database connections
+are sampled every second, showing what each mode needs to hold that many
+clients.
+
+The script creates a `loadtest` user in the database the settings point
+at and signs a JWT for it; it expects the Frequency Recognition game and
+its EQ challenges to exist (scripts/create_eq_challenges.py). Run it
+against PostgreSQL: SQLite takes one writer at a time, so concurrent
+submits fail with "database is locked" in either mode.
+
+Usage:
+    SERVER_MODE=wsgi WEB_CONCURRENCY=4 GUNICORN_THREADS=8 gunicorn &
+    python scripts/load_test.py --clients 1000 --duration 30
+
+    SERVER_MODE=asgi WEB_CONCURRENCY=4 gunicorn &
+    python scripts/load_test.py --clients 1000 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import django
+
+# Add the project directory to the path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'll_project.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bench_utils import print_table
+from ear_tune.models import EQChallenge
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.open_connections = 0
+        self.max_open_connections = 0
+
+
+async def request(reader, writer, host, method, path, token, body=None):
+    """Send one HTTP/1.1 request on a keep-alive connection; return (status, body)."""
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = [
+        f'{method} {path} HTTP/1.1',
+        f'Host: {host}',
+        f'Authorization: Bearer {token}',
+        'Accept: application/json',
+        f'Content-Length: {len(payload)}',
+    ]
+    if body is not None:
+        head.append('Content-Type: application/json')
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + payload)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('server closed the connection')
+    status = int(status_line.split()[1])
+    length, close = None, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and value.strip().lower() == 'close':
+            close = True
+    data = await reader.readexactly(length) if length is not None else await reader.read()
+    return status, data, close or length is None
+
+
+async def client(args, stats, token, challenge, deadline):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    prefix = url.path.rstrip('/')
+    reader = writer = None
+    round_number = 0
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), args.timeout)
+                stats.open_connections += 1
+                stats.max_open_connections = max(stats.max_open_connections, stats.open_connections)
+            round_number += 1
+            if round_number % args.submit_every:
+                method, path, body = 'GET', f'{prefix}/api/v1/eq-challenge/random/?difficulty=beginner', None
+            else:
+                method, path = 'POST', f'{prefix}/api/v1/eq-challenge/submit/'
+                body = {'challenge_id': challenge.id, 'frequency_band_id': challenge.frequency_band_id,
+                        'change_amount': challenge.change_amount}
+            start = time.perf_counter()
+            status, _, close = await asyncio.wait_for(
+                request(reader, writer, url.netloc, method, path, token, body), args.timeout
+            )
+            stats.latencies.append((time.perf_counter() - start) * 1000)
+            stats.statuses[status] += 1
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            stats.errors[type(e).__name__] += 1
+            close = True
+            await asyncio.sleep(0.1)
+        if close and writer is not None:
+            writer.close()
+            stats.open_connections -= 1
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+        stats.open_connections -= 1
+
+
+def server_processes(match):
+    """(processes, threads) of the local processes whose command line contains `match`."""
+    processes = threads = 0
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                if match.encode() not in f.read() or int(pid) == os.getpid():
+                    continue
+            with open(f'/proc/{pid}/status') as f:
+                threads += next(int(line.split()[1]) for line in f if line.startswith('Threads:'))
+            processes += 1
+        except (OSError, StopIteration):
+            continue
+    return processes, threads
+
+
+def database_connections():
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+        count = cursor.fetchone()[0]
+    connection.close()
+    return count - 1  # this query's own connection
+
+
+async def monitor(args, samples, deadline):
+    while time.monotonic() < deadline:
+        processes, threads = server_processes(args.server_match) if os.path.isdir('/proc') else (0, 0)
+        db = await asyncio.to_thread(database_connections)
+        samples.append((processes, threads, db))
+        await asyncio.sleep(1)
+
+
+async def run(args, token, challenge):
+    stats, samples = Stats(), []
+    deadline = time.monotonic() + args.duration
+    started = time.monotonic()
+    monitoring = asyncio.create_task(monitor(args, samples, deadline))
+    await asyncio.gather(*(client(args, stats, token, challenge, deadline) for _ in range(args.clients)))
+    await monitoring
+    return stats, samples, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--submit-every', type=int, default=2, help='Every Nth request of a client is a submit')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+    parser.add_argument('--server-match', default='gunicorn', help='Command line fragment of the server processes')
+    args = parser.parse_args()
+
+    challenge = EQChallenge.objects.filter(game__name='Frequency Recognition', difficulty='beginner').first()
+    if challenge is None:
+        sys.exit('No beginner EQ challenges; run scripts/create_eq_challenges.py first.')
+    user, _ = User.objects.get_or_create(username='loadtest')
+    token = str(RefreshToken.for_user(user).access_token)
+    connection.close()
+
+    stats, samples, elapsed = asyncio.run(run(args, token, challenge))
+
+    latencies = sorted(stats.latencies) or [0]
+    ok = sum(count for status, count in stats.statuses.items() if status < 400)
+    print(f'{args.clients} clients for {elapsed:.1f} s against {args.url}')
+    print_table(['requests', 'ok', 'req/s', 'p50 ms', 'p99 ms', 'max open connections'], [[
+        len(stats.latencies), ok, f'{len(stats.latencies) / elapsed:.0f}',
+        f'{latencies[len(latencies) // 2]:.0f}', f'{latencies[int(len(latencies) * 0.99)]:.0f}',
+        stats.max_open_connections,
+    ]])
+    print('statuses:', dict(stats.statuses), 'errors:', dict(stats.errors) or 'none')
+    if samples:
+        db = [sample[2] for sample in samples if sample[2] is not None]
+        print(f"server processes: {max(s[0] for s in samples)}, threads: max {max(s[1] for s in samples)}, "
+              f"database connections: {f'max {max(db)}' if db else 'n/a (not PostgreSQL)'}")
+
+
+if __name__ == '__main__':
+    main()